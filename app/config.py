@@ -65,23 +65,125 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
     REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    PRINCIPAL_CACHE_ENABLED: bool = True
+    PRINCIPAL_CACHE_SIZE: int = 10_000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
     
     # Security settings
     PASSWORD_MIN_LENGTH: int = 12
     PASSWORD_MAX_LENGTH: int = 128
     PASSWORD_REGEX: str = r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&])[A-Za-z\d@$!%*?&]{12,}$"
+    # Comma-separated; only these users may request the "admin" scope (e.g. for /metrics)
+    ADMIN_USERNAMES: str = os.getenv("ADMIN_USERNAMES", "")
     MAX_LOGIN_ATTEMPTS: int = 5
     LOGIN_ATTEMPT_WINDOW_MINUTES: int = 15
+    MAX_LOGIN_ATTEMPTS_PER_IP: int = 20
+    LOGIN_ATTEMPT_TRACKER_SIZE: int = 100_000  # usernames and IPs tracked, each
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_SIZE: int = 16  # waiting hash jobs allowed before answering 503
     
     # OTP settings
     OTP_EXPIRATION_MINUTES: int = 5
     OTP_LENGTH: int = 6
     OTP_MAX_ATTEMPTS: int = 3
+    # "database" or "memory"; memory only works with a single worker
+    OTP_BACKEND: str = os.getenv("OTP_BACKEND", "database")
+    OTP_PURGE_INTERVAL_SECONDS: int = 300
+    OTP_PURGE_BATCH_SIZE: int = 1000
     
     # Rate limiting
     RATE_LIMIT_PER_MINUTE: int = 60
     LOGIN_RATE_LIMIT: int = 5
     SIGNUP_RATE_LIMIT: int = 5
+    # memory:// is per worker; with several workers use a shared store:
+    # sqlite:////dev/shm/gymqr-limits.db (one host) or redis://host:6379
+    RATE_LIMIT_STORAGE_URI: str = os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")
+    RATE_LIMIT_STRATEGY: str = "sliding-window-counter"
+    
+    # Gym ID settings
+    ID_GENERATION_BATCH_SIZE: int = 1000
+    ID_GENERATION_MAX_COUNT: int = 100_000  # per /generate call; the code space is finite
+    # Required, and must stay stable once codes are issued: changing it
+    # re-shuffles the counter-to-code mapping and new codes may then collide
+    # with old ones. Keep it separate from SECRET_KEY, which gets rotated.
+    GYM_ID_PERMUTATION_KEY: str = os.getenv("GYM_ID_PERMUTATION_KEY", "")
+    # Keep checking new codes against the table while random (pre-counter)
+    # codes are still in circulation.
+    GYM_ID_COLLISION_CHECK: bool = os.getenv("GYM_ID_COLLISION_CHECK", "True").lower() == "true"
+    # Reject mistyped codes before any lookup. Legacy random codes have no
+    # check digit, so leave this off until they are retired.
+    GYM_ID_REQUIRE_CHECK_DIGIT: bool = os.getenv("GYM_ID_REQUIRE_CHECK_DIGIT", "False").lower() == "true"
+    
+    # Gym ID verification cache
+    GYM_ID_CACHE_SIZE: int = 100_000
+    GYM_ID_CACHE_TTL_SECONDS: int = 60
+    GYM_ID_BLOOM_ENABLED: bool = True
+    GYM_ID_BLOOM_CAPACITY: int = 1_000_000
+    GYM_ID_BLOOM_ERROR_RATE: float = 0.001
+    GYM_ID_BLOOM_REFRESH_SECONDS: int = 5
+    # Refreshes re-read rows created this long before the previous one, for
+    # inserts that commit late; longer than any /generate transaction.
+    GYM_ID_BLOOM_OVERLAP_SECONDS: int = 300
+    GYM_ID_BLOOM_REBUILD_SECONDS: int = 900
+    
+    # Keyset pagination of per-user lists (gym access IDs, plans)
+    PAGE_SIZE_DEFAULT: int = 100
+    PAGE_SIZE_MAX: int = 1000
+    
+    # Rows fetched per server-side cursor batch by the streaming exports
+    EXPORT_BATCH_SIZE: int = 2000
+    
+    # Serialized exercise catalog pages; writes in this process invalidate
+    # them at once, other workers' writes show after the TTL
+    EXERCISE_CATALOG_CACHE_SIZE: int = 1000
+    EXERCISE_CATALOG_CACHE_TTL_SECONDS: int = 60
+    EXERCISE_CATALOG_PAGE_SIZE: int = 100
+    EXERCISE_CATALOG_MAX_PAGE_SIZE: int = 500
+    
+    # Rendered QR images, keyed by a hash of code and render options; an
+    # empty QR_CACHE_DIR keeps them in memory only. The directory is pruned
+    # to QR_CACHE_DISK_MAX_BYTES, least recently used first (0: unbounded).
+    QR_CACHE_SIZE: int = 10_000
+    QR_CACHE_TTL_SECONDS: int = 24 * 3600
+    QR_CACHE_DIR: str = os.getenv("QR_CACHE_DIR", "")
+    QR_CACHE_DISK_MAX_BYTES: int = int(os.getenv("QR_CACHE_DISK_MAX_BYTES", 512 * 1024 * 1024))
+    QR_DEFAULT_SIZE: int = 256
+    QR_MAX_SIZE: int = 2048
+    
+    # Batch renders (ZIP of images / PDF card sheets) on a process pool
+    QR_BATCH_WORKERS: int = int(os.getenv("QR_BATCH_WORKERS", os.cpu_count() or 1))
+    QR_BATCH_CHUNK_SIZE: int = 96  # codes per pool task
+    QR_BATCH_MAX_CODES: int = 100_000
+    
+    # Signed QR payloads, verifiable without the database (see
+    # utils.signed_qr). QR_SIGNING_KEY is required and kept apart from
+    # SECRET_KEY, since printed codes must outlive a JWT secret rotation:
+    # the HMAC key for HS256, a base64url Ed25519 seed for EdDSA.
+    QR_SIGNING_ALGORITHM: str = os.getenv("QR_SIGNING_ALGORITHM", "HS256")
+    QR_SIGNING_KEY: str = os.getenv("QR_SIGNING_KEY", "")
+    QR_SIGNING_KEY_ID: str = os.getenv("QR_SIGNING_KEY_ID", "1")
+    QR_TOKEN_WINDOW_DAYS: int = 30
+    QR_TOKEN_LEEWAY_SECONDS: int = 300  # controller clock skew
+    QR_REVOCATION_REFRESH_SECONDS: float = 10
+    QR_REVOCATION_DELTA_LIMIT: int = 10_000  # rows per delta response
+    
+    # Check-in event log: scans are buffered and written in batches. Rows
+    # the buffer or the database cannot take are appended to the spool file
+    # (empty path: dropped) and replayed once writes succeed again.
+    CHECKIN_LOG_BATCH_SIZE: int = 500
+    CHECKIN_LOG_FLUSH_SECONDS: float = 1.0
+    CHECKIN_LOG_QUEUE_SIZE: int = 50_000
+    CHECKIN_LOG_SPOOL_PATH: str = os.getenv("CHECKIN_LOG_SPOOL_PATH", "checkin-spool.ndjson")
+
+    # Live occupancy: in-memory counters rebuilt from check_in_events every
+    # OCCUPANCY_RECONCILE_SECONDS; an unmatched check-in stops counting
+    # after OCCUPANCY_MAX_STAY_HOURS. Dashboards get at most one push per
+    # OCCUPANCY_PUSH_SECONDS.
+    DEFAULT_GYM_ID: int = 1
+    OCCUPANCY_MAX_STAY_HOURS: float = 12
+    OCCUPANCY_RECONCILE_SECONDS: float = 60
+    OCCUPANCY_PUSH_SECONDS: float = 1.0
+    OCCUPANCY_HEARTBEAT_SECONDS: float = 15
     
     # CORS settings
     CORS_ORIGINS: List[str] = BACKEND_CORS_ORIGINS
@@ -94,6 +196,28 @@ class Settings(BaseSettings):
     SESSION_COOKIE_HTTPONLY: bool = True
     SESSION_COOKIE_SAMESITE: str = "Lax"
     
+    # Per-route latency, DB and crypto metrics served at /metrics (admin scope)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+    
+    # Log once per process if the database is not at the migrations head
+    SCHEMA_CHECK: bool = os.getenv("SCHEMA_CHECK", "True").lower() == "true"
+    
+    # Email delivery; with no SMTP_HOST messages are only logged
+    SMTP_HOST: str = os.getenv("SMTP_HOST", "")
+    SMTP_PORT: int = int(os.getenv("SMTP_PORT", "25"))
+    SMTP_USERNAME: str = os.getenv("SMTP_USERNAME", "")
+    SMTP_PASSWORD: str = os.getenv("SMTP_PASSWORD", "")
+    SMTP_STARTTLS: bool = os.getenv("SMTP_STARTTLS", "False").lower() == "true"
+    SMTP_FROM: str = os.getenv("SMTP_FROM", "no-reply@localhost")
+    SMTP_TIMEOUT_SECONDS: float = 10.0
+    
+    # Outbound notification queue
+    NOTIFICATION_WORKERS: int = 2
+    NOTIFICATION_QUEUE_SIZE: int = 10_000
+    NOTIFICATION_BATCH_SIZE: int = 50  # messages sent per SMTP connection
+    NOTIFICATION_MAX_ATTEMPTS: int = 5
+    NOTIFICATION_RETRY_BASE_SECONDS: float = 1.0
+    
     # SMS Settings
     # TWILIO_ACCOUNT_SID: str = ""
     # TWILIO_AUTH_TOKEN: str = ""
@@ -1,18 +1,33 @@
-from sqlalchemy.orm import Session
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.ext.asyncio import AsyncSession
 from . import models, schemas
-from .utils.auth import get_password_hash, verify_password
+from .utils.auth import get_password_hash_async, invalidate_user, verify_password_async
+from .utils.exercise_catalog import exercise_catalog
+from .utils.id_verifier import gym_id_verifier
 
-def get_user_by_username(db: Session, username: str):
-    return db.query(models.User).filter(models.User.username == username).first()
+async def get_user_by_username(db: AsyncSession, username: str):
+    result = await db.execute(select(models.User).filter(models.User.username == username))
+    return result.scalars().first()
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(models.User).filter(models.User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(models.User).filter(models.User.email == email))
+    return result.scalars().first()
 
 # def get_user_by_phone(db: Session, phone_number: str):
 #     return db.query(models.User).filter(models.User.phone_number == phone_number).first()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = get_password_hash(user.password)
+async def create_user(db: AsyncSession, user: schemas.UserCreate, commit: bool = True):
+    """Add a new inactive user.
+
+    With commit=False the row is inserted but left uncommitted, so the
+    caller can add rows that reference it in the same transaction.
+    """
+    hashed_password = await get_password_hash_async(user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
@@ -22,70 +37,343 @@ def create_user(db: Session, user: schemas.UserCreate):
         is_active=False
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    if not commit:
+        # Flushed on its own: the unit of work does not know otps rows
+        # depend on users and could insert them first
+        await db.flush()
+        return db_user
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = get_user_by_username(db, username)
+def duplicate_user_field(error: IntegrityError) -> Optional[str]:
+    """Which unique users column ("username" or "email") an IntegrityError violated, if any."""
+    message = str(error.orig).lower()
+    # MySQL: "Duplicate entry 'x' for key 'users.email'"
+    # SQLite: "UNIQUE constraint failed: users.email"
+    # Only the part naming the key is checked, since the entry may contain anything
+    for marker in ("for key", "constraint failed:"):
+        if marker in message:
+            message = message.split(marker, 1)[1]
+            break
+    if "email" in message:
+        return "email"
+    if "username" in message:
+        return "username"
+    return None
+
+async def set_user_active(db: AsyncSession, user: models.User, is_active: bool):
+    user.is_active = is_active
+    await db.commit()
+    invalidate_user(user.username)
+    return user
+
+async def update_user_password(db: AsyncSession, user: models.User, password: str):
+    user.password_hash = await get_password_hash_async(password)
+    await db.commit()
+    invalidate_user(user.username)
+    return user
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await get_user_by_username(db, username)
     if not user:
         return False
-    if not verify_password(password, user.password_hash):
+    if not await verify_password_async(password, user.password_hash):
         return False
     return user
 
-def create_gym_access_id(db: Session, gym_id: schemas.GymAccessIDCreate):
-    db_gym_id = models.GymAccessID(**gym_id.dict())
+async def create_gym_access_id(db: AsyncSession, gym_id: schemas.GymAccessIDCreate):
+    db_gym_id = models.GymAccessID(**gym_id.model_dump())
     db.add(db_gym_id)
-    db.commit()
-    db.refresh(db_gym_id)
+    await db.commit()
+    await db.refresh(db_gym_id)
+    gym_id_verifier.add_codes([db_gym_id.code])
     return db_gym_id
 
-def get_user_gym_ids(db: Session, user_id: int):
-    return db.query(models.GymAccessID).filter(models.GymAccessID.user_id == user_id).all()
+async def redeem_gym_access_id(db: AsyncSession, code: str) -> bool:
+    """Mark a code as used with one compare-and-set UPDATE.
+
+    Returns True only for the single caller whose UPDATE flipped is_used;
+    concurrent scans of the same code see a rowcount of 0.
+    """
+    result = await db.execute(
+        update(models.GymAccessID)
+        .where(models.GymAccessID.code == code, models.GymAccessID.is_used == False)
+        .values(is_used=True, updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    gym_id_verifier.invalidate(code)
+    return result.rowcount == 1
+
+def _keyset(query, id_column, after_id: Optional[int], limit: Optional[int]):
+    """Rows after after_id in id order; limit + 1 of them, for utils.pagination.split_page."""
+    if after_id is not None:
+        query = query.filter(id_column > after_id)
+    query = query.order_by(id_column)
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return query
+
+async def get_user_gym_ids(db: AsyncSession, user_id: int, after_id: Optional[int] = None, limit: Optional[int] = None):
+    # Only the columns the response shows (and id for the cursor), as plain
+    # rows instead of ORM objects
+    result = await db.execute(_keyset(
+        select(models.GymAccessID.id, models.GymAccessID.code, models.GymAccessID.type, models.GymAccessID.is_used)
+        .filter(models.GymAccessID.user_id == user_id),
+        models.GymAccessID.id, after_id, limit
+    ))
+    return result.mappings().all()
+
+def gym_ids_export_query(
+    type: Optional[str] = None,
+    is_used: Optional[bool] = None,
+    assigned: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
+    """Columns of the gym ID export, filtered; None leaves a filter out."""
+    query = select(
+        models.GymAccessID.code, models.GymAccessID.type, models.GymAccessID.is_used, models.GymAccessID.created_at
+    ).order_by(models.GymAccessID.id)
+    if type is not None:
+        query = query.filter(models.GymAccessID.type == type)
+    if is_used is not None:
+        query = query.filter(models.GymAccessID.is_used == is_used)
+    if assigned is not None:
+        query = query.filter(models.GymAccessID.user_id.isnot(None) if assigned else models.GymAccessID.user_id.is_(None))
+    if created_from is not None:
+        query = query.filter(models.GymAccessID.created_at >= created_from)
+    if created_to is not None:
+        query = query.filter(models.GymAccessID.created_at < created_to)
+    return query
+
+async def get_present_check_ins(db: AsyncSession, since: datetime):
+    """(code, gym_id, type, scanned_at) of codes whose latest event since `since` is a check-in.
+
+    Latest is by scan time, not id: replayed spool rows get ids after
+    events scanned later than they were.
+    """
+    event = models.CheckInEvent
+    ranked = (
+        select(
+            event.code, event.gym_id, event.type, event.direction, event.scanned_at,
+            func.row_number().over(
+                partition_by=event.code, order_by=(event.scanned_at.desc(), event.id.desc())
+            ).label("rank"),
+        )
+        .where(event.scanned_at >= since)
+        .subquery()
+    )
+    result = await db.execute(
+        select(ranked.c.code, ranked.c.gym_id, ranked.c.type, ranked.c.scanned_at)
+        .where(ranked.c.rank == 1, ranked.c.direction == "in")
+    )
+    return result.all()
+
+async def get_last_check_in_event(db: AsyncSession, code: str, since: datetime):
+    """The latest event of a code since `since` by scan time, as a mapping of direction, gym_id and type, or None."""
+    event = models.CheckInEvent
+    result = await db.execute(
+        select(event.direction, event.gym_id, event.type)
+        .where(event.code == code, event.scanned_at >= since)
+        .order_by(event.scanned_at.desc(), event.id.desc())
+        .limit(1)
+    )
+    return result.mappings().first()
+
+async def add_revocation(db: AsyncSession, code: str, revoked: bool, revoked_by: Optional[int] = None) -> int:
+    """Revoke (or reinstate) a code; returns the new revocation list version.
 
-def create_exercise(db: Session, exercise: schemas.ExerciseCreate):
-    db_exercise = models.Exercise(**exercise.dict())
+    The version is taken from the counter row in the same transaction. Its
+    row lock is held until the commit, so a later version never becomes
+    visible before an earlier one and readers can page with version > since.
+    """
+    sequence = models.GymIDRevocationSequence
+    bump = update(sequence).where(sequence.id == 1).values(version=sequence.version + 1)
+    if (await db.execute(bump)).rowcount == 0:
+        # First revocation: create the counter row
+        try:
+            db.add(sequence(id=1, version=1))
+            await db.flush()
+        except IntegrityError:
+            # Another writer created the row first
+            await db.rollback()
+            await db.execute(bump)
+    version = await db.scalar(select(sequence.version).where(sequence.id == 1))
+    db.add(models.GymIDRevocation(code=code, revoked=revoked, revoked_by=revoked_by, version=version))
+    await db.commit()
+    return version
+
+async def get_revocations_since(db: AsyncSession, version: int, limit: int):
+    """Revocation list entries after version, oldest first."""
+    revocation = models.GymIDRevocation
+    result = await db.execute(
+        select(revocation.version, revocation.code, revocation.revoked)
+        .where(revocation.version > version)
+        .order_by(revocation.version)
+        .limit(limit)
+    )
+    return result.all()
+
+async def create_exercise(db: AsyncSession, exercise: schemas.ExerciseCreate):
+    db_exercise = models.Exercise(**exercise.model_dump())
     db.add(db_exercise)
-    db.commit()
-    db.refresh(db_exercise)
+    await db.commit()
+    await db.refresh(db_exercise)
+    exercise_catalog.invalidate([db_exercise.muscle_group])
+    return db_exercise
+
+async def get_exercise(db: AsyncSession, exercise_id: int):
+    result = await db.execute(select(models.Exercise).filter(models.Exercise.id == exercise_id))
+    return result.scalars().first()
+
+async def get_exercises(db: AsyncSession, muscle_group: Optional[str] = None, offset: int = 0, limit: int = 100):
+    query = select(models.Exercise).order_by(models.Exercise.id).offset(offset).limit(limit)
+    if muscle_group is not None:
+        query = query.filter(models.Exercise.muscle_group == muscle_group)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+async def get_exercises_by_muscle_group(db: AsyncSession, muscle_group: str):
+    result = await db.execute(select(models.Exercise).filter(models.Exercise.muscle_group == muscle_group))
+    return result.scalars().all()
+
+async def update_exercise(db: AsyncSession, db_exercise: models.Exercise, exercise: schemas.ExerciseUpdate):
+    # A change of muscle group moves the exercise between two groups' pages
+    muscle_groups = [db_exercise.muscle_group]
+    for field, value in exercise.model_dump(exclude_unset=True).items():
+        setattr(db_exercise, field, value)
+    muscle_groups.append(db_exercise.muscle_group)
+    await db.commit()
+    await db.refresh(db_exercise)
+    exercise_catalog.invalidate(muscle_groups)
     return db_exercise
 
-def get_exercises_by_muscle_group(db: Session, muscle_group: str):
-    return db.query(models.Exercise).filter(models.Exercise.muscle_group == muscle_group).all()
+async def delete_exercise(db: AsyncSession, db_exercise: models.Exercise):
+    await db.delete(db_exercise)
+    await db.commit()
+    exercise_catalog.invalidate([db_exercise.muscle_group])
+
+class UnknownExerciseIds(ValueError):
+    """Raised when a workout plan refers to exercises that do not exist."""
+
+    def __init__(self, ids: List[int]):
+        super().__init__(f"Unknown exercise ids: {ids}")
+        self.ids = ids
 
-def create_workout_plan(db: Session, workout_plan: schemas.WorkoutPlanCreate, user_id: int):
+async def _load_exercises(db: AsyncSession, exercise_ids: List[int]) -> Dict[int, models.Exercise]:
+    """Fetch exercises by id with one IN query; raise UnknownExerciseIds for any missing."""
+    if not exercise_ids:
+        return {}
+    result = await db.execute(select(models.Exercise).filter(models.Exercise.id.in_(exercise_ids)))
+    exercises = {exercise.id: exercise for exercise in result.scalars()}
+    missing = [exercise_id for exercise_id in exercise_ids if exercise_id not in exercises]
+    if missing:
+        raise UnknownExerciseIds(missing)
+    return exercises
+
+async def _link_exercises(db: AsyncSession, workout_plan_id: int, exercise_ids: List[int]):
+    if exercise_ids:
+        # One executemany for all the links
+        await db.execute(insert(models.WorkoutPlanExercise), [
+            {"workout_plan_id": workout_plan_id, "exercise_id": exercise_id} for exercise_id in exercise_ids
+        ])
+
+async def create_workout_plan(db: AsyncSession, workout_plan: schemas.WorkoutPlanCreate, user_id: int):
+    """Create a plan and its exercise links in one transaction.
+
+    The statement count does not grow with the number of exercises: one
+    SELECT ... IN to validate them, the plan INSERT, and one executemany
+    INSERT for the links.
+    """
+    exercise_ids = list(dict.fromkeys(workout_plan.exercise_ids))
+    exercises = await _load_exercises(db, exercise_ids)
     db_workout_plan = models.WorkoutPlan(
         user_id=user_id,
         plan_name=workout_plan.plan_name
     )
     db.add(db_workout_plan)
-    db.commit()
-    db.refresh(db_workout_plan)
-    
-    # Add exercises to the workout plan
-    for exercise_id in workout_plan.exercise_ids:
-        db_workout_exercise = models.WorkoutPlanExercise(
-            workout_plan_id=db_workout_plan.id,
-            exercise_id=exercise_id
-        )
-        db.add(db_workout_exercise)
-    
-    db.commit()
+    await db.flush()
+    await _link_exercises(db, db_workout_plan.id, exercise_ids)
+    # The links were written directly, so tell the ORM what the collection
+    # holds rather than loading it back
+    set_committed_value(db_workout_plan, "exercises", [exercises[i] for i in exercise_ids])
+    await db.commit()
+    return db_workout_plan
+
+async def get_workout_plan(db: AsyncSession, workout_plan_id: int, user_id: Optional[int] = None):
+    """A plan with its exercises loaded; None if it does not exist or is not user_id's."""
+    query = (
+        select(models.WorkoutPlan)
+        .options(selectinload(models.WorkoutPlan.exercises))
+        .filter(models.WorkoutPlan.id == workout_plan_id)
+        .execution_options(populate_existing=True)
+    )
+    if user_id is not None:
+        query = query.filter(models.WorkoutPlan.user_id == user_id)
+    result = await db.execute(query)
+    return result.scalars().first()
+
+async def update_workout_plan(db: AsyncSession, db_workout_plan: models.WorkoutPlan, workout_plan: schemas.WorkoutPlanUpdate):
+    """Apply an update to a plan loaded by get_workout_plan.
+
+    Exercise links are diffed against the current ones: only added ids are
+    validated and inserted (one executemany), only dropped ones deleted
+    (one DELETE ... IN), and unchanged links are left alone.
+    """
+    changed = False
+    if workout_plan.plan_name is not None and workout_plan.plan_name != db_workout_plan.plan_name:
+        db_workout_plan.plan_name = workout_plan.plan_name
+        changed = True
+    if workout_plan.exercise_ids is not None:
+        exercise_ids = list(dict.fromkeys(workout_plan.exercise_ids))
+        current = {exercise.id: exercise for exercise in db_workout_plan.exercises}
+        wanted = set(exercise_ids)
+        added = [exercise_id for exercise_id in exercise_ids if exercise_id not in current]
+        removed = [exercise_id for exercise_id in current if exercise_id not in wanted]
+        exercises = {**current, **await _load_exercises(db, added)}
+        if removed:
+            await db.execute(
+                delete(models.WorkoutPlanExercise)
+                .where(
+                    models.WorkoutPlanExercise.workout_plan_id == db_workout_plan.id,
+                    models.WorkoutPlanExercise.exercise_id.in_(removed)
+                )
+                .execution_options(synchronize_session=False)
+            )
+        await _link_exercises(db, db_workout_plan.id, added)
+        set_committed_value(db_workout_plan, "exercises", [exercises[i] for i in exercise_ids])
+        changed = changed or bool(added or removed)
+    if changed:
+        db_workout_plan.updated_at = datetime.now(timezone.utc)
+        await db.commit()
     return db_workout_plan
 
-def get_user_workout_plans(db: Session, user_id: int):
-    return db.query(models.WorkoutPlan).filter(models.WorkoutPlan.user_id == user_id).all()
+async def get_user_workout_plans(db: AsyncSession, user_id: int, after_id: Optional[int] = None, limit: Optional[int] = None):
+    # The plans, then their exercises with one SELECT ... IN per 500 plans,
+    # instead of a SELECT per plan
+    result = await db.execute(_keyset(
+        select(models.WorkoutPlan)
+        .options(selectinload(models.WorkoutPlan.exercises))
+        .filter(models.WorkoutPlan.user_id == user_id),
+        models.WorkoutPlan.id, after_id, limit
+    ))
+    return result.scalars().all()
 
-def create_nutrition_plan(db: Session, nutrition_plan: schemas.NutritionPlanCreate, user_id: int):
+async def create_nutrition_plan(db: AsyncSession, nutrition_plan: schemas.NutritionPlanCreate, user_id: int):
     db_nutrition_plan = models.NutritionPlan(
         user_id=user_id,
         plan_name=nutrition_plan.plan_name
     )
     db.add(db_nutrition_plan)
-    db.commit()
-    db.refresh(db_nutrition_plan)
+    await db.commit()
+    await db.refresh(db_nutrition_plan)
     return db_nutrition_plan
 
-def get_user_nutrition_plans(db: Session, user_id: int):
-    return db.query(models.NutritionPlan).filter(models.NutritionPlan.user_id == user_id).all() 
\ No newline at end of file
+async def get_user_nutrition_plans(db: AsyncSession, user_id: int, after_id: Optional[int] = None, limit: Optional[int] = None):
+    result = await db.execute(_keyset(
+        select(models.NutritionPlan).filter(models.NutritionPlan.user_id == user_id),
+        models.NutritionPlan.id, after_id, limit
+    ))
+    return result.scalars().all()
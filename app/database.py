@@ -1,7 +1,11 @@
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import get_settings
+import asyncio
+import logging
 import os
 
 settings = get_settings()
@@ -14,23 +18,51 @@ SQLALCHEMY_DATABASE_URL = os.getenv(
 
 )
 
-# Configure engine with serverless-friendly settings
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    pool_size=1,  # Reduced pool size for serverless
-    max_overflow=2,  # Reduced overflow for serverless
-    pool_timeout=30,
-    pool_recycle=1800,
-    pool_pre_ping=True,
-    echo=settings.DEBUG,  # Only enable SQL logging in debug mode
-    connect_args={
-        "connect_timeout": 10  # Add connection timeout
+# Async drivers matching the sync ones above
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)).render_as_string(hide_password=False)
+
+ASYNC_SQLALCHEMY_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(SQLALCHEMY_DATABASE_URL))
+
+def engine_options(url: str) -> dict:
+    """Pool and connect settings for url; SQLite (tests, benchmarks) gets the driver defaults."""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {"echo": settings.DEBUG}
+    # Serverless-friendly settings
+    return {
+        "pool_size": 1,  # Reduced pool size for serverless
+        "max_overflow": 2,  # Reduced overflow for serverless
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "echo": settings.DEBUG,  # Only enable SQL logging in debug mode
+        "connect_args": {
+            "connect_timeout": 10  # Add connection timeout
+        },
     }
-)
+
+# Sync engine: migrations, scripts and schema setup
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine used by the request handlers, so a slow round-trip to the
+# database no longer blocks the event loop
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL, **engine_options(ASYNC_SQLALCHEMY_DATABASE_URL)
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
@@ -39,7 +71,57 @@ def get_db():
     finally:
         db.close()
 
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+# None until the check below has compared the database against the
+# migrations; then True/False for the rest of the process.
+schema_is_current = None
+
+def expected_schema_revision():
+    """Head revision of migrations/, or None if Alembic or the scripts are not deployed."""
+    try:
+        from alembic.script import ScriptDirectory
+    except ImportError:
+        return None
+    if not os.path.isdir(MIGRATIONS_DIR):
+        return None
+    return ScriptDirectory(MIGRATIONS_DIR).get_current_head()
+
+_schema_check_task = None
+
+async def check_schema_version() -> None:
+    """Compare alembic_version with the migrations head.
+
+    Only logs: the schema is managed with `alembic upgrade head`, never by
+    the app itself, so a mismatch is reported rather than fixed.
+    """
+    global schema_is_current
+    expected = await asyncio.to_thread(expected_schema_revision)
+    if expected is None:
+        schema_is_current = True
+        return
+    try:
+        async with AsyncSessionLocal() as db:
+            current = (await db.execute(text("SELECT version_num FROM alembic_version"))).scalar()
+    except Exception as e:
+        current = None
+        logging.warning(f"Could not read alembic_version: {str(e)}")
+    schema_is_current = current == expected
+    if not schema_is_current:
+        logging.warning(f"Database schema is at {current}, expected {expected}; run `alembic upgrade head`")
+
+# Dependency to get an async DB session
+async def get_async_db():
+    global _schema_check_task
+    # The first session starts the schema check in the background, so
+    # neither import nor the first request waits for it
+    if settings.SCHEMA_CHECK and _schema_check_task is None:
+        _schema_check_task = asyncio.create_task(check_schema_version())
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def init_db():
+    # Scripts and local experiments only; deployments use `alembic upgrade head`
     from .models import Base
     Base.metadata.create_all(bind=engine)
 
@@ -47,4 +129,4 @@ def update_db():
     from .models import Base
     # Drop all tables and recreate them
     Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Request, Response
+from fastapi import Depends, FastAPI, Request, Response
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
@@ -6,19 +6,29 @@ from fastapi.middleware.gzip import GZipMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
-from fastapi.responses import Response
-from .routers import users, gym_ids
-from .database import engine
-from . import models
+from fastapi.responses import JSONResponse, Response
+from .routers import users, gym_ids, workout_plans, exercises
+from .database import AsyncSessionLocal, async_engine
 from .config import get_settings
 from .utils.limiter import limiter
+from .utils.auth import PasswordHashingBusy, principal_cache, require_scope
+from .utils.exercise_catalog import exercise_catalog
+from .utils.qr import qr_cache
+from .utils.qr_batch import shutdown_render_pool
+from .utils.checkin_log import checkin_log
+from .utils.occupancy import occupancy
+from .utils.signed_qr import check_signing_key, revocations
+from .utils.id_verifier import gym_id_verifier
+from .utils.gym_codes import check_permutation_key
+from .utils.login_attempts import login_attempts
+from .utils.metrics import MetricsMiddleware, instrument_engine, metrics
+from .utils.otp import run_otp_purge
+from .utils.notifications import notification_queue
+import asyncio
 import logging
 
 settings = get_settings()
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
-
 # Configure OAuth2 security scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/users/token")
 
@@ -59,6 +69,37 @@ app = FastAPI(
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+# Password hashing pool saturated: ask the client to retry shortly
+@app.exception_handler(PasswordHashingBusy)
+async def password_hashing_busy_handler(request: Request, exc: PasswordHashingBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+# Background jobs
+@app.on_event("startup")
+async def start_background_jobs():
+    check_permutation_key()
+    check_signing_key()
+    gym_id_verifier.start()
+    app.state.otp_purge_task = asyncio.create_task(run_otp_purge(AsyncSessionLocal))
+    notification_queue.start()
+    checkin_log.start()
+    occupancy.start()
+    revocations.start()
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    app.state.otp_purge_task.cancel()
+    await notification_queue.stop()
+    await gym_id_verifier.stop()
+    await occupancy.stop()
+    await revocations.stop()
+    await checkin_log.stop()
+    shutdown_render_pool()
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -100,9 +141,29 @@ app.add_middleware(
     https_only=settings.SESSION_COOKIE_SECURE,
 )
 
+# Added last so it wraps the other middlewares and times the whole request
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(async_engine)
+    metrics.register_collector("principal_cache", principal_cache.stats)
+    metrics.register_collector("gym_id_verifier", lambda: {
+        **gym_id_verifier.cache.stats(),
+        "bloom_rejections": gym_id_verifier.bloom_rejections,
+        "db_lookups": gym_id_verifier.db_lookups,
+    })
+    metrics.register_collector("login_attempts", login_attempts.stats)
+    metrics.register_collector("notifications", notification_queue.stats)
+    metrics.register_collector("exercise_catalog", exercise_catalog.stats)
+    metrics.register_collector("qr_cache", qr_cache.stats)
+    metrics.register_collector("checkin_log", checkin_log.stats)
+    metrics.register_collector("occupancy", occupancy.stats)
+    metrics.register_collector("revocations", revocations.stats)
+
 # Include routers with API version prefix
 app.include_router(users.router, prefix=f"{settings.API_V1_STR}/users", tags=["users"])
 app.include_router(gym_ids.router, prefix=settings.API_V1_STR, tags=["gym-ids"])
+app.include_router(workout_plans.router, prefix=settings.API_V1_STR, tags=["workout-plans"])
+app.include_router(exercises.router, prefix=settings.API_V1_STR, tags=["exercises"])
 
 @app.get("/")
 @limiter.limit(f"{settings.RATE_LIMIT_PER_MINUTE}/minute")
@@ -118,4 +179,8 @@ async def read_root(request: Request):
 
 @app.get("/favicon.ico")
 async def favicon():
-    return Response(status_code=204)  # No content response
\ No newline at end of file
+    return Response(status_code=204)  # No content response
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint(principal=Depends(require_scope("admin"))):
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
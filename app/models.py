@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Enum, func
+from sqlalchemy import BigInteger, Boolean, Column, ForeignKey, Index, Integer, String, DateTime, Enum, func
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from .database import Base
@@ -17,46 +17,103 @@ class User(Base):
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
-    gym_ids = relationship("GymAccessID", back_populates="user")
-    workout_plans = relationship("WorkoutPlan", back_populates="user")
-    nutrition_plans = relationship("NutritionPlan", back_populates="user")
+    # Relationships are lazy="raise": a lazy load cannot run on an
+    # AsyncSession anyway, and queries must say what they load (selectinload
+    # / joinedload in crud.py) instead of issuing one SELECT per row.
+    gym_ids = relationship("GymAccessID", back_populates="user", lazy="raise")
+    workout_plans = relationship("WorkoutPlan", back_populates="user", lazy="raise")
+    nutrition_plans = relationship("NutritionPlan", back_populates="user", lazy="raise")
 
 class GymAccessID(Base):
     __tablename__ = "gym_access_ids"
+    # Keyset pages of one user's rows: WHERE user_id = ? AND id > ? ORDER BY id
+    __table_args__ = (Index("ix_gym_access_ids_user_id_id", "user_id", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     code = Column(String(12), unique=True, nullable=False, index=True)
     type = Column(Enum('normal', 'premium', name='gym_id_type'), nullable=False)
     is_used = Column(Boolean, default=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Indexed for the verification filter's refresh window
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
-    user = relationship("User", back_populates="gym_ids")
+    user = relationship("User", back_populates="gym_ids", lazy="raise")
+
+class GymIDRevocation(Base):
+    """One revocation or reinstatement of a code at a revocation list version."""
+    __tablename__ = "gym_id_revocations"
+    __table_args__ = (
+        Index("ix_gym_id_revocations_version", "version", unique=True),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    # From GymIDRevocationSequence, so versions commit in order; ids need not
+    version = Column(BigInteger, nullable=False)
+    code = Column(String(12), nullable=False, index=True)
+    revoked = Column(Boolean, nullable=False)
+    revoked_by = Column(Integer)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class GymIDRevocationSequence(Base):
+    """The single counter row behind GymIDRevocation.version."""
+    __tablename__ = "gym_id_revocation_sequence"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+class CheckInEvent(Base):
+    """One check-in or check-out scan; written in batches by utils.checkin_log."""
+    __tablename__ = "check_in_events"
+    __table_args__ = (
+        # Attendance by day, and the history of one code
+        Index("ix_check_in_events_scanned_at", "scanned_at"),
+        Index("ix_check_in_events_code_scanned_at", "code", "scanned_at"),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    code = Column(String(12), nullable=False)
+    type = Column(Enum('normal', 'premium', name='gym_id_type'), nullable=False)
+    gym_id = Column(Integer, nullable=False, server_default="1")
+    direction = Column(Enum('in', 'out', name='check_in_direction'), nullable=False, server_default="in")
+    # Who submitted the scan; no foreign key, so the log outlives deleted users
+    scanned_by = Column(Integer)
+    scanned_at = Column(DateTime, nullable=False)
+
+class GymIDSequence(Base):
+    __tablename__ = "gym_id_sequences"
+
+    type = Column(Enum('normal', 'premium', name='gym_id_type'), primary_key=True)
+    next_value = Column(BigInteger, nullable=False, default=0)
 
 class Exercise(Base):
     __tablename__ = "exercises"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
-    muscle_group = Column(String(255), nullable=False)
+    muscle_group = Column(String(255), nullable=False, index=True)
     media_url = Column(String(255))
     sets = Column(Integer)
     reps = Column(Integer)
-    created_at = Column(DateTime, default=datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
 class WorkoutPlan(Base):
     __tablename__ = "workout_plans"
+    __table_args__ = (Index("ix_workout_plans_user_id_id", "user_id", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     plan_name = Column(String(255), nullable=False)
-    created_at = Column(DateTime, default=datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    user = relationship("User", back_populates="workout_plans", lazy="raise")
+    exercises = relationship("Exercise", secondary="workout_plan_exercises", lazy="raise")
 
-    user = relationship("User", back_populates="workout_plans")
-    exercises = relationship("Exercise", secondary="workout_plan_exercises")
+    @property
+    def exercise_ids(self):
+        return [exercise.id for exercise in self.exercises]
 
 class WorkoutPlanExercise(Base):
     __tablename__ = "workout_plan_exercises"
@@ -66,21 +123,28 @@ class WorkoutPlanExercise(Base):
 
 class NutritionPlan(Base):
     __tablename__ = "nutrition_plans"
+    __table_args__ = (Index("ix_nutrition_plans_user_id_id", "user_id", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     plan_name = Column(String(255), nullable=False)
-    created_at = Column(DateTime, default=datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
-    user = relationship("User", back_populates="nutrition_plans")
+    user = relationship("User", back_populates="nutrition_plans", lazy="raise")
 
 class OTP(Base):
     __tablename__ = "otps"
+    __table_args__ = (
+        # verify_otp looks codes up by (username, otp_code); the purge task
+        # deletes by expires_at.
+        Index("ix_otps_username_otp_code", "username", "otp_code"),
+        Index("ix_otps_expires_at", "expires_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(255), ForeignKey("users.username", ondelete="CASCADE"))
     otp_code = Column(String(6), nullable=False)
     is_used = Column(Boolean, default=False)
     expires_at = Column(DateTime, nullable=False)
-    created_at = Column(DateTime, default=datetime.now(timezone.utc)) 
\ No newline at end of file
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc)) 
\ No newline at end of file
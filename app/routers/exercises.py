@@ -0,0 +1,114 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.database import get_async_db
+from app import crud
+from app.config import get_settings
+from app.schemas import ExerciseCreate, ExerciseOut, ExerciseUpdate
+from app.utils.auth import require_scope
+from app.utils.exercise_catalog import build_page, exercise_catalog, not_modified
+import logging
+
+router = APIRouter(
+    prefix="/exercises",
+    tags=["exercises"]
+)
+settings = get_settings()
+
+@router.get("", response_model=List[ExerciseOut])
+async def list_exercises(
+    request: Request,
+    muscle_group: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(settings.EXERCISE_CATALOG_PAGE_SIZE, ge=1, le=settings.EXERCISE_CATALOG_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """A page of the catalog, served from the page cache when it is current.
+
+    A cached page answers If-None-Match / If-Modified-Since without a query.
+    """
+    page = exercise_catalog.get(muscle_group, offset, limit)
+    if page is None:
+        version = exercise_catalog.version(muscle_group)
+        try:
+            exercises = await crud.get_exercises(db, muscle_group, offset, limit)
+        except Exception as e:
+            logging.error(f"Error listing exercises: {str(e)}", exc_info=True)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to list exercises: {str(e)}"
+            )
+        page = build_page(exercises)
+        exercise_catalog.set(muscle_group, offset, limit, version, page)
+    if not_modified(page, request.headers.get("if-none-match"), request.headers.get("if-modified-since")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=page.headers())
+    return Response(content=page.body, media_type="application/json", headers=page.headers())
+
+@router.get("/{exercise_id}", response_model=ExerciseOut)
+async def get_exercise(exercise_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_exercise = await crud.get_exercise(db, exercise_id)
+    if db_exercise is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exercise not found"
+        )
+    return db_exercise
+
+@router.post("", response_model=ExerciseOut, status_code=status.HTTP_201_CREATED)
+async def create_exercise(
+    exercise: ExerciseCreate,
+    principal=Depends(require_scope("admin")),
+    db: AsyncSession = Depends(get_async_db)
+):
+    try:
+        return await crud.create_exercise(db, exercise)
+    except Exception as e:
+        logging.error(f"Error creating exercise: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create exercise: {str(e)}"
+        )
+
+@router.patch("/{exercise_id}", response_model=ExerciseOut)
+async def update_exercise(
+    exercise_id: int,
+    exercise: ExerciseUpdate,
+    principal=Depends(require_scope("admin")),
+    db: AsyncSession = Depends(get_async_db)
+):
+    db_exercise = await crud.get_exercise(db, exercise_id)
+    if db_exercise is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exercise not found"
+        )
+    try:
+        return await crud.update_exercise(db, db_exercise, exercise)
+    except Exception as e:
+        logging.error(f"Error updating exercise: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update exercise: {str(e)}"
+        )
+
+@router.delete("/{exercise_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_exercise(
+    exercise_id: int,
+    principal=Depends(require_scope("admin")),
+    db: AsyncSession = Depends(get_async_db)
+):
+    db_exercise = await crud.get_exercise(db, exercise_id)
+    if db_exercise is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exercise not found"
+        )
+    try:
+        await crud.delete_exercise(db, db_exercise)
+    except Exception as e:
+        logging.error(f"Error deleting exercise: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to delete exercise: {str(e)}"
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,33 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import AsyncSessionLocal, get_async_db
+from app import crud
 from app.schemas import (
+    CheckInRequest,
+    CheckInResponse,
+    CheckOutRequest,
+    CheckOutResponse,
+    QRBatchRequest,
+    RedeemIDResponse,
+    RevocationDelta,
+    RevocationVersion,
+    SignedAccessIDResponse,
+    SigningKeyResponse,
+    VerifyTokenRequest,
+    VerifyTokenResponse,
     GenerateIDsRequest, 
+    GymIDType,
     GenerateIDsResponse, 
     VerifyIDRequest, 
     VerifyIDResponse,
     TokenData
 )
 from app.utils.id_generator import generate_unique_ids
-from app.utils.auth import get_current_user
+from app.utils.id_verifier import gym_id_verifier
+from app.utils.auth import get_current_user, require_scope
+from app.utils.checkin_log import checkin_log
+from app.utils.export import EXPORT_FORMATS, stream_rows
+from app.utils.occupancy import occupancy
+from app.utils.gym_codes import CODE_SPACE, decode_gym_id, has_valid_check_digit
+from app.utils.qr import QRUnavailable, etag_matches, qr_available, qr_cache, render_key
+from app.utils.qr_batch import BATCH_FORMATS, stream_batch
+from app.utils.signed_qr import (
+    InvalidAccessToken, QRSigningUnavailable, compact_delta, get_signer, issue_token, revocations, verify_token
+)
+from app.config import get_settings
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+import asyncio
+import base64
 import logging
+import time
 
 router = APIRouter(
     prefix="/gym-ids",
     tags=["gym-ids"]
 )
+settings = get_settings()
 
 @router.post("/generate", response_model=GenerateIDsResponse)
 async def generate_ids(
     request: GenerateIDsRequest,
-    db: Session = Depends(get_db)
+    principal=Depends(require_scope("admin")),
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        logging.info(f"Generating {request.type.value} IDs")
-        generated_ids = generate_unique_ids(db, request.type.value)
-        logging.info(f"Successfully generated IDs: {generated_ids}")
+        logging.info(f"Generating {request.count} {request.type.value} IDs")
+        generated_ids = await generate_unique_ids(db, request.type.value, request.count)
+        gym_id_verifier.add_codes(generated_ids)
+        logging.info(f"Successfully generated {len(generated_ids)} IDs")
         return GenerateIDsResponse(
-            message=f"10 {request.type.value} IDs generated successfully",
+            message=f"{len(generated_ids)} {request.type.value} IDs generated successfully",
             ids=generated_ids
         )
     except Exception as e:
@@ -41,32 +76,476 @@ async def generate_ids(
 async def verify_id(
     request: VerifyIDRequest,
     current_user: TokenData = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        # Check if the ID exists in the database
-        # TODO: Replace this with your actual database query
-        # For now, we'll just check the format
-        if request.access_id.startswith("QRG"):
+        id_type = "premium" if request.access_id.startswith("PREM") else "regular"
+        code_status = await gym_id_verifier.lookup(db, request.access_id)
+        if not code_status.exists:
             return VerifyIDResponse(
-                is_valid=True,
-                message="Regular access ID verified successfully",
-                id_type="regular"
+                is_valid=False,
+                message="Access ID not found",
+                id_type=id_type
             )
-        elif request.access_id.startswith("PREM"):
+        id_type = "premium" if code_status.type == "premium" else "regular"
+        if revocations.is_revoked(request.access_id):
             return VerifyIDResponse(
-                is_valid=True,
-                message="Premium access ID verified successfully",
-                id_type="premium"
+                is_valid=False,
+                message="Access ID has been revoked",
+                id_type=id_type
             )
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid ID format"
+        if code_status.is_used:
+            return VerifyIDResponse(
+                is_valid=False,
+                message="Access ID has already been used",
+                id_type=id_type
             )
+        return VerifyIDResponse(
+            is_valid=True,
+            message=f"{'Premium' if id_type == 'premium' else 'Regular'} access ID verified successfully",
+            id_type=id_type
+        )
     except Exception as e:
         logging.error(f"Error verifying ID: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to verify ID: {str(e)}"
-        ) 
\ No newline at end of file
+        )
+
+@router.post("/redeem", response_model=RedeemIDResponse)
+async def redeem_id(
+    request: VerifyIDRequest,
+    current_user: TokenData = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Use up a one-time access ID; only the first redeem of a code succeeds."""
+    if revocations.is_revoked(request.access_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Access ID has been revoked"
+        )
+    try:
+        redeemed = await crud.redeem_gym_access_id(db, request.access_id)
+        # Lost the race or nothing to redeem; the lookup tells which
+        code_status = await gym_id_verifier.lookup(db, request.access_id)
+    except Exception as e:
+        logging.error(f"Error redeeming ID: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to redeem ID: {str(e)}"
+        )
+    if not code_status.exists:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Access ID not found"
+        )
+    if not redeemed:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Access ID has already been used"
+        )
+    id_type = "premium" if code_status.type == "premium" else "regular"
+    return RedeemIDResponse(
+        redeemed=True,
+        message="Access ID redeemed successfully",
+        id_type=id_type
+    )
+
+@router.post("/check-in", response_model=CheckInResponse)
+async def check_in(
+    request: CheckInRequest,
+    current_user: TokenData = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Record an entry scan; every scan is logged, a repeated one is counted in occupancy once."""
+    try:
+        code_status = await gym_id_verifier.lookup(db, request.access_id)
+    except Exception as e:
+        logging.error(f"Error checking in ID: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to check in ID: {str(e)}"
+        )
+    if not code_status.exists:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Access ID not found"
+        )
+    if revocations.is_revoked(request.access_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Access ID has been revoked"
+        )
+    checkin_log.record(request.access_id, code_status.type, current_user.id, gym_id=request.gym_id)
+    occupancy.check_in(request.access_id, request.gym_id, code_status.type)
+    return CheckInResponse(
+        checked_in=True,
+        message="Check-in successful",
+        id_type="premium" if code_status.type == "premium" else "regular"
+    )
+
+# Fallback check-outs of one code run one at a time, so two of them cannot
+# both find the same check-in as its latest event
+_check_out_locks: Dict[str, list] = {}
+
+@asynccontextmanager
+async def _one_check_out(code: str):
+    entry = _check_out_locks.setdefault(code, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del _check_out_locks[code]
+
+@router.post("/check-out", response_model=CheckOutResponse)
+async def check_out(
+    request: CheckOutRequest,
+    current_user: TokenData = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Record that a checked-in member left; the check-out counts at the gym they entered."""
+    present = occupancy.check_out(request.access_id)
+    if present is not None:
+        gym_id, type = present
+        checkin_log.record(request.access_id, type, current_user.id, gym_id=gym_id, direction="out")
+    else:
+        # Checked in through another worker, or before a restart
+        async with _one_check_out(request.access_id):
+            # Under the log's lock every event is either buffered or committed
+            async with checkin_log.lock:
+                last = checkin_log.last_buffered(request.access_id)
+            if last is None:
+                try:
+                    since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=settings.OCCUPANCY_MAX_STAY_HOURS)
+                    last = await crud.get_last_check_in_event(db, request.access_id, since)
+                except Exception as e:
+                    logging.error(f"Error checking out ID: {str(e)}", exc_info=True)
+                    raise HTTPException(
+                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail=f"Failed to check out ID: {str(e)}"
+                    )
+            if last is None or last["direction"] != "in":
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Access ID is not checked in"
+                )
+            type = last["type"]
+            checkin_log.record(request.access_id, type, current_user.id, gym_id=last["gym_id"], direction="out")
+    return CheckOutResponse(
+        checked_out=True,
+        message="Check-out successful",
+        id_type="premium" if type == "premium" else "regular"
+    )
+
+@router.get("/occupancy")
+async def get_occupancy(current_user: TokenData = Depends(get_current_user)):
+    """Members currently inside, per gym and access type."""
+    return occupancy.snapshot()
+
+@router.get("/occupancy/stream")
+async def stream_occupancy(current_user: TokenData = Depends(get_current_user)):
+    """Server-sent events: the snapshot now and after every change, coalesced per OCCUPANCY_PUSH_SECONDS."""
+    async def events():
+        queue = occupancy.subscribe()
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), settings.OCCUPANCY_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield b": keep-alive\n\n"
+        finally:
+            occupancy.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/verify/stats")
+async def verify_cache_stats(current_user: TokenData = Depends(get_current_user)):
+    """Hit/miss/eviction counters of the verification cache and filter."""
+    return gym_id_verifier.stats()
+
+@router.get("/export")
+async def export_ids(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    type: Optional[GymIDType] = None,
+    is_used: Optional[bool] = None,
+    assigned: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    principal=Depends(require_scope("admin"))
+):
+    """Stream the matching IDs as CSV or NDJSON, e.g. ?type=premium&assigned=false for card printing.
+
+    created_from is inclusive and created_to exclusive.
+    """
+    query = crud.gym_ids_export_query(
+        type=type.value if type else None,
+        is_used=is_used,
+        assigned=assigned,
+        created_from=created_from,
+        created_to=created_to,
+    )
+    filename = f"gym-ids-{type.value if type else 'all'}.{format}"
+    return StreamingResponse(
+        stream_rows(AsyncSessionLocal, query, format, settings.EXPORT_BATCH_SIZE),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/{access_id}/qr")
+async def render_qr(
+    access_id: str = Path(..., pattern=r'^(QRG|PREM)\d{8}$'),
+    format: str = Query("png", pattern="^(png|svg)$"),
+    size: int = Query(settings.QR_DEFAULT_SIZE, ge=32, le=settings.QR_MAX_SIZE),
+    ec: str = Query("M", pattern="^[LMQH]$"),
+    border: int = Query(4, ge=0, le=16),
+    signed: bool = False,
+    if_none_match: Optional[str] = Header(None),
+    current_user: TokenData = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """The access ID as a QR image; size is in pixels (PNG is the largest module multiple that fits).
+
+    Renders are immutable, so the ETag is their content address and clients
+    may cache them for a year. With signed=true the image holds the signed
+    payload of the current window instead, cacheable until the window ends.
+    """
+    if settings.GYM_ID_REQUIRE_CHECK_DIGIT and not has_valid_check_digit(access_id):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Invalid access ID check digit"
+        )
+    # Resolved before the conditional check, so a deleted code is a 404, not a 304
+    try:
+        code_status = await gym_id_verifier.lookup(db, access_id)
+    except Exception as e:
+        logging.error(f"Error looking up ID for QR code: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to render QR code: {str(e)}"
+        )
+    if not code_status.exists:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Access ID not found"
+        )
+    data = access_id
+    cache_control = "private, max-age=31536000, immutable"
+    if signed:
+        # Signed like /signed: only unrevoked codes, with their stored type
+        if revocations.is_revoked(access_id):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Access ID has been revoked"
+            )
+        try:
+            data, payload = issue_token(access_id, code_status.type)
+        except QRSigningUnavailable as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e)
+            )
+        next_window = payload.not_before + settings.QR_TOKEN_WINDOW_DAYS * 86400
+        cache_control = f"private, max-age={max(0, next_window - int(time.time()))}"
+    key = render_key(data, format, size, ec, border)
+    headers = {"ETag": f'"{key}"', "Cache-Control": cache_control}
+    if etag_matches(if_none_match, key):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    entry = qr_cache.get(key)
+    if entry is None:
+        try:
+            entry = await asyncio.to_thread(qr_cache.load_or_render, key, data, format, size, ec, border)
+        except QRUnavailable as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e)
+            )
+        except Exception as e:
+            logging.error(f"Error rendering QR code: {str(e)}", exc_info=True)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to render QR code: {str(e)}"
+            )
+    return Response(content=entry.content, media_type=entry.media_type, headers=headers)
+
+@router.post("/qr-batch")
+async def render_qr_batch(
+    request: QRBatchRequest,
+    principal=Depends(require_scope("admin")),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Stream the QR codes of a code range as a ZIP of images or a PDF of card sheets.
+
+    The range is count codes in issue order starting at first_code; pass the
+    first ID and the count of a /generate response to print that run. Codes
+    in the range that were never issued are skipped.
+    """
+    if not qr_available():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="QR rendering needs the qrcode package"
+        )
+    code_status = await gym_id_verifier.lookup(db, request.first_code)
+    if not code_status.exists:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Access ID not found"
+        )
+    first_counter = decode_gym_id(request.first_code)
+    count = min(request.count, CODE_SPACE - first_counter)
+    filename = f"gym-ids-{request.first_code}-{count}.{request.format}"
+    return StreamingResponse(
+        stream_batch(
+            AsyncSessionLocal, request.type.value, first_counter, count, request.format,
+            request.image_format, request.size, request.ec, request.border
+        ),
+        media_type=BATCH_FORMATS[request.format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/signing-key", response_model=SigningKeyResponse)
+async def get_signing_key(current_user: TokenData = Depends(get_current_user)):
+    """What door controllers need to check signed payloads; HS256 keys are shared out of band."""
+    try:
+        signer = get_signer()
+    except QRSigningUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+    return SigningKeyResponse(
+        algorithm=signer.algorithm,
+        key_id=signer.key_id,
+        public_key=base64.urlsafe_b64encode(signer.public_key).decode().rstrip("=") if signer.public_key else None,
+    )
+
+@router.post("/verify-token", response_model=VerifyTokenResponse)
+async def verify_signed_id(
+    request: VerifyTokenRequest,
+    current_user: TokenData = Depends(get_current_user)
+):
+    """Check a signed payload against its signature, window and the revocation list; no database access."""
+    try:
+        payload = verify_token(request.token)
+    except InvalidAccessToken as e:
+        return VerifyTokenResponse(is_valid=False, message=str(e), id_type="unknown")
+    except QRSigningUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+    id_type = "premium" if payload.type == "premium" else "regular"
+    return VerifyTokenResponse(
+        is_valid=True,
+        message=f"{'Premium' if id_type == 'premium' else 'Regular'} access ID verified successfully",
+        id_type=id_type,
+        access_id=payload.code,
+        not_after=datetime.fromtimestamp(payload.not_after, timezone.utc),
+    )
+
+@router.get("/revocations", response_model=RevocationDelta)
+async def get_revocations(
+    since: int = Query(0, ge=0),
+    current_user: TokenData = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Changes to the revocation list after version since; since=0 returns the whole list."""
+    try:
+        rows = await crud.get_revocations_since(db, since, settings.QR_REVOCATION_DELTA_LIMIT)
+    except Exception as e:
+        logging.error(f"Error reading revocations: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to read revocations: {str(e)}"
+        )
+    revoked, restored = compact_delta(rows, full=since == 0)
+    return RevocationDelta(
+        version=rows[-1].version if rows else since,
+        revoked=revoked,
+        restored=restored,
+        more=len(rows) == settings.QR_REVOCATION_DELTA_LIMIT,
+    )
+
+@router.get("/{access_id}/signed", response_model=SignedAccessIDResponse)
+async def get_signed_id(
+    access_id: str = Path(..., pattern=r'^(QRG|PREM)\d{8}$'),
+    current_user: TokenData = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """The signed QR payload of an access ID for the current validity window."""
+    code_status = await gym_id_verifier.lookup(db, access_id)
+    if not code_status.exists:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Access ID not found"
+        )
+    if revocations.is_revoked(access_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Access ID has been revoked"
+        )
+    try:
+        token, payload = issue_token(access_id, code_status.type)
+        signer = get_signer()
+    except QRSigningUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+    return SignedAccessIDResponse(
+        token=token,
+        access_id=access_id,
+        id_type="premium" if code_status.type == "premium" else "regular",
+        not_before=datetime.fromtimestamp(payload.not_before, timezone.utc),
+        not_after=datetime.fromtimestamp(payload.not_after, timezone.utc),
+        algorithm=signer.algorithm,
+        key_id=signer.key_id,
+    )
+
+async def _set_revoked(access_id: str, revoked: bool, principal, db: AsyncSession) -> RevocationVersion:
+    code_status = await gym_id_verifier.lookup(db, access_id)
+    if not code_status.exists:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Access ID not found"
+        )
+    try:
+        version = await crud.add_revocation(db, access_id, revoked, principal.user.id)
+    except Exception as e:
+        logging.error(f"Error updating revocation of {access_id}: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update revocation: {str(e)}"
+        )
+    # This worker sees it at once; others within QR_REVOCATION_REFRESH_SECONDS
+    try:
+        await revocations.refresh()
+    except Exception as e:
+        logging.warning(f"Revocation list refresh failed: {str(e)}")
+    return RevocationVersion(version=version)
+
+@router.post("/{access_id}/revoke", response_model=RevocationVersion)
+async def revoke_id(
+    access_id: str = Path(..., pattern=r'^(QRG|PREM)\d{8}$'),
+    principal=Depends(require_scope("admin")),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Add the access ID to the revocation list; its signed payloads stop verifying."""
+    return await _set_revoked(access_id, True, principal, db)
+
+@router.post("/{access_id}/restore", response_model=RevocationVersion)
+async def restore_id(
+    access_id: str = Path(..., pattern=r'^(QRG|PREM)\d{8}$'),
+    principal=Depends(require_scope("admin")),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Take the access ID off the revocation list."""
+    return await _set_revoked(access_id, False, principal, db)
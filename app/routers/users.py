@@ -1,15 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Request, Response
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
-from typing import List
+from typing import List, Optional
 from .. import crud, schemas
-from ..database import get_db
-from ..utils.auth import create_access_token, create_refresh_token, verify_token, get_token_scopes, get_current_user
+from ..database import get_async_db
+from ..utils.auth import create_access_token, create_refresh_token, verify_token, get_token_scopes, grantable_scopes, get_current_user, PasswordHashingBusy, UserSnapshot
 from ..utils.otp import create_otp, verify_otp
-from ..utils.email_sms import send_otp_email
+from ..utils.notifications import notification_queue
 from ..config import get_settings
 from ..utils.limiter import limiter
+from ..utils.login_attempts import login_attempts
+from ..utils.pagination import InvalidCursor, decode_cursor, split_page
 import logging
 from ..models import User
 
@@ -39,51 +42,48 @@ async def signup_options():
 
 @router.post("/signup", response_model=schemas.UserOut)
 @limiter.limit(f"{settings.SIGNUP_RATE_LIMIT}/minute")
-async def signup(request: Request, user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def signup(request: Request, user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     client_ip = request.client.host
     logging.info(f"Signup attempt from IP: {client_ip}")
-    # Check if username exists
-    if crud.get_user_by_username(db, user.username):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already registered"
-        )
-    
-    # Check if email exists
-    if crud.get_user_by_email(db, user.email):
+    # The user and its OTP go in as one transaction. Duplicates are caught
+    # by the unique constraints on username and email rather than by
+    # SELECTs beforehand, which cost two round-trips and could race anyway.
+    try:
+        db_user = await crud.create_user(db, user, commit=False)
+        otp = await create_otp(db, db_user, commit=False)
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        field = crud.duplicate_user_field(e)
+        if field is None:
+            raise
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
+            detail="Email already registered" if field == "email" else "Username already registered"
         )
     
-    # Create user with hashed password
-    db_user = crud.create_user(db, user)
-    
-    # Generate and send OTP
-    otp = create_otp(db, db_user.username)
-    send_otp_email(db_user.email, otp.otp_code)
+    notification_queue.enqueue_otp_email(db_user.email, otp.otp_code)
     # if hasattr(user, 'phone_number') and user.phone_number:
-    #     send_otp_sms(user.phone_number, otp.otp_code)
+    #     notification_queue.enqueue_otp_sms(user.phone_number, otp.otp_code)
     
     return db_user
 
 @router.post("/verify-otp", response_model=schemas.Token)
 @limiter.limit(f"{settings.OTP_MAX_ATTEMPTS}/minute")
-async def verify_otp_endpoint(request: Request, otp_data: schemas.OTPVerify, db: Session = Depends(get_db)):
+async def verify_otp_endpoint(request: Request, otp_data: schemas.OTPVerify, db: AsyncSession = Depends(get_async_db)):
     client_ip = request.client.host
     logging.info(f"OTP verification attempt from IP: {client_ip}")
     
     try:
-        user = crud.get_user_by_username(db, otp_data.username)
+        user = await crud.get_user_by_username(db, otp_data.username)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid credentials"
             )
         
-        if verify_otp(db, otp_data.username, otp_data.otp_code):
-            user.is_active = True
-            db.commit()
+        if await verify_otp(db, otp_data.username, otp_data.otp_code):
+            await crud.set_user_active(db, user, True)
             
             access_token = create_access_token(
                 data={"sub": user.username, **get_token_scopes(["read"])},
@@ -103,7 +103,7 @@ async def verify_otp_endpoint(request: Request, otp_data: schemas.OTPVerify, db:
             detail="Invalid OTP code"
         )
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -111,11 +111,11 @@ async def verify_otp_endpoint(request: Request, otp_data: schemas.OTPVerify, db:
 
 @router.post("/resend-otp")
 @limiter.limit(f"{settings.OTP_MAX_ATTEMPTS}/minute")
-async def resend_otp_endpoint(request: Request, otp_data: schemas.ResendOTP, db: Session = Depends(get_db)):
+async def resend_otp_endpoint(request: Request, otp_data: schemas.ResendOTP, db: AsyncSession = Depends(get_async_db)):
     client_ip = request.client.host
     logging.info(f"OTP resend attempt from IP: {client_ip}")
     
-    user = crud.get_user_by_email(db, otp_data.email)
+    user = await crud.get_user_by_email(db, otp_data.email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -123,24 +123,35 @@ async def resend_otp_endpoint(request: Request, otp_data: schemas.ResendOTP, db:
         )
     
     # Generate and send new OTP
-    otp = create_otp(db, user.username)
-    send_otp_email(user.email, otp.otp_code)
+    otp = await create_otp(db, user)
+    notification_queue.enqueue_otp_email(user.email, otp.otp_code)
     
     return {"message": "OTP sent successfully"}
 
 @router.post("/token", response_model=schemas.Token)
 @limiter.limit(f"{settings.LOGIN_RATE_LIMIT}/minute")
-async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     client_ip = request.client.host
     logging.info(f"Login attempt from IP: {client_ip}")
+    # Checked before authenticate_user so a locked-out username or IP never
+    # reaches bcrypt.
+    retry_after = login_attempts.acquire(form_data.username, client_ip)
+    if retry_after is not None:
+        logging.info(f"Login blocked for IP: {client_ip}, retry after {retry_after}s")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts, try again later",
+            headers={"Retry-After": str(retry_after)},
+        )
     try:
-        user = crud.authenticate_user(db, form_data.username, form_data.password)
+        user = await crud.authenticate_user(db, form_data.username, form_data.password)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid credentials",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+        login_attempts.succeeded(form_data.username, client_ip)
         
         if not user.is_active:
             raise HTTPException(
@@ -151,7 +162,7 @@ async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends
 
         # Create tokens
         access_token = create_access_token(
-            data={"sub": user.username, **get_token_scopes(form_data.scopes)},
+            data={"sub": user.username, **get_token_scopes(grantable_scopes(user.username, form_data.scopes))},
             expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         )
         refresh_token = create_refresh_token(
@@ -163,8 +174,11 @@ async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends
             "refresh_token": refresh_token,
             "token_type": "bearer"
         }
+    except PasswordHashingBusy:
+        login_attempts.release(form_data.username, client_ip)
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=str(e),
@@ -173,7 +187,7 @@ async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends
 
 @router.post("/refresh", response_model=schemas.Token)
 @limiter.limit(f"{settings.LOGIN_RATE_LIMIT}/minute")
-async def refresh_token(request: Request, token_data: schemas.RefreshToken, db: Session = Depends(get_db)):
+async def refresh_token(request: Request, token_data: schemas.RefreshToken, db: AsyncSession = Depends(get_async_db)):
     client_ip = request.client.host
     logging.info(f"Token refresh attempt from IP: {client_ip}")
     try:
@@ -182,7 +196,7 @@ async def refresh_token(request: Request, token_data: schemas.RefreshToken, db:
         if not username:
             raise ValueError("Invalid token")
         
-        user = crud.get_user_by_username(db, username)
+        user = await crud.get_user_by_username(db, username)
         if not user or not user.is_active:
             raise ValueError("Invalid user")
         
@@ -208,17 +222,29 @@ async def refresh_token(request: Request, token_data: schemas.RefreshToken, db:
 @router.post("/gym-access-id", response_model=schemas.GymAccessIDCreate)
 async def create_gym_access_id(
     gym_id: schemas.GymAccessIDCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
-    return crud.create_gym_access_id(db=db, gym_id=gym_id)
+    return await crud.create_gym_access_id(db=db, gym_id=gym_id)
 
 @router.get("/gym-access-ids", response_model=List[schemas.GymAccessIDCreate])
 async def get_user_gym_access_ids(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
-    return crud.get_user_gym_ids(db=db, user_id=current_user.id)
+    """One page of the user's access IDs; X-Next-Cursor carries the cursor of the next page, if any."""
+    try:
+        after_id = decode_cursor(cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    rows = await crud.get_user_gym_ids(db=db, user_id=current_user.id, after_id=after_id, limit=limit)
+    page, next_cursor = split_page(rows, limit, key=lambda row: row["id"])
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return page
 
 @router.get("/signup")
 async def signup_get():
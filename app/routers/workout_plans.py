@@ -0,0 +1,98 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.database import get_async_db
+from app import crud
+from app.schemas import WorkoutPlanCreate, WorkoutPlanOut, WorkoutPlanUpdate
+from app.config import get_settings
+from app.utils.auth import UserSnapshot, get_current_user
+from app.utils.pagination import InvalidCursor, decode_cursor, split_page
+import logging
+
+router = APIRouter(
+    prefix="/workout-plans",
+    tags=["workout-plans"]
+)
+settings = get_settings()
+
+@router.post("", response_model=WorkoutPlanOut, status_code=status.HTTP_201_CREATED)
+async def create_workout_plan(
+    workout_plan: WorkoutPlanCreate,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    try:
+        return await crud.create_workout_plan(db, workout_plan, current_user.id)
+    except crud.UnknownExerciseIds as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logging.error(f"Error creating workout plan: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create workout plan: {str(e)}"
+        )
+
+@router.get("", response_model=List[WorkoutPlanOut])
+async def list_workout_plans(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """One page of the user's plans; X-Next-Cursor carries the cursor of the next page, if any."""
+    try:
+        after_id = decode_cursor(cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    plans = await crud.get_user_workout_plans(db, current_user.id, after_id=after_id, limit=limit)
+    page, next_cursor = split_page(plans, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return page
+
+@router.get("/{workout_plan_id}", response_model=WorkoutPlanOut)
+async def get_workout_plan(
+    workout_plan_id: int,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    db_workout_plan = await crud.get_workout_plan(db, workout_plan_id, user_id=current_user.id)
+    if db_workout_plan is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Workout plan not found"
+        )
+    return db_workout_plan
+
+@router.patch("/{workout_plan_id}", response_model=WorkoutPlanOut)
+async def update_workout_plan(
+    workout_plan_id: int,
+    workout_plan: WorkoutPlanUpdate,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    db_workout_plan = await crud.get_workout_plan(db, workout_plan_id, user_id=current_user.id)
+    if db_workout_plan is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Workout plan not found"
+        )
+    try:
+        return await crud.update_workout_plan(db, db_workout_plan, workout_plan)
+    except crud.UnknownExerciseIds as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logging.error(f"Error updating workout plan: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update workout plan: {str(e)}"
+        )
@@ -1,7 +1,11 @@
-from pydantic import BaseModel, EmailStr, Field, model_validator
+from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
 from datetime import datetime
 from typing import Optional, List
 from enum import Enum
+from .config import get_settings
+from .utils.gym_codes import has_valid_check_digit
+
+settings = get_settings()
 
 class GymIDType(str, Enum):
     normal = "normal"
@@ -78,6 +82,13 @@ class ExerciseBase(BaseModel):
 class ExerciseCreate(ExerciseBase):
     pass
 
+class ExerciseUpdate(BaseModel):
+    name: Optional[str] = None
+    muscle_group: Optional[str] = None
+    media_url: Optional[str] = None
+    sets: Optional[int] = None
+    reps: Optional[int] = None
+
 class ExerciseOut(ExerciseBase):
     id: int
     created_at: datetime
@@ -93,6 +104,10 @@ class WorkoutPlanBase(BaseModel):
 class WorkoutPlanCreate(WorkoutPlanBase):
     pass
 
+class WorkoutPlanUpdate(BaseModel):
+    plan_name: Optional[str] = None
+    exercise_ids: Optional[List[int]] = None
+
 class WorkoutPlanOut(WorkoutPlanBase):
     id: int
     user_id: int
@@ -123,6 +138,7 @@ class RefreshToken(BaseModel):
 
 class GenerateIDsRequest(BaseModel):
     type: GymIDType
+    count: int = Field(10, ge=1, le=settings.ID_GENERATION_MAX_COUNT)
 
 class GenerateIDsResponse(BaseModel):
     message: str
@@ -147,7 +163,84 @@ class GymAccessIDOut(GymAccessIDBase):
 class VerifyIDRequest(BaseModel):
     access_id: str = Field(..., pattern=r'^(QRG|PREM)\d{8}$')
 
+    @field_validator('access_id')
+    def check_digit_matches(cls, v):
+        if settings.GYM_ID_REQUIRE_CHECK_DIGIT and not has_valid_check_digit(v):
+            raise ValueError("Invalid access ID check digit")
+        return v
+
 class VerifyIDResponse(BaseModel):
     is_valid: bool
     message: str
-    id_type: str
\ No newline at end of file
+    id_type: str
+
+class RedeemIDResponse(BaseModel):
+    redeemed: bool
+    message: str
+    id_type: str
+
+class CheckInRequest(VerifyIDRequest):
+    gym_id: int = Field(settings.DEFAULT_GYM_ID, ge=1)
+
+class CheckOutRequest(VerifyIDRequest):
+    pass
+
+class CheckOutResponse(BaseModel):
+    checked_out: bool
+    message: str
+    id_type: str
+
+class CheckInResponse(BaseModel):
+    checked_in: bool
+    message: str
+    id_type: str
+
+class QRBatchRequest(BaseModel):
+    """count codes in issue order from first_code, e.g. one /generate run."""
+    type: GymIDType
+    first_code: str = Field(..., pattern=r'^(QRG|PREM)\d{8}$')
+    count: int = Field(..., ge=1, le=settings.QR_BATCH_MAX_CODES)
+    format: str = Field("zip", pattern="^(zip|pdf)$")
+    image_format: str = Field("png", pattern="^(png|svg)$")
+    size: int = Field(settings.QR_DEFAULT_SIZE, ge=32, le=settings.QR_MAX_SIZE)
+    ec: str = Field("M", pattern="^[LMQH]$")
+    border: int = Field(4, ge=0, le=16)
+
+    @model_validator(mode='after')
+    def first_code_matches_type(cls, model):
+        if not has_valid_check_digit(model.first_code):
+            raise ValueError("Invalid access ID check digit")
+        if model.first_code.startswith("PREM") != (model.type == GymIDType.premium):
+            raise ValueError("first_code is not a code of this type")
+        return model
+
+class SignedAccessIDResponse(BaseModel):
+    """QR payload of an access ID, verifiable offline; see utils.signed_qr."""
+    token: str
+    access_id: str
+    id_type: str
+    not_before: datetime
+    not_after: datetime
+    algorithm: str
+    key_id: str
+
+class VerifyTokenRequest(BaseModel):
+    token: str = Field(..., max_length=256)
+
+class VerifyTokenResponse(VerifyIDResponse):
+    access_id: Optional[str] = None
+    not_after: Optional[datetime] = None
+
+class SigningKeyResponse(BaseModel):
+    algorithm: str
+    key_id: str
+    public_key: Optional[str] = None  # base64url Ed25519 key; None for HS256
+
+class RevocationVersion(BaseModel):
+    version: int
+
+class RevocationDelta(RevocationVersion):
+    """Codes revoked and reinstated after since; fetch again with since=version while more is true."""
+    revoked: List[str]
+    restored: List[str]
+    more: bool
@@ -1,13 +1,19 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Dict
+from typing import Dict, NamedTuple
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from ..database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db
 from ..models import User
 from ..config import get_settings
+from .cache import LRUCache
+from .metrics import metrics
 
 settings = get_settings()
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -15,10 +21,45 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/users/token")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    start = time.perf_counter()
+    try:
+        return pwd_context.verify(plain_password, hashed_password)
+    finally:
+        metrics.observe_crypto("bcrypt_verify", time.perf_counter() - start)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    start = time.perf_counter()
+    try:
+        return pwd_context.hash(password)
+    finally:
+        metrics.observe_crypto("bcrypt_hash", time.perf_counter() - start)
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing pool already has its maximum of queued work."""
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the
+# event loop; the pending cap makes bursts fail fast instead of queueing
+# for seconds.
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+_hash_pending = 0
+
+async def _run_hashing(func, *args):
+    global _hash_pending
+    if _hash_pending >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_SIZE:
+        raise PasswordHashingBusy()
+    _hash_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_pending -= 1
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_hashing(get_password_hash, password)
 
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     to_encode = data.copy()
@@ -27,20 +68,28 @@ def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire, "type": "access"})
+    start = time.perf_counter()
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    metrics.observe_crypto("jwt_encode", time.perf_counter() - start)
     return encoded_jwt
 
 def create_refresh_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
     to_encode.update({"exp": expire, "type": "refresh"})
+    start = time.perf_counter()
     encoded_jwt = jwt.encode(to_encode, settings.REFRESH_SECRET_KEY, algorithm=settings.ALGORITHM)
+    metrics.observe_crypto("jwt_encode", time.perf_counter() - start)
     return encoded_jwt
 
 def verify_token(token: str, is_refresh: bool = False) -> Dict:
     try:
         secret_key = settings.REFRESH_SECRET_KEY if is_refresh else settings.SECRET_KEY
-        payload = jwt.decode(token, secret_key, algorithms=[settings.ALGORITHM])
+        start = time.perf_counter()
+        try:
+            payload = jwt.decode(token, secret_key, algorithms=[settings.ALGORITHM])
+        finally:
+            metrics.observe_crypto("jwt_decode", time.perf_counter() - start)
         if payload.get("type") != ("refresh" if is_refresh else "access"):
             raise ValueError("Invalid token type")
         return payload
@@ -50,20 +99,89 @@ def verify_token(token: str, is_refresh: bool = False) -> Dict:
 def get_token_scopes(scopes: list = None) -> dict:
     return {"scopes": scopes if scopes is not None else ["read"]}
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+class UserSnapshot(NamedTuple):
+    """The user fields request handlers need, detached from any session."""
+    id: int
+    username: str
+    email: str
+    is_active: bool
+
+class Principal(NamedTuple):
+    claims: Dict
+    user: UserSnapshot
+
+# Authenticated principals keyed by token signature. Entries never outlive
+# the token's exp; invalidate_user() drops a user's entries in this process
+# (other workers stop serving them after PRINCIPAL_CACHE_TTL_SECONDS).
+principal_cache = LRUCache(settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL_SECONDS)
+_user_versions: Dict[str, int] = {}
+
+def invalidate_user(username: str) -> None:
+    """Forget cached principals of a user, e.g. after deactivation or a password change."""
+    _user_versions[username] = _user_versions.get(username, 0) + 1
+
+def _cached_principal(token: str):
+    entry = principal_cache.get(token.rpartition(".")[2])
+    if entry is None:
+        return None
+    cached_token, version, principal = entry
+    if cached_token != token or version != _user_versions.get(principal.user.username, 0):
+        return None
+    return principal
+
+def _cache_principal(token: str, principal: Principal) -> None:
+    ttl = min(settings.PRINCIPAL_CACHE_TTL_SECONDS, principal.claims.get("exp", 0) - time.time())
+    if ttl > 0:
+        version = _user_versions.get(principal.user.username, 0)
+        principal_cache.set(token.rpartition(".")[2], (token, version, principal), ttl=ttl)
+
+async def get_current_principal(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    if settings.PRINCIPAL_CACHE_ENABLED:
+        principal = _cached_principal(token)
+        if principal is not None:
+            return principal
     try:
         payload = verify_token(token, is_refresh=False)
         username: str = payload.get("sub")
         if not username:
             raise credentials_exception
-        user = db.query(User).filter(User.username == username).first()
-        if not user:
+        result = await db.execute(select(User).filter(User.username == username))
+        user = result.scalars().first()
+        # Deactivated users lose access with their existing tokens too
+        if not user or not user.is_active:
             raise credentials_exception
-        return user
+        principal = Principal(
+            claims=payload,
+            user=UserSnapshot(id=user.id, username=user.username, email=user.email, is_active=bool(user.is_active)),
+        )
+        if settings.PRINCIPAL_CACHE_ENABLED:
+            _cache_principal(token, principal)
+        return principal
     except ValueError:
-        raise credentials_exception 
\ No newline at end of file
+        raise credentials_exception
+
+async def get_current_user(principal: Principal = Depends(get_current_principal)) -> UserSnapshot:
+    return principal.user
+
+def require_scope(scope: str):
+    """Dependency factory: the bearer token must carry scope, else 403."""
+    async def dependency(principal: Principal = Depends(get_current_principal)) -> Principal:
+        if scope not in principal.claims.get("scopes", []):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions",
+            )
+        return principal
+    return dependency
+
+def grantable_scopes(username: str, requested: list) -> list:
+    """Requested scopes minus "admin" for users not listed in ADMIN_USERNAMES."""
+    scopes = list(requested)
+    if username not in {name.strip() for name in settings.ADMIN_USERNAMES.split(",")}:
+        scopes = [scope for scope in scopes if scope != "admin"]
+    return scopes
@@ -0,0 +1,278 @@
+"""Write-behind log of check-in scans, inserted in batches by one flusher task.
+
+Rows that do not fit in the buffer, or whose flush fails, are spooled to
+CHECKIN_LOG_SPOOL_PATH (NDJSON) and replayed later; delivery is at-least-once.
+Workers share the spool, and a lock file lets one of them replay it at a time.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert
+
+from ..config import get_settings
+from ..database import AsyncSessionLocal
+from ..models import CheckInEvent
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+settings = get_settings()
+
+def _try_lock(file) -> bool:
+    """Take an exclusive lock on an open file without waiting; released when it is closed."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+def _from_spool(line: str) -> dict:
+    row = json.loads(line)
+    row["scanned_at"] = datetime.fromisoformat(row["scanned_at"])
+    # Spooled before events had a gym and direction
+    row.setdefault("gym_id", settings.DEFAULT_GYM_ID)
+    row.setdefault("direction", "in")
+    return row
+
+class CheckInLog:
+    def __init__(self, session_factory, batch_size: int, flush_seconds: float, maxsize: int,
+                 spool_path: Optional[str] = None):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.maxsize = maxsize
+        self.spool_path = spool_path or None
+        self._buffer: List[dict] = []
+        self._oldest: Optional[float] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # Held while rows move from the buffer to the table; see utils.occupancy
+        self.lock = asyncio.Lock()
+        self._stopping = False
+        self._spool_pending = bool(self.spool_path and (
+            os.path.exists(self.spool_path) or os.path.exists(f"{self.spool_path}.replay")
+        ))
+        self.recorded = 0
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.flush_failures = 0
+        self.last_flush_seconds = 0.0
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Stop the flusher, then write out the buffer (spooling what cannot be written)."""
+        if self._task is None:
+            return
+        # Not cancelled: a batch taken from the buffer must finish or be spooled
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        deadline = time.monotonic() + timeout
+        async with self.lock:
+            while self._buffer and time.monotonic() < deadline:
+                if not await self._flush():
+                    break
+        if self._buffer:
+            logging.warning(f"Check-in log stopping with {len(self._buffer)} events unwritten")
+            rows, self._buffer = self._buffer, []
+            self._spill(rows)
+
+    def record(self, code: str, type: str, scanned_by: Optional[int] = None,
+               gym_id: int = settings.DEFAULT_GYM_ID, direction: str = "in",
+               scanned_at: Optional[datetime] = None) -> bool:
+        """Buffer one scan; False if it had to be dropped."""
+        row = {
+            "code": code,
+            "type": type,
+            "gym_id": gym_id,
+            "direction": direction,
+            "scanned_by": scanned_by,
+            "scanned_at": scanned_at or datetime.now(timezone.utc).replace(tzinfo=None),
+        }
+        self.recorded += 1
+        if len(self._buffer) >= self.maxsize:
+            return self._spill([row])
+        if not self._buffer:
+            self._oldest = time.monotonic()
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            if self._buffer:
+                timeout = max(0.0, self._oldest + self.flush_seconds - time.monotonic())
+            else:
+                timeout = self.flush_seconds
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                async with self.lock:
+                    # A failed flush has just spooled its rows; retry on the next tick
+                    if self._buffer and not await self._flush():
+                        continue
+                    if self._spool_pending and not self._stopping:
+                        await self._replay()
+            except Exception as e:
+                # Keep flushing; losing this task would strand every later scan
+                logging.error(f"Check-in log flusher error: {str(e)}", exc_info=True)
+
+    async def _flush(self) -> bool:
+        rows, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+        self._oldest = time.monotonic() if self._buffer else None
+        if self._buffer and len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        start = time.perf_counter()
+        try:
+            await self._insert(rows)
+        except Exception as e:
+            self.flush_failures += 1
+            logging.error(f"Check-in log flush of {len(rows)} events failed: {str(e)}")
+            self._spill(rows)
+            return False
+        self.last_flush_seconds = time.perf_counter() - start
+        self.written += len(rows)
+        self.batches += 1
+        return True
+
+    async def _insert(self, rows: List[dict]) -> None:
+        async with self.session_factory() as db:
+            await db.execute(insert(CheckInEvent), rows)
+            await db.commit()
+
+    async def drain(self) -> bool:
+        """Write the whole buffer now; False if a flush failed (its rows were spooled).
+
+        Callers hold self.lock.
+        """
+        while self._buffer:
+            if not await self._flush():
+                return False
+        return True
+
+    def buffered(self) -> List[dict]:
+        return list(self._buffer)
+
+    def last_buffered(self, code: str) -> Optional[dict]:
+        """The newest buffered event of code, or None; callers hold self.lock."""
+        for row in reversed(self._buffer):
+            if row["code"] == code:
+                return row
+        return None
+
+    @property
+    def spool_pending(self) -> bool:
+        return self._spool_pending
+
+    def _spill(self, rows: List[dict]) -> bool:
+        if self.spool_path is None:
+            self.dropped += len(rows)
+            logging.error(f"Check-in log dropped {len(rows)} events")
+            return False
+        try:
+            with open(self.spool_path, "a", encoding="utf-8") as spool:
+                for row in rows:
+                    spool.write(json.dumps({**row, "scanned_at": row["scanned_at"].isoformat()}) + "\n")
+        except OSError as e:
+            self.dropped += len(rows)
+            logging.error(f"Check-in log could not spool {len(rows)} events: {str(e)}")
+            return False
+        self.spooled += len(rows)
+        self._spool_pending = True
+        return True
+
+    async def _replay(self) -> None:
+        """Move spooled rows into the table unless another worker is doing so."""
+        try:
+            lock = open(f"{self.spool_path}.lock", "a")
+        except OSError as e:
+            logging.error(f"Check-in log could not open its spool lock: {str(e)}")
+            return
+        with lock:
+            # Busy: the spool stays pending and is looked at again next tick
+            if _try_lock(lock):
+                await self._replay_spool()
+
+    async def _replay_spool(self) -> None:
+        """Move spooled rows into the table, batch_size at a time; callers hold the spool lock."""
+        replaying = f"{self.spool_path}.replay"
+        try:
+            # Scans spooled from now on go to a fresh file
+            if not os.path.exists(replaying):
+                os.replace(self.spool_path, replaying)
+            spool = open(replaying, encoding="utf-8")
+        except FileNotFoundError:
+            self._spool_pending = False
+            return
+        except OSError as e:
+            logging.error(f"Check-in log could not read its spool: {str(e)}")
+            return
+        self._spool_pending = False
+        replayed = 0
+        with spool:
+            while True:
+                lines = [line for _, line in zip(range(self.batch_size), spool)]
+                if not lines:
+                    break
+                try:
+                    await self._insert([_from_spool(line) for line in lines])
+                except Exception as e:
+                    logging.error(f"Check-in log replay stopped after {replayed} events: {str(e)}")
+                    # Hand the rest back to the live spool for the next attempt
+                    with open(self.spool_path, "a", encoding="utf-8") as live:
+                        live.writelines(lines)
+                        live.writelines(spool)
+                    self._spool_pending = True
+                    break
+                replayed += len(lines)
+                self.replayed += len(lines)
+        os.remove(replaying)
+        if replayed:
+            logging.info(f"Check-in log replayed {replayed} spooled events")
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "buffered": len(self._buffer),
+            "recorded": self.recorded,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "spooled": self.spooled,
+            "replayed": self.replayed,
+            "spool_pending": self._spool_pending,
+            "flush_failures": self.flush_failures,
+            "last_flush_seconds": round(self.last_flush_seconds, 4),
+        }
+
+checkin_log = CheckInLog(
+    AsyncSessionLocal,
+    batch_size=settings.CHECKIN_LOG_BATCH_SIZE,
+    flush_seconds=settings.CHECKIN_LOG_FLUSH_SECONDS,
+    maxsize=settings.CHECKIN_LOG_QUEUE_SIZE,
+    spool_path=settings.CHECKIN_LOG_SPOOL_PATH,
+)
@@ -1,12 +1,65 @@
 # This is a placeholder for email and SMS functionality
 # In a real application, you would integrate with email and SMS services
 # like SendGrid, Twilio, etc.
+import smtplib
+from email.message import EmailMessage
+from typing import List, Optional, Tuple
+from ..config import get_settings
+
+settings = get_settings()
 
 def send_otp_email(email: str, otp_code: str) -> bool:
     """Send OTP via email"""
-    # TODO: Implement email sending logic
-    print(f"Sending OTP {otp_code} to email {email}")
-    return True
+    return not send_email_batch([(email, "Your verification code", otp_email_body(otp_code))])[0]
+
+def otp_email_body(otp_code: str) -> str:
+    return (
+        f"Your verification code is {otp_code}.\n"
+        f"It expires in {settings.OTP_EXPIRATION_MINUTES} minutes."
+    )
+
+def send_email_batch(messages: List[Tuple[str, str, str]]) -> List[Optional[Exception]]:
+    """Send (recipient, subject, body) messages over a single SMTP connection.
+
+    Blocking; returns one entry per message, None when it was accepted or the
+    exception that made it fail. Without SMTP_HOST the messages are printed.
+    """
+    if not settings.SMTP_HOST:
+        for email, subject, body in messages:
+            print(f"Sending email '{subject}' to {email}: {body}")
+        return [None] * len(messages)
+
+    try:
+        smtp = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT_SECONDS)
+    except (OSError, smtplib.SMTPException) as e:
+        return [e] * len(messages)
+    results: List[Optional[Exception]] = []
+    try:
+        if settings.SMTP_STARTTLS:
+            smtp.starttls()
+        if settings.SMTP_USERNAME:
+            smtp.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+        for email, subject, body in messages:
+            message = EmailMessage()
+            message["From"] = settings.SMTP_FROM
+            message["To"] = email
+            message["Subject"] = subject
+            message.set_content(body)
+            try:
+                smtp.send_message(message)
+                results.append(None)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as e:
+                # Rejected by the server; the session itself is still usable
+                results.append(e)
+    except (OSError, smtplib.SMTPException) as e:
+        # Connection-level failure: everything not yet sent failed with it
+        results.extend([e] * (len(messages) - len(results)))
+    finally:
+        try:
+            smtp.quit()
+        except (OSError, smtplib.SMTPException):
+            pass
+    return results
 
 # def send_otp_sms(phone_number: str, otp_code: str):
 #     # SMS sending implementation
@@ -16,4 +69,4 @@ def send_otp_sms(phone_number: str, otp_code: str) -> bool:
     """Send OTP via SMS"""
     # TODO: Implement SMS sending logic
     print(f"Sending OTP {otp_code} to phone {phone_number}")
-    return True 
\ No newline at end of file
+    return True
@@ -0,0 +1,93 @@
+"""Versioned cache of serialized exercise catalog pages, with conditional GET support.
+
+A write bumps the version of each muscle group it touches (and of the
+unfiltered pages); a page cached under an older version is not served.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from pydantic import TypeAdapter
+
+from app.config import get_settings
+from app.schemas import ExerciseOut
+from app.utils.cache import LRUCache
+
+settings = get_settings()
+
+_pages_adapter = TypeAdapter(List[ExerciseOut])
+
+class CatalogPage(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: Optional[datetime]
+
+    def headers(self) -> Dict[str, str]:
+        # no-cache: clients may keep the page but must revalidate each use
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        return headers
+
+def _utc(value: datetime) -> datetime:
+    # DateTime columns come back naive from MySQL and SQLite; they hold UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+def build_page(exercises) -> CatalogPage:
+    body = _pages_adapter.dump_json(list(exercises))
+    stamps = [_utc(e.updated_at or e.created_at) for e in exercises if (e.updated_at or e.created_at)]
+    # Weak: GZipMiddleware may send the same page with a different encoding
+    etag = f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+    return CatalogPage(body, etag, max(stamps).replace(microsecond=0) if stamps else None)
+
+def not_modified(page: CatalogPage, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+    """Whether a conditional GET for page can be answered with 304 (RFC 9110 13.2.2)."""
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or page.etag.removeprefix("W/") in tags
+    if if_modified_since is None or page.last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return page.last_modified <= _utc(since)
+
+class ExerciseCatalogCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.pages = LRUCache(maxsize, ttl)
+        self._versions: Dict[Optional[str], int] = {}
+        self.stale = 0
+
+    def version(self, muscle_group: Optional[str]) -> int:
+        return self._versions.get(muscle_group, 0)
+
+    def get(self, muscle_group: Optional[str], offset: int, limit: int) -> Optional[CatalogPage]:
+        entry = self.pages.get((muscle_group, offset, limit))
+        if entry is None:
+            return None
+        version, page = entry
+        if version != self.version(muscle_group):
+            self.stale += 1
+            return None
+        return page
+
+    def set(self, muscle_group: Optional[str], offset: int, limit: int, version: int, page: CatalogPage) -> None:
+        self.pages.set((muscle_group, offset, limit), (version, page))
+
+    def invalidate(self, muscle_groups: Iterable[str]) -> None:
+        """Drop the pages of muscle_groups and all unfiltered pages."""
+        for muscle_group in {*muscle_groups, None}:
+            self._versions[muscle_group] = self._versions.get(muscle_group, 0) + 1
+
+    def clear(self) -> None:
+        self.pages.clear()
+        self._versions.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.pages.stats(), "stale": self.stale}
+
+exercise_catalog = ExerciseCatalogCache(
+    settings.EXERCISE_CATALOG_CACHE_SIZE, settings.EXERCISE_CATALOG_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,53 @@
+"""Streaming CSV / NDJSON export of query results, encoded one server-side cursor batch at a time."""
+import csv
+import io
+import json
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Sequence
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def encode_csv(rows: Sequence, columns: Sequence[str] = None) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if columns is not None:
+        writer.writerow(columns)
+    writer.writerows([_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+def encode_ndjson(rows: Sequence, columns: Sequence[str]) -> bytes:
+    return "".join(
+        json.dumps(dict(zip(columns, map(_value, row))), separators=(",", ":")) + "\n" for row in rows
+    ).encode()
+
+async def stream_rows(session_factory, query, export_format: str, batch_size: int) -> AsyncIterator[bytes]:
+    """Yield query's rows encoded as export_format, one batch_size chunk at a time.
+
+    Opens its own session: StreamingResponse runs this after the request's
+    dependencies (and their session) have been closed.
+    """
+    columns = [column.name for column in query.selected_columns]
+    if export_format == "csv":
+        yield encode_csv([], columns)
+    exported = 0
+    try:
+        async with session_factory() as db:
+            result = await db.stream(query.execution_options(yield_per=batch_size))
+            async for partition in result.partitions():
+                exported += len(partition)
+                if export_format == "csv":
+                    yield encode_csv(partition)
+                else:
+                    yield encode_ndjson(partition, columns)
+    except Exception as e:
+        # Headers are already sent; all that can be done is end the body early
+        logging.error(f"Export failed after {exported} rows: {str(e)}", exc_info=True)
+        raise
+    logging.info(f"Exported {exported} rows as {export_format}")
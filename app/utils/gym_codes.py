@@ -0,0 +1,97 @@
+"""Gym access codes: prefix + 7 digits (a keyed permutation of a per-type counter) + Damm check digit."""
+import hashlib
+from ..config import get_settings
+
+settings = get_settings()
+
+PREFIXES = {"normal": "QRG", "premium": "PREM"}
+BODY_DIGITS = 7
+CODE_SPACE = 10 ** BODY_DIGITS  # distinct codes available per type
+_LEFT_DIGITS = BODY_DIGITS // 2
+_RIGHT_DIGITS = BODY_DIGITS - _LEFT_DIGITS
+_ROUNDS = 10
+
+_DAMM_TABLE = (
+    (0, 3, 1, 7, 5, 9, 8, 6, 4, 2),
+    (7, 0, 9, 2, 1, 5, 4, 8, 6, 3),
+    (4, 2, 0, 6, 8, 7, 1, 3, 5, 9),
+    (1, 7, 5, 0, 9, 8, 3, 4, 2, 6),
+    (6, 1, 2, 3, 0, 4, 5, 9, 7, 8),
+    (3, 6, 7, 4, 2, 0, 9, 5, 8, 1),
+    (5, 8, 6, 9, 7, 2, 0, 1, 3, 4),
+    (8, 9, 4, 5, 3, 6, 2, 0, 1, 7),
+    (9, 4, 3, 8, 6, 1, 7, 2, 0, 5),
+    (2, 5, 8, 1, 4, 3, 6, 7, 9, 0),
+)
+
+def get_prefix(type: str) -> str:
+    return PREFIXES["normal"] if type == "normal" else PREFIXES["premium"]
+
+def damm_check_digit(digits: str) -> str:
+    """Return the Damm check digit for a string of decimal digits."""
+    interim = 0
+    for digit in digits:
+        interim = _DAMM_TABLE[interim][ord(digit) - 48]
+    return str(interim)
+
+def _round_value(key: bytes, round_index: int, value: int, width: int) -> int:
+    digest = hashlib.blake2b(
+        round_index.to_bytes(1, "big") + value.to_bytes(8, "big"),
+        key=key,
+        digest_size=8,
+    ).digest()
+    return int.from_bytes(digest, "big") % (10 ** width)
+
+def permute(value: int, key: bytes) -> int:
+    """Map value in [0, CODE_SPACE) to a unique value in the same range.
+
+    An alternating-width Feistel network (as in NIST FF1) over the decimal
+    halves of the number; every round is invertible, so the whole mapping
+    is a bijection for a given key.
+    """
+    if not 0 <= value < CODE_SPACE:
+        raise ValueError("Counter value outside the gym ID code space")
+    left, right = divmod(value, 10 ** _RIGHT_DIGITS)
+    for round_index in range(_ROUNDS):
+        width = _LEFT_DIGITS if round_index % 2 == 0 else _RIGHT_DIGITS
+        left, right = right, (left + _round_value(key, round_index, right, width)) % (10 ** width)
+    return left * 10 ** _RIGHT_DIGITS + right
+
+def unpermute(value: int, key: bytes) -> int:
+    """Inverse of permute: the counter value that maps to value."""
+    if not 0 <= value < CODE_SPACE:
+        raise ValueError("Value outside the gym ID code space")
+    left, right = divmod(value, 10 ** _RIGHT_DIGITS)
+    for round_index in reversed(range(_ROUNDS)):
+        width = _LEFT_DIGITS if round_index % 2 == 0 else _RIGHT_DIGITS
+        left, right = (right - _round_value(key, round_index, left, width)) % (10 ** width), left
+    return left * 10 ** _RIGHT_DIGITS + right
+
+class PermutationKeyMissing(RuntimeError):
+    pass
+
+def check_permutation_key() -> None:
+    if not settings.GYM_ID_PERMUTATION_KEY:
+        raise PermutationKeyMissing("GYM_ID_PERMUTATION_KEY must be set to a stable, dedicated value")
+
+def _type_key(type: str) -> bytes:
+    check_permutation_key()
+    return hashlib.blake2b(f"{settings.GYM_ID_PERMUTATION_KEY}:{type}".encode(), digest_size=32).digest()
+
+def encode_gym_id(type: str, counter: int) -> str:
+    """Build the gym access code for the given counter value."""
+    body = str(permute(counter, _type_key(type))).zfill(BODY_DIGITS)
+    return f"{get_prefix(type)}{body}{damm_check_digit(body)}"
+
+def decode_gym_id(code: str) -> int:
+    """The counter value encode_gym_id maps to code; ValueError for malformed codes."""
+    type = "premium" if code.startswith(PREFIXES["premium"]) else "normal"
+    if not code.startswith(get_prefix(type)) or not has_valid_check_digit(code):
+        raise ValueError("Not a gym access code")
+    return unpermute(int(code[len(get_prefix(type)):][:BODY_DIGITS]), _type_key(type))
+
+def has_valid_check_digit(code: str) -> bool:
+    """True if the digits after the prefix end in a correct Damm check digit."""
+    prefix = next((prefix for prefix in PREFIXES.values() if code.startswith(prefix)), "")
+    digits = code.removeprefix(prefix)
+    return len(digits) == BODY_DIGITS + 1 and digits.isdigit() and damm_check_digit(digits) == "0"
@@ -1,47 +1,88 @@
-import random
-import string
-from typing import List
-from sqlalchemy.orm import Session
-from app.models import GymAccessID
+from typing import Iterable, List, Set
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import GymAccessID, GymIDSequence
+from app.config import get_settings
+from app.utils.gym_codes import CODE_SPACE, encode_gym_id
 import logging
 
-def generate_gym_id(type: str) -> str:
-    """Generate a single gym ID based on type."""
-    try:
-        prefix = "QRG" if type == "normal" else "PREM"
-        # Generate 8 random digits
-        digits = ''.join(random.choices(string.digits, k=8))
-        return f"{prefix}{digits}"
-    except Exception as e:
-        logging.error(f"Error generating gym ID: {str(e)}", exc_info=True)
-        raise
+settings = get_settings()
+
+async def reserve_sequence_block(db: AsyncSession, type: str, size: int) -> int:
+    """Reserve size consecutive counter values for type and return the first.
+
+    The increment is a single UPDATE, so concurrent generators always get
+    disjoint blocks. The caller commits; values of a failed run are simply
+    skipped.
+    """
+    increment = (
+        update(GymIDSequence)
+        .where(GymIDSequence.type == type)
+        .values(next_value=GymIDSequence.next_value + size)
+    )
+    if (await db.execute(increment)).rowcount == 0:
+        # First allocation for this type: create the counter row
+        try:
+            db.add(GymIDSequence(type=type, next_value=size))
+            await db.flush()
+            start = 0
+        except IntegrityError:
+            # Another generator created the row first
+            await db.rollback()
+            await db.execute(increment)
+            start = None
+    else:
+        start = None
+    if start is None:
+        start = await db.scalar(select(GymIDSequence.next_value).where(GymIDSequence.type == type)) - size
+    if start + size > CODE_SPACE:
+        raise Exception(f"No {type} gym IDs left to allocate")
+    return start
+
+async def get_existing_codes(db: AsyncSession, codes: Iterable[str]) -> Set[str]:
+    """Return the subset of codes already stored, using a single IN query."""
+    result = await db.execute(select(GymAccessID.code).where(GymAccessID.code.in_(list(codes))))
+    return set(result.scalars())
 
-def generate_unique_ids(db: Session, type: str, count: int = 10) -> List[str]:
-    """Generate multiple unique gym IDs and save them to database."""
+async def generate_unique_ids(db: AsyncSession, type: str, count: int = 10, batch_size: int = None) -> List[str]:
+    """Generate multiple unique gym IDs and save them to database.
+
+    Codes come from a reserved block of the per-type counter, so they are
+    unique by construction and are inserted in chunks of batch_size with one
+    multi-row insert each. While random legacy codes may still be in the
+    table (GYM_ID_COLLISION_CHECK), each chunk is also screened with one IN
+    query and any clash is replaced from a fresh block.
+    """
+    batch_size = batch_size or settings.ID_GENERATION_BATCH_SIZE
     try:
         generated_ids = []
-        attempts = 0
-        max_attempts = count * 3  # Allow some extra attempts for collision resolution
-        
-        while len(generated_ids) < count and attempts < max_attempts:
-            new_id = generate_gym_id(type)
-            
-            # Check if ID already exists in database
-            existing = db.query(GymAccessID).filter(GymAccessID.code == new_id).first()
-            if not existing and new_id not in generated_ids:
-                # Create new gym ID record
-                gym_id = GymAccessID(code=new_id, type=type)
-                db.add(gym_id)
-                generated_ids.append(new_id)
-            
-            attempts += 1
-        
-        if len(generated_ids) < count:
-            raise Exception("Failed to generate requested number of unique IDs")
-        
-        db.commit()
+        start = await reserve_sequence_block(db, type, count)
+        await db.commit()  # release the counter row before the insert phase
+        pending = range(start, start + count)
+
+        while pending:
+            for chunk_start in range(pending.start, pending.stop, batch_size):
+                chunk_end = min(chunk_start + batch_size, pending.stop)
+                codes = [encode_gym_id(type, value) for value in range(chunk_start, chunk_end)]
+                if settings.GYM_ID_COLLISION_CHECK:
+                    existing = await get_existing_codes(db, codes)
+                    if existing:
+                        logging.warning(f"Skipping {len(existing)} gym IDs that clash with legacy codes")
+                        codes = [code for code in codes if code not in existing]
+                if codes:
+                    await db.execute(insert(GymAccessID), [{"code": code, "type": type} for code in codes])
+                    generated_ids.extend(codes)
+
+            shortfall = count - len(generated_ids)
+            pending = range(0)
+            if shortfall:
+                start = await reserve_sequence_block(db, type, shortfall)
+                pending = range(start, start + shortfall)
+
+        await db.commit()
         return generated_ids
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logging.error(f"Error in generate_unique_ids: {str(e)}", exc_info=True)
-        raise 
\ No newline at end of file
+        raise
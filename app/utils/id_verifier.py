@@ -0,0 +1,177 @@
+"""Cached gym ID lookups: a Bloom filter rejects unknown codes, an LRU+TTL cache holds recent statuses."""
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Iterable, NamedTuple, Optional
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import AsyncSessionLocal
+from app.models import GymAccessID
+from app.config import get_settings
+from app.utils.cache import BloomFilter, LRUCache
+
+settings = get_settings()
+
+class CodeStatus(NamedTuple):
+    exists: bool
+    type: Optional[str] = None
+    is_used: bool = False
+
+NOT_FOUND = CodeStatus(exists=False)
+
+class GymIDVerifier:
+    def __init__(
+        self,
+        cache_size: int,
+        cache_ttl: float,
+        session_factory=None,
+        bloom_enabled: bool = True,
+        bloom_capacity: int = 1_000_000,
+        bloom_error_rate: float = 0.001,
+        bloom_refresh_seconds: float = 5.0,
+        bloom_overlap_seconds: float = 300.0,
+        bloom_rebuild_seconds: float = 900.0,
+    ):
+        self.cache = LRUCache(cache_size, cache_ttl)
+        self.session_factory = session_factory
+        self.bloom_enabled = bloom_enabled
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        self.bloom_refresh_seconds = bloom_refresh_seconds
+        self.bloom_overlap_seconds = bloom_overlap_seconds
+        self.bloom_rebuild_seconds = bloom_rebuild_seconds
+        self._bloom: Optional[BloomFilter] = None
+        # Database time the last load started; refreshes re-read rows created
+        # since shortly before it, so rows that commit out of id order are
+        # still picked up.
+        self._loaded_since = None
+        self._refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.bloom_rejections = 0
+        self.db_lookups = 0
+        self.rebuild_failures = 0
+
+    async def lookup(self, db: AsyncSession, code: str) -> CodeStatus:
+        """Return the stored status of code, touching the DB only when needed."""
+        status = self.cache.get(code)
+        if status is not None:
+            return status
+        if self.bloom_enabled and not await self._might_exist(db, code):
+            self.bloom_rejections += 1
+            return NOT_FOUND
+
+        self.db_lookups += 1
+        row = (await db.execute(
+            select(GymAccessID.type, GymAccessID.is_used).where(GymAccessID.code == code)
+        )).first()
+        status = CodeStatus(True, row.type, bool(row.is_used)) if row else NOT_FOUND
+        self.cache.set(code, status)
+        return status
+
+    def add_codes(self, codes: Iterable[str]) -> None:
+        """Record newly created codes so they pass the filter immediately."""
+        for code in codes:
+            self.cache.delete(code)
+            if self._bloom is not None:
+                self._bloom.add(code)
+
+    def invalidate(self, code: str) -> None:
+        """Drop the cached status of code after it was changed."""
+        self.cache.delete(code)
+
+    def reset(self) -> None:
+        self.cache.clear()
+        self._bloom = None
+        self._loaded_since = None
+        self._refreshed_at = 0.0
+
+    def start(self) -> None:
+        """Load the filter in the background, then rebuild it every bloom_rebuild_seconds."""
+        if self.bloom_enabled and self._task is None:
+            self._task = asyncio.create_task(self._rebuild_periodically())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _might_exist(self, db: AsyncSession, code: str) -> bool:
+        if self._bloom is None:
+            # Not loaded yet: ask the database
+            return True
+        if code in self._bloom:
+            return True
+        # Codes created by other workers reach this filter on the next
+        # refresh; a negative answer triggers at most one per interval.
+        if time.monotonic() - self._refreshed_at >= self.bloom_refresh_seconds and not self._lock.locked():
+            await self.refresh(db)
+            return code in self._bloom
+        return False
+
+    async def rebuild(self, db: AsyncSession) -> None:
+        """Replace the filter with one loaded from every stored code."""
+        async with self._lock:
+            total = await db.scalar(select(func.count(GymAccessID.id))) or 0
+            bloom = BloomFilter(max(self.bloom_capacity, total * 2), self.bloom_error_rate)
+            self._loaded_since = await self._load(db, bloom)
+            self._bloom = bloom
+            self._refreshed_at = time.monotonic()
+        logging.info(f"Loaded {bloom.count} gym IDs into the verification filter")
+
+    async def refresh(self, db: AsyncSession) -> None:
+        """Add codes created since shortly before the last load to the filter."""
+        if self._bloom is None or self._bloom.count >= self._bloom.capacity:
+            await self.rebuild(db)
+            return
+        async with self._lock:
+            since = self._loaded_since - timedelta(seconds=self.bloom_overlap_seconds)
+            self._loaded_since = await self._load(db, self._bloom, GymAccessID.created_at >= since)
+            self._refreshed_at = time.monotonic()
+
+    async def _load(self, db: AsyncSession, bloom: BloomFilter, *criteria):
+        """Add the codes matching criteria to bloom; returns the database time the scan started."""
+        started = await db.scalar(select(func.now()))
+        rows = await db.stream(
+            select(GymAccessID.code).where(*criteria).execution_options(yield_per=10_000)
+        )
+        async for (code,) in rows:
+            bloom.add(code)
+        return started
+
+    async def _rebuild_periodically(self) -> None:
+        while True:
+            try:
+                async with self.session_factory() as db:
+                    await self.rebuild(db)
+            except Exception as e:
+                self.rebuild_failures += 1
+                logging.error(f"Gym ID filter rebuild failed: {str(e)}")
+            await asyncio.sleep(self.bloom_rebuild_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "cache": self.cache.stats(),
+            "bloom": {
+                "enabled": self.bloom_enabled,
+                "loaded": self._bloom is not None,
+                "codes": self._bloom.count if self._bloom is not None else 0,
+                "rejections": self.bloom_rejections,
+                "rebuild_failures": self.rebuild_failures,
+            },
+            "db_lookups": self.db_lookups,
+        }
+
+gym_id_verifier = GymIDVerifier(
+    cache_size=settings.GYM_ID_CACHE_SIZE,
+    cache_ttl=settings.GYM_ID_CACHE_TTL_SECONDS,
+    session_factory=AsyncSessionLocal,
+    bloom_enabled=settings.GYM_ID_BLOOM_ENABLED,
+    bloom_capacity=settings.GYM_ID_BLOOM_CAPACITY,
+    bloom_error_rate=settings.GYM_ID_BLOOM_ERROR_RATE,
+    bloom_refresh_seconds=settings.GYM_ID_BLOOM_REFRESH_SECONDS,
+    bloom_overlap_seconds=settings.GYM_ID_BLOOM_OVERLAP_SECONDS,
+    bloom_rebuild_seconds=settings.GYM_ID_BLOOM_REBUILD_SECONDS,
+)
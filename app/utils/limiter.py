@@ -1,5 +1,164 @@
+import importlib.util
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from math import floor
+from limits.storage import Storage
+from limits.storage.base import SlidingWindowCounterSupport, TimestampedSlidingWindow
 from slowapi import Limiter
 from slowapi.util import get_remote_address
+from ..config import get_settings
+
+settings = get_settings()
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """Rate limit storage in a SQLite file shared by every worker on the host.
+
+    Registered for ``sqlite:///relative/path.db`` and ``sqlite:////abs/path.db``.
+    Each decision is one short ``BEGIN IMMEDIATE`` transaction, so workers
+    never over-admit; with the sliding window counter strategy a key costs
+    two rows at most and expired rows are purged as the table is used.
+    Putting the file on tmpfs (e.g. /dev/shm) keeps it in shared memory.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+    PURGE_EVERY = 1000  # decisions between sweeps of expired rows
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        self.path = uri.split("sqlite:///", 1)[1] or ":memory:"
+        self._local = threading.local()
+        self._calls = 0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self._connection()
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits ("
+                "key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _get(conn: sqlite3.Connection, key: str, now: float) -> int:
+        row = conn.execute(
+            "SELECT value FROM rate_limits WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _incr(conn: sqlite3.Connection, key: str, expiry: float, amount: int, now: float) -> int:
+        # The expiry is set when the key is (re)created, like MemoryStorage
+        conn.execute(
+            "INSERT INTO rate_limits (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET "
+            "value = CASE WHEN expires_at > ? THEN value + excluded.value ELSE excluded.value END, "
+            "expires_at = CASE WHEN expires_at > ? THEN expires_at ELSE excluded.expires_at END",
+            (key, amount, now + expiry, now, now),
+        )
+        return SQLiteStorage._get(conn, key, now)
+
+    def _maybe_purge(self, conn: sqlite3.Connection, now: float) -> None:
+        self._calls += 1
+        if self._calls % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM rate_limits WHERE expires_at <= ?", (now,))
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = time.time()
+        with self._transaction() as conn:
+            self._maybe_purge(conn, now)
+            return self._incr(conn, key, expiry, amount, now)
+
+    def get(self, key: str) -> int:
+        return self._get(self._connection(), key, time.time())
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        row = self._connection().execute(
+            "SELECT expires_at FROM rate_limits WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        return row[0] if row else now
+
+    def check(self) -> bool:
+        try:
+            self._connection().execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int:
+        with self._transaction() as conn:
+            return conn.execute("DELETE FROM rate_limits").rowcount
+
+    def clear(self, key: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM rate_limits WHERE key = ?", (key,))
+
+    @staticmethod
+    def _window_info(previous_count: int, current_count: int, expiry: int, now: float):
+        # Same weighting as limits' MemoryStorage
+        previous_ttl = 0.0 if previous_count == 0 else (1 - (((now - expiry) / expiry) % 1)) * expiry
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        now = time.time()
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        with self._transaction() as conn:
+            self._maybe_purge(conn, now)
+            previous_count, previous_ttl, current_count, _ = self._window_info(
+                self._get(conn, previous_key, now), self._get(conn, current_key, now), expiry, now
+            )
+            if floor(previous_count * previous_ttl / expiry + current_count) + amount > limit:
+                return False
+            self._incr(conn, current_key, 2 * expiry, amount, now)
+            return True
+
+    def get_sliding_window(self, key: str, expiry: int):
+        now = time.time()
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        conn = self._connection()
+        return self._window_info(self._get(conn, previous_key, now), self._get(conn, current_key, now), expiry, now)
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        now = time.time()
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM rate_limits WHERE key IN (?, ?)", (previous_key, current_key))
+
+def check_storage_uri(uri: str) -> str:
+    """Fail at startup, not on the first request, when a Redis store has no client."""
+    if uri.split(":", 1)[0] in ("redis", "rediss", "redis+unix") and importlib.util.find_spec("redis") is None:
+        raise RuntimeError(f"RATE_LIMIT_STORAGE_URI {uri.split('://')[0]}:// needs the redis package")
+    return uri
 
 # Create a single limiter instance to be used across the application
-limiter = Limiter(key_func=get_remote_address) 
\ No newline at end of file
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=check_storage_uri(settings.RATE_LIMIT_STORAGE_URI),
+    strategy=settings.RATE_LIMIT_STRATEGY,
+)
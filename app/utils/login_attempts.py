@@ -0,0 +1,162 @@
+"""Per-username and per-IP failed login budgets, checked before any bcrypt work."""
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from ..config import get_settings
+
+settings = get_settings()
+
+class _BucketedCounter:
+    """Counts events per key over a sliding window made of fixed time buckets.
+
+    Each key keeps at most `buckets` [bucket_index, count] pairs, and at most
+    `maxsize` keys are tracked (least recently touched keys are dropped
+    first), so memory stays bounded no matter how many usernames or IPs an
+    attacker cycles through.
+    """
+
+    def __init__(self, limit: int, window_seconds: float, buckets: int, maxsize: int):
+        self.limit = limit
+        self.buckets = buckets
+        self.bucket_seconds = window_seconds / buckets
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, List[List[int]]]" = OrderedDict()
+        self.evictions = 0
+
+    def _current_bucket(self, now: float) -> int:
+        return int(now // self.bucket_seconds)
+
+    def _live(self, key: str, now: float) -> Optional[List[List[int]]]:
+        entries = self._data.get(key)
+        if entries is None:
+            return None
+        oldest = self._current_bucket(now) - self.buckets + 1
+        while entries and entries[0][0] < oldest:
+            entries.pop(0)
+        if not entries:
+            del self._data[key]
+            return None
+        return entries
+
+    def count(self, key: str, now: float) -> int:
+        entries = self._live(key, now)
+        return sum(count for _, count in entries) if entries else 0
+
+    def retry_after(self, key: str, now: float) -> float:
+        """Seconds until enough buckets age out for the key to drop below the limit."""
+        entries = self._live(key, now) or []
+        total = sum(count for _, count in entries)
+        expires_at = now
+        for bucket, count in entries:
+            if total < self.limit:
+                break
+            total -= count
+            expires_at = (bucket + self.buckets) * self.bucket_seconds
+        return max(expires_at - now, 0.0)
+
+    def add(self, key: str, now: float, amount: int = 1) -> None:
+        bucket = self._current_bucket(now)
+        entries = self._live(key, now)
+        if entries is None:
+            entries = self._data[key] = []
+        else:
+            self._data.move_to_end(key)
+        if entries and entries[-1][0] == bucket:
+            entries[-1][1] += amount
+        else:
+            entries.append([bucket, amount])
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def refund(self, key: str, now: float) -> None:
+        entries = self._live(key, now)
+        if not entries:
+            return
+        entries[-1][1] -= 1
+        if entries[-1][1] <= 0:
+            entries.pop()
+        if not entries:
+            del self._data[key]
+
+    def reset(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class LoginAttemptTracker:
+    """Failed-login budgets per username and per client IP.
+
+    `acquire` is called before the password is checked and charges the
+    attempt up front, so a burst of concurrent guesses cannot all slip past
+    the check while their bcrypt verifies are still running. A successful
+    login gives the IP its attempt back and clears the username's count.
+    """
+
+    def __init__(self, max_per_username: int, max_per_ip: int, window_seconds: float,
+                 buckets: int = 15, maxsize: int = 100_000):
+        self._users = _BucketedCounter(max_per_username, window_seconds, buckets, maxsize)
+        self._ips = _BucketedCounter(max_per_ip, window_seconds, buckets, maxsize)
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @staticmethod
+    def _user_key(username: str) -> str:
+        # Usernames compare case-insensitively in MySQL's default collation,
+        # so "Bob" and "bob" must share one budget.
+        return username.strip().lower()
+
+    def acquire(self, username: str, ip: str) -> Optional[int]:
+        """Charge one attempt; returns None if allowed, else seconds to wait."""
+        user_key = self._user_key(username)
+        now = time.time()
+        with self._lock:
+            waits = [
+                counter.retry_after(key, now)
+                for counter, key in ((self._users, user_key), (self._ips, ip))
+                if counter.count(key, now) >= counter.limit
+            ]
+            if waits:
+                self.rejected += 1
+                return max(1, math.ceil(max(waits)))
+            self._users.add(user_key, now)
+            self._ips.add(ip, now)
+        return None
+
+    def succeeded(self, username: str, ip: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._users.reset(self._user_key(username))
+            self._ips.refund(ip, now)
+
+    def release(self, username: str, ip: str) -> None:
+        """Give back an attempt that never got as far as a password check."""
+        now = time.time()
+        with self._lock:
+            self._users.refund(self._user_key(username), now)
+            self._ips.refund(ip, now)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._users._data.clear()
+            self._ips._data.clear()
+            self.rejected = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "tracked_usernames": len(self._users),
+            "tracked_ips": len(self._ips),
+            "evictions": self._users.evictions + self._ips.evictions,
+            "rejected": self.rejected,
+        }
+
+login_attempts = LoginAttemptTracker(
+    max_per_username=settings.MAX_LOGIN_ATTEMPTS,
+    max_per_ip=settings.MAX_LOGIN_ATTEMPTS_PER_IP,
+    window_seconds=settings.LOGIN_ATTEMPT_WINDOW_MINUTES * 60,
+    maxsize=settings.LOGIN_ATTEMPT_TRACKER_SIZE,
+)
@@ -0,0 +1,184 @@
+"""Request, database and crypto metrics, kept in process and rendered in Prometheus text format."""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+CRYPTO_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+class Histogram:
+    """Prometheus-style histogram with fixed upper bounds."""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+# Statements and DB time of the request currently being handled
+_request_db: ContextVar[Optional[List]] = ContextVar("request_db", default=None)
+
+class Metrics:
+    def __init__(self):
+        self.in_flight = 0
+        self.request_latency: Dict[Tuple[str, str], Histogram] = {}
+        self.responses: Dict[Tuple[str, str, int], int] = {}
+        self.route_db_statements: Dict[Tuple[str, str], int] = {}
+        self.route_db_seconds: Dict[Tuple[str, str], float] = {}
+        self.db_latency = Histogram(DB_BUCKETS)
+        self.crypto: Dict[str, Histogram] = {
+            name: Histogram(CRYPTO_BUCKETS)
+            for name in ("bcrypt_verify", "bcrypt_hash", "jwt_encode", "jwt_decode")
+        }
+        self.collectors: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, db: List) -> None:
+        key = (method, route)
+        histogram = self.request_latency.get(key)
+        if histogram is None:
+            histogram = self.request_latency[key] = Histogram(LATENCY_BUCKETS)
+            self.route_db_statements[key] = 0
+            self.route_db_seconds[key] = 0.0
+        histogram.observe(seconds)
+        status_key = (method, route, status)
+        self.responses[status_key] = self.responses.get(status_key, 0) + 1
+        self.route_db_statements[key] += db[0]
+        self.route_db_seconds[key] += db[1]
+
+    def observe_crypto(self, operation: str, seconds: float) -> None:
+        self.crypto[operation].observe(seconds)
+
+    def register_collector(self, name: str, collect: Callable[[], Dict[str, float]]) -> None:
+        """Export collect()'s numeric values as gauges named gymqr_<name>_<key>."""
+        self.collectors[name] = collect
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        def header(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram(name, labels, h):
+            cumulative = 0
+            for bound, count in zip(h.bounds, h.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels}le="+Inf"}} {h.count}')
+            plain = labels.rstrip(",")
+            suffix = f"{{{plain}}}" if plain else ""
+            lines.append(f"{name}_sum{suffix} {h.sum}")
+            lines.append(f"{name}_count{suffix} {h.count}")
+
+        header("gymqr_http_requests_in_flight", "gauge", "Requests currently being handled.")
+        lines.append(f"gymqr_http_requests_in_flight {self.in_flight}")
+
+        header("gymqr_http_request_duration_seconds", "histogram", "Request latency by route.")
+        for (method, route), h in list(self.request_latency.items()):
+            histogram("gymqr_http_request_duration_seconds", f'method="{method}",route="{_escape(route)}",', h)
+
+        header("gymqr_http_responses_total", "counter", "Responses by route and status code.")
+        for (method, route, status), count in list(self.responses.items()):
+            lines.append(f'gymqr_http_responses_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {count}')
+
+        header("gymqr_http_request_db_statements_total", "counter", "SQL statements issued while handling requests.")
+        for (method, route), count in list(self.route_db_statements.items()):
+            lines.append(f'gymqr_http_request_db_statements_total{{method="{method}",route="{_escape(route)}"}} {count}')
+
+        header("gymqr_http_request_db_seconds_total", "counter", "Time spent in SQL statements while handling requests.")
+        for (method, route), seconds in list(self.route_db_seconds.items()):
+            lines.append(f'gymqr_http_request_db_seconds_total{{method="{method}",route="{_escape(route)}"}} {seconds}')
+
+        header("gymqr_db_statement_duration_seconds", "histogram", "Latency of every SQL statement, including background jobs.")
+        histogram("gymqr_db_statement_duration_seconds", "", self.db_latency)
+
+        header("gymqr_crypto_duration_seconds", "histogram", "Time spent in bcrypt and JWT operations.")
+        for operation, h in self.crypto.items():
+            histogram("gymqr_crypto_duration_seconds", f'operation="{operation}",', h)
+
+        for name, collect in list(self.collectors.items()):
+            for key, value in collect().items():
+                if isinstance(value, (int, float)):
+                    lines.append(f"# TYPE gymqr_{name}_{key} gauge")
+                    lines.append(f"gymqr_{name}_{key} {value}")
+        lines.append("")
+        return "\n".join(lines)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+metrics = Metrics()
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, status and DB use per route.
+
+    Routes are labelled with their path template ("/api/v1/gym-ids/verify"),
+    never the raw URL, so label cardinality stays bounded; requests that
+    match no route share the "unmatched" label.
+    """
+
+    def __init__(self, app, registry: Metrics = metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = [500]
+        db = [0, 0.0]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        token = _request_db.set(db)
+        self.registry.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.registry.in_flight -= 1
+            _request_db.reset(token)
+            route = scope.get("route")
+            self.registry.observe_request(
+                scope["method"], getattr(route, "path", "unmatched"), status[0], elapsed, db
+            )
+
+class StatementTimer:
+    """Engine event hooks timing every statement and charging it to the current request."""
+
+    def __init__(self, registry: Metrics = metrics):
+        self.registry = registry
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._metrics_start = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._metrics_start
+        self.registry.db_latency.observe(elapsed)
+        db = _request_db.get()
+        if db is not None:
+            db[0] += 1
+            db[1] += elapsed
+
+def instrument_engine(engine, registry: Metrics = metrics) -> StatementTimer:
+    """Attach a StatementTimer to engine (sync or async)."""
+    timer = StatementTimer(registry)
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", timer.before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", timer.after_cursor_execute)
+    return timer
@@ -0,0 +1,188 @@
+"""Background delivery queue for outbound email and SMS: deduplicated per recipient, batched, retried."""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from ..config import get_settings
+from .email_sms import otp_email_body, send_email_batch, send_otp_sms
+
+settings = get_settings()
+
+class Notification(NamedTuple):
+    channel: str  # "email" or "sms"
+    recipient: str
+    subject: str
+    body: str
+    enqueued_at: float
+    attempt: int = 0
+
+def _deliver_email(batch: List[Notification]) -> List[Optional[Exception]]:
+    return send_email_batch([(n.recipient, n.subject, n.body) for n in batch])
+
+def _deliver_sms(batch: List[Notification]) -> List[Optional[Exception]]:
+    results: List[Optional[Exception]] = []
+    for n in batch:
+        try:
+            send_otp_sms(n.recipient, n.body)
+            results.append(None)
+        except Exception as e:
+            results.append(e)
+    return results
+
+class NotificationQueue:
+    """Deduplicating, batching, retrying delivery queue.
+
+    Pending messages live in a dict keyed by (channel, recipient); the
+    asyncio queue only carries keys, so replacing a pending message costs
+    nothing and the queue never holds two entries for one recipient.
+    Delivery functions are blocking and run in the default thread pool.
+    """
+
+    def __init__(self, workers: int, maxsize: int, batch_size: int, max_attempts: int,
+                 retry_base_seconds: float, senders=None):
+        self.workers = workers
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.senders = senders or {"email": _deliver_email, "sms": _deliver_sms}
+        self._pending: Dict[Tuple[str, str], Notification] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._retry_handles = set()
+        self._in_flight = 0
+        self._latencies: Deque[float] = deque(maxlen=1000)
+        self.enqueued = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.delivered = 0
+        self.retried = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        for key in self._pending:
+            self._queue.put_nowait(key)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Deliver what is already queued (up to timeout), then stop the workers."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Stopping notification queue with {len(self._pending)} messages undelivered")
+        for handle in self._retry_handles:
+            handle.cancel()
+        self._retry_handles.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def enqueue(self, channel: str, recipient: str, subject: str, body: str) -> bool:
+        """Queue a message; returns False if the queue is full and it was dropped."""
+        return self._put(Notification(channel, recipient, subject, body, time.monotonic()))
+
+    def enqueue_otp_email(self, email: str, otp_code: str) -> bool:
+        return self.enqueue("email", email, "Your verification code", otp_email_body(otp_code))
+
+    def enqueue_otp_sms(self, phone_number: str, otp_code: str) -> bool:
+        # send_otp_sms formats the text itself, so the body is just the code
+        return self.enqueue("sms", phone_number, "", otp_code)
+
+    def _put(self, notification: Notification) -> bool:
+        key = (notification.channel, notification.recipient)
+        if key in self._pending:
+            self._pending[key] = notification
+            self.deduplicated += 1
+            return True
+        if len(self._pending) >= self.maxsize:
+            self.dropped += 1
+            logging.error(f"Notification queue full, dropping {notification.channel} to {notification.recipient}")
+            return False
+        self._pending[key] = notification
+        self.enqueued += 1
+        if self._queue is not None:
+            self._queue.put_nowait(key)
+        return True
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            keys = [await self._queue.get()]
+            while len(keys) < self.batch_size and not self._queue.empty():
+                keys.append(self._queue.get_nowait())
+            batch = [self._pending.pop(key) for key in keys]
+            self._in_flight += len(batch)
+            try:
+                for channel in {n.channel for n in batch}:
+                    group = [n for n in batch if n.channel == channel]
+                    try:
+                        results = await loop.run_in_executor(None, self.senders[channel], group)
+                    except Exception as e:
+                        results = [e] * len(group)
+                    for notification, error in zip(group, results):
+                        self._settle(notification, error)
+            finally:
+                self._in_flight -= len(batch)
+                for _ in keys:
+                    self._queue.task_done()
+
+    def _settle(self, notification: Notification, error: Optional[Exception]) -> None:
+        if error is None:
+            self.delivered += 1
+            self._latencies.append(time.monotonic() - notification.enqueued_at)
+            return
+        attempt = notification.attempt + 1
+        if attempt >= self.max_attempts:
+            self.failed += 1
+            logging.error(f"Giving up on {notification.channel} to {notification.recipient} after {attempt} attempts: {str(error)}")
+            return
+        self.retried += 1
+        delay = self.retry_base_seconds * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+        retry = notification._replace(attempt=attempt)
+
+        def requeue():
+            self._retry_handles.discard(handle)
+            # A newer message for the same recipient supersedes the retry
+            if (retry.channel, retry.recipient) not in self._pending:
+                self._pending[(retry.channel, retry.recipient)] = retry
+                self._queue.put_nowait((retry.channel, retry.recipient))
+
+        handle = asyncio.get_running_loop().call_later(delay, requeue)
+        self._retry_handles.add(handle)
+
+    def stats(self) -> Dict[str, float]:
+        latencies = sorted(self._latencies)
+
+        def pick(fraction):
+            return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))], 4) if latencies else 0.0
+
+        return {
+            "queue_depth": len(self._pending),
+            "in_flight": self._in_flight,
+            "retry_scheduled": len(self._retry_handles),
+            "enqueued": self.enqueued,
+            "deduplicated": self.deduplicated,
+            "dropped": self.dropped,
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "failed": self.failed,
+            "latency_p50_seconds": pick(0.50),
+            "latency_p95_seconds": pick(0.95),
+        }
+
+notification_queue = NotificationQueue(
+    workers=settings.NOTIFICATION_WORKERS,
+    maxsize=settings.NOTIFICATION_QUEUE_SIZE,
+    batch_size=settings.NOTIFICATION_BATCH_SIZE,
+    max_attempts=settings.NOTIFICATION_MAX_ATTEMPTS,
+    retry_base_seconds=settings.NOTIFICATION_RETRY_BASE_SECONDS,
+)
@@ -0,0 +1,200 @@
+"""Live occupancy per gym and access type, pushed to dashboards over SSE.
+
+Counters are kept in memory and rebuilt from check_in_events every
+OCCUPANCY_RECONCILE_SECONDS; pushes are coalesced per OCCUPANCY_PUSH_SECONDS.
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Set, Tuple
+
+from .. import crud
+from ..config import get_settings
+from ..database import AsyncSessionLocal
+from .checkin_log import CheckInLog, checkin_log
+
+settings = get_settings()
+
+TYPES = ("normal", "premium")
+
+class OccupancyTracker:
+    def __init__(self, session_factory, event_log: CheckInLog, max_stay_seconds: float,
+                 push_seconds: float, reconcile_seconds: float):
+        self.session_factory = session_factory
+        self.event_log = event_log
+        self.max_stay_seconds = max_stay_seconds
+        self.push_seconds = push_seconds
+        self.reconcile_seconds = reconcile_seconds
+        self._present: Dict[str, Tuple[int, str]] = {}  # code -> (gym_id, type)
+        self._counts: Dict[Tuple[int, str], int] = {}
+        self.version = 0
+        self._payload: Optional[bytes] = None
+        self._payload_version = -1
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._changed: Optional[asyncio.Event] = None
+        self._tasks = []
+        self.reconciled_at: Optional[datetime] = None
+        self.pushes = 0
+        self.reconciles = 0
+        self.reconcile_failures = 0
+        self.corrections = 0
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._changed = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._publish()), asyncio.create_task(self._reconcile_periodically())]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def reset(self) -> None:
+        self._present.clear()
+        self._counts.clear()
+        self._touch()
+
+    def is_present(self, code: str) -> bool:
+        return code in self._present
+
+    def check_in(self, code: str, gym_id: int, type: str) -> bool:
+        """Count code as inside gym_id; False if it already was."""
+        previous = self._present.get(code)
+        if previous == (gym_id, type):
+            return False
+        if previous is not None:
+            self._add(previous, -1)
+        self._present[code] = (gym_id, type)
+        self._add((gym_id, type), 1)
+        self._touch()
+        return True
+
+    def check_out(self, code: str) -> Optional[Tuple[int, str]]:
+        """Stop counting code; returns the (gym_id, type) it was counted under, or None."""
+        previous = self._present.pop(code, None)
+        if previous is not None:
+            self._add(previous, -1)
+            self._touch()
+        return previous
+
+    def _add(self, key: Tuple[int, str], delta: int) -> None:
+        count = self._counts.get(key, 0) + delta
+        if count:
+            self._counts[key] = count
+        else:
+            self._counts.pop(key, None)
+
+    def _touch(self) -> None:
+        self.version += 1
+        if self._changed is not None:
+            self._changed.set()
+
+    def snapshot(self) -> dict:
+        gyms: Dict[str, Dict[str, int]] = {}
+        for (gym_id, type), count in sorted(self._counts.items()):
+            gym = gyms.setdefault(str(gym_id), {**{t: 0 for t in TYPES}, "total": 0})
+            gym[type] = count
+            gym["total"] += count
+        return {
+            "version": self.version,
+            "gyms": gyms,
+            "reconciled_at": self.reconciled_at.isoformat() if self.reconciled_at else None,
+        }
+
+    def _event(self) -> bytes:
+        """The current snapshot as one SSE event, serialized once per version."""
+        if self._payload_version != self.version:
+            data = json.dumps(self.snapshot(), separators=(",", ":"))
+            self._payload = f"id: {self.version}\nevent: occupancy\ndata: {data}\n\n".encode()
+            self._payload_version = self.version
+        return self._payload
+
+    def subscribe(self) -> asyncio.Queue:
+        """A one-slot queue that always holds the newest undelivered snapshot, starting with the current one."""
+        queue = asyncio.Queue(maxsize=1)
+        queue.put_nowait(self._event())
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    async def _publish(self) -> None:
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            event = self._event()
+            for queue in self._subscribers:
+                if queue.full():
+                    queue.get_nowait()  # superseded
+                queue.put_nowait(event)
+            self.pushes += 1
+            # Changes during the pause go out together in the next push
+            await asyncio.sleep(self.push_seconds)
+
+    async def reconcile(self) -> bool:
+        """Rebuild the counters from check_in_events; False if skipped or failed.
+
+        Holds the event log's lock: everything buffered is written first, no
+        flush can run during the query, and rows buffered meanwhile are
+        applied on top of the result.
+        """
+        start = time.perf_counter()
+        since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=self.max_stay_seconds)
+        try:
+            async with self.event_log.lock:
+                # Spooled rows are not in the table yet; wait for the replay
+                if not await self.event_log.drain() or self.event_log.spool_pending:
+                    return False
+                async with self.session_factory() as db:
+                    rows = await crud.get_present_check_ins(db, since)
+                present = {row.code: (row.gym_id, row.type) for row in rows}
+                for event in self.event_log.buffered():
+                    if event["direction"] == "in":
+                        present[event["code"]] = (event["gym_id"], event["type"])
+                    else:
+                        present.pop(event["code"], None)
+        except Exception as e:
+            self.reconcile_failures += 1
+            logging.error(f"Occupancy reconcile failed: {str(e)}")
+            return False
+        counts: Dict[Tuple[int, str], int] = {}
+        for key in present.values():
+            counts[key] = counts.get(key, 0) + 1
+        drift = sum(abs(counts.get(key, 0) - self._counts.get(key, 0)) for key in counts.keys() | self._counts.keys())
+        self._present, self._counts = present, counts
+        self.reconciled_at = datetime.now(timezone.utc)
+        self.reconciles += 1
+        if drift:
+            self.corrections += drift
+            logging.info(f"Occupancy reconcile corrected {drift} counts in {time.perf_counter() - start:.3f}s")
+            self._touch()
+        return True
+
+    async def _reconcile_periodically(self) -> None:
+        while True:
+            await self.reconcile()
+            await asyncio.sleep(self.reconcile_seconds)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "present": len(self._present),
+            "subscribers": len(self._subscribers),
+            "version": self.version,
+            "pushes": self.pushes,
+            "reconciles": self.reconciles,
+            "reconcile_failures": self.reconcile_failures,
+            "corrections": self.corrections,
+        }
+
+occupancy = OccupancyTracker(
+    AsyncSessionLocal,
+    checkin_log,
+    max_stay_seconds=settings.OCCUPANCY_MAX_STAY_HOURS * 3600,
+    push_seconds=settings.OCCUPANCY_PUSH_SECONDS,
+    reconcile_seconds=settings.OCCUPANCY_RECONCILE_SECONDS,
+)
@@ -1,10 +1,15 @@
+import asyncio
+import logging
 import random
 import string
+import threading
+import time
 from datetime import datetime, timedelta, timezone
-from sqlalchemy.orm import Session
+from typing import Dict
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..models import OTP, User
 from ..config import get_settings
-from ..utils.email_sms import send_otp_email
 
 settings = get_settings()
 
@@ -12,41 +17,137 @@ def generate_otp() -> str:
     """Generate a 6-digit OTP"""
     return ''.join(random.choices(string.digits, k=6))
 
-def create_otp(db: Session, username: str) -> OTP:
-    """Create a new OTP for a user"""
-    # Get user email from database
-    user = db.query(User).filter(User.username == username).first()
-    if not user:
-        raise ValueError("User not found")
-        
+class MemoryOTPStore:
+    """In-process OTP store with per-code expiry.
+
+    Only for single-node deployments: codes live in this worker's memory, so
+    a code issued by one worker cannot be verified by another and all codes
+    are lost on restart.
+    """
+
+    def __init__(self):
+        self._codes: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def issue(self, username: str, otp_code: str, ttl: float) -> None:
+        with self._lock:
+            self._codes.setdefault(username, {})[otp_code] = time.monotonic() + ttl
+
+    def consume(self, username: str, otp_code: str) -> bool:
+        with self._lock:
+            codes = self._codes.get(username)
+            expires_at = codes.pop(otp_code, None) if codes else None
+            if codes is not None and not codes:
+                del self._codes[username]
+        return expires_at is not None and expires_at > time.monotonic()
+
+    def purge_expired(self) -> int:
+        now = time.monotonic()
+        removed = 0
+        with self._lock:
+            for username in list(self._codes):
+                codes = self._codes[username]
+                for otp_code in [c for c, expires_at in codes.items() if expires_at <= now]:
+                    del codes[otp_code]
+                    removed += 1
+                if not codes:
+                    del self._codes[username]
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._codes.clear()
+
+memory_otp_store = MemoryOTPStore()
+
+async def create_otp(db: AsyncSession, user: User, commit: bool = True) -> OTP:
+    """Create a new OTP for a user; the caller queues its delivery.
+
+    With commit=False the code only takes effect when the caller commits
+    the session, so it can be created in the same transaction as the user.
+    """
     otp_code = generate_otp()
     expires_at = datetime.now(timezone.utc) + timedelta(minutes=settings.OTP_EXPIRATION_MINUTES)
-    
+
     otp = OTP(
-        username=username,
+        username=user.username,
         otp_code=otp_code,
         expires_at=expires_at
     )
-    db.add(otp)
-    db.commit()
-    db.refresh(otp)
-    
-    # Send OTP via email
-    send_otp_email(user.email, otp_code)
-    
+    if settings.OTP_BACKEND == "memory":
+        ttl = settings.OTP_EXPIRATION_MINUTES * 60
+        if commit:
+            memory_otp_store.issue(user.username, otp_code, ttl)
+        else:
+            event.listen(
+                db.sync_session, "after_commit",
+                lambda session: memory_otp_store.issue(user.username, otp_code, ttl),
+                once=True,
+            )
+    else:
+        db.add(otp)
+        if commit:
+            await db.commit()
+
     return otp
 
-def verify_otp(db: Session, username: str, otp_code: str) -> bool:
-    """Verify if the OTP is valid"""
-    otp = db.query(OTP).filter(
-        OTP.username == username,
-        OTP.otp_code == otp_code,
-        OTP.is_used == False,
-        OTP.expires_at > datetime.now(timezone.utc)
-    ).first()
-    
-    if otp:
-        otp.is_used = True
-        db.commit()
-        return True
-    return False 
\ No newline at end of file
+async def verify_otp(db: AsyncSession, username: str, otp_code: str) -> bool:
+    """Verify the OTP and mark it used in one step.
+
+    The conditional UPDATE both checks and consumes the code, so two
+    concurrent requests with the same code cannot both succeed.
+    """
+    if settings.OTP_BACKEND == "memory":
+        return memory_otp_store.consume(username, otp_code)
+    result = await db.execute(
+        update(OTP)
+        .where(
+            OTP.username == username,
+            OTP.otp_code == otp_code,
+            OTP.is_used == False,
+            OTP.expires_at > datetime.now(timezone.utc)
+        )
+        .values(is_used=True)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount > 0
+
+async def purge_expired_otps(db: AsyncSession, batch_size: int = None) -> int:
+    """Delete expired OTP rows in batches; returns how many were removed.
+
+    Each batch is its own short transaction so the purge never holds locks
+    on a large part of the table.
+    """
+    batch_size = batch_size or settings.OTP_PURGE_BATCH_SIZE
+    if settings.OTP_BACKEND == "memory":
+        return memory_otp_store.purge_expired()
+    removed = 0
+    while True:
+        cutoff = datetime.now(timezone.utc)
+        ids = (await db.execute(
+            select(OTP.id).where(OTP.expires_at < cutoff).limit(batch_size)
+        )).scalars().all()
+        if not ids:
+            return removed
+        await db.execute(
+            delete(OTP).where(OTP.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        removed += len(ids)
+        if len(ids) < batch_size:
+            return removed
+
+async def run_otp_purge(session_factory, interval: float = None) -> None:
+    """Background loop calling purge_expired_otps every interval seconds."""
+    interval = interval or settings.OTP_PURGE_INTERVAL_SECONDS
+    while True:
+        # Sleep first so a cold start does not begin with a purge
+        await asyncio.sleep(interval)
+        try:
+            async with session_factory() as db:
+                removed = await purge_expired_otps(db)
+            if removed:
+                logging.info(f"Purged {removed} expired OTPs")
+        except Exception as e:
+            logging.error(f"OTP purge failed: {str(e)}")
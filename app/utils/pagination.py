@@ -0,0 +1,38 @@
+"""Keyset pagination on integer primary keys with opaque cursors.
+
+Pages select `id > after_id ORDER BY id LIMIT limit + 1`; the extra row
+only says whether there is a next page.
+"""
+import base64
+import binascii
+import json
+from typing import List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(last_id: int) -> str:
+    payload = json.dumps({"v": 1, "after": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode()
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    """The id to continue after, or None for the first page; InvalidCursor if malformed."""
+    if not cursor:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        after = payload["after"]
+    except (binascii.Error, ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+    if payload.get("v") != 1 or not isinstance(after, int) or isinstance(after, bool):
+        raise InvalidCursor("Invalid cursor")
+    return after
+
+def split_page(rows: Sequence[T], limit: int, key=lambda row: row.id) -> Tuple[List[T], Optional[str]]:
+    """Trim rows fetched with limit + 1 to limit; return them and the next cursor, if any."""
+    if len(rows) <= limit:
+        return list(rows), None
+    page = list(rows[:limit])
+    return page, encode_cursor(key(page[-1]))
@@ -0,0 +1,258 @@
+"""QR code rendering for gym access IDs, with a content-addressed render cache.
+
+The qrcode package computes the module matrix; PNG and SVG are encoded
+here. A render is keyed by the SHA-256 of its inputs, which is also its ETag.
+"""
+import hashlib
+import logging
+import os
+import struct
+import tempfile
+import threading
+import zlib
+from typing import List, NamedTuple, Optional
+
+from app.config import get_settings
+from app.utils.cache import LRUCache
+
+try:
+    import qrcode
+    from qrcode import constants as qr_constants
+except ImportError:  # optional: only the render endpoints need it
+    qrcode = None
+
+try:
+    from importlib.metadata import version as _package_version
+    QRCODE_VERSION = _package_version("qrcode") if qrcode is not None else None
+except Exception:
+    QRCODE_VERSION = "unknown"
+
+settings = get_settings()
+
+RENDERER_VERSION = "1"
+FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+ERROR_CORRECTION = {"L": "ERROR_CORRECT_L", "M": "ERROR_CORRECT_M", "Q": "ERROR_CORRECT_Q", "H": "ERROR_CORRECT_H"}
+
+class QRUnavailable(RuntimeError):
+    pass
+
+class Render(NamedTuple):
+    key: str
+    content: bytes
+    media_type: str
+
+def render_key(code: str, fmt: str, size: int, error_correction: str, border: int) -> str:
+    """Content address of a render; also its ETag (quoted)."""
+    material = f"{RENDERER_VERSION}|{QRCODE_VERSION}|{code}|{fmt}|{size}|{error_correction}|{border}"
+    return hashlib.sha256(material.encode()).hexdigest()
+
+def etag_matches(if_none_match: Optional[str], key: str) -> bool:
+    if if_none_match is None:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or f'"{key}"' in tags
+
+def qr_available() -> bool:
+    return qrcode is not None
+
+def qr_matrix(data: str, error_correction: str = "M") -> List[List[bool]]:
+    """Dark/light modules of the smallest QR symbol holding data, without quiet zone."""
+    if qrcode is None:
+        raise QRUnavailable("QR rendering needs the qrcode package")
+    qr = qrcode.QRCode(
+        error_correction=getattr(qr_constants, ERROR_CORRECTION[error_correction]), border=0
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+def render_png(matrix: List[List[bool]], size: int, border: int) -> bytes:
+    """1-bit grayscale PNG at most size pixels wide (at least one pixel per module).
+
+    Modules are whole pixels, so the image is the largest multiple of the
+    module count that fits.
+    """
+    modules = len(matrix) + 2 * border
+    scale = max(1, size // modules)
+    width = modules * scale
+    # 1 = white in a 1-bit grayscale PNG; rows are padded to whole bytes
+    light, dark, margin = "1" * scale, "0" * scale, "1" * (border * scale)
+    padding = "0" * (-width % 8)
+    light_row = _pack_row("1" * width + padding)
+    rows = [light_row] * (border * scale)
+    for line in matrix:
+        row = _pack_row(margin + "".join(dark if module else light for module in line) + margin + padding)
+        rows.extend([row] * scale)
+    rows.extend([light_row] * (border * scale))
+    header = struct.pack(">IIBBBBB", width, width, 1, 0, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + _png_chunk(b"IHDR", header)
+        + _png_chunk(b"IDAT", zlib.compress(b"".join(rows)))
+        + _png_chunk(b"IEND", b"")
+    )
+
+def _pack_row(bits: str) -> bytes:
+    return b"\x00" + int(bits, 2).to_bytes(len(bits) // 8, "big")
+
+def render_svg(matrix: List[List[bool]], size: int, border: int) -> bytes:
+    """SVG drawn in module units and scaled to size x size pixels."""
+    modules = len(matrix) + 2 * border
+    path = []
+    for y, line in enumerate(matrix):
+        x = 0
+        while x < len(line):
+            if line[x]:
+                start = x
+                while x < len(line) and line[x]:
+                    x += 1
+                path.append(f"M{start + border} {y + border}h{x - start}v1h-{x - start}z")
+            else:
+                x += 1
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {modules} {modules}" shape-rendering="crispEdges">'
+        f'<rect width="{modules}" height="{modules}" fill="#fff"/>'
+        f'<path fill="#000" d="{"".join(path)}"/></svg>\n'
+    ).encode()
+
+def render(code: str, fmt: str, size: int, error_correction: str, border: int) -> bytes:
+    matrix = qr_matrix(code, error_correction)
+    if fmt == "png":
+        return render_png(matrix, size, border)
+    return render_svg(matrix, size, border)
+
+class QRRenderCache:
+    """LRU of renders in memory, backed by an optional directory of files named by key.
+
+    The directory is kept under max_disk_bytes by deleting the files read or
+    written longest ago. Other workers write to it too, so it is rescanned
+    each time this process has written a tenth of the budget.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, directory: Optional[str] = None, max_disk_bytes: int = 0):
+        self.memory = LRUCache(maxsize, ttl)
+        self.directory = directory or None
+        self.max_disk_bytes = max_disk_bytes
+        self._scan_bytes = max(1, max_disk_bytes // 10)
+        self._written = self._scan_bytes  # scan on the first write
+        self._disk_lock = threading.Lock()
+        self.renders = 0
+        self.disk_hits = 0
+        self.disk_errors = 0
+        self.disk_evictions = 0
+
+    def _path(self, key: str, fmt: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{fmt}")
+
+    def get(self, key: str) -> Optional[Render]:
+        """Memory tier only; cheap enough for the event loop."""
+        return self.memory.get(key)
+
+    def load(self, key: str, fmt: str) -> Optional[Render]:
+        """Disk tier; promotes a hit into memory."""
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key, fmt), "rb") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            self.disk_errors += 1
+            logging.warning(f"QR cache read failed: {str(e)}")
+            return None
+        try:
+            # Marks the access; filesystems mounted noatime would not
+            os.utime(self._path(key, fmt))
+        except OSError:
+            pass
+        self.disk_hits += 1
+        hit = Render(key, content, FORMATS[fmt])
+        self.memory.set(key, hit)
+        return hit
+
+    def put(self, key: str, fmt: str, content: bytes) -> Render:
+        entry = Render(key, content, FORMATS[fmt])
+        self.renders += 1
+        self.memory.set(key, entry)
+        if self.directory is not None:
+            self._write(self._path(key, fmt), content)
+        return entry
+
+    def _write(self, path: str, content: bytes) -> None:
+        # Write-then-rename so a concurrent reader never sees a partial file
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp, path)
+        except OSError as e:
+            self.disk_errors += 1
+            logging.warning(f"QR cache write failed: {str(e)}")
+            return
+        if self.max_disk_bytes:
+            with self._disk_lock:
+                self._written += len(content)
+                if self._written < self._scan_bytes:
+                    return
+                self._written = 0
+            self._prune()
+
+    def _prune(self) -> None:
+        """Delete the least recently used files until the directory fits max_disk_bytes."""
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_atime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # pruned by another worker
+            except OSError as e:
+                self.disk_errors += 1
+                logging.warning(f"QR cache eviction failed: {str(e)}")
+                continue
+            total -= size
+            self.disk_evictions += 1
+
+    def load_or_render(self, key: str, code: str, fmt: str, size: int, error_correction: str, border: int) -> Render:
+        """Disk lookup, then render and store; blocking, so run it off the event loop."""
+        hit = self.load(key, fmt)
+        if hit is not None:
+            return hit
+        return self.put(key, fmt, render(code, fmt, size, error_correction, border))
+
+    def clear(self) -> None:
+        """Drop the memory tier; files on disk are left alone."""
+        self.memory.clear()
+
+    def stats(self) -> dict:
+        return {
+            **self.memory.stats(),
+            "renders": self.renders,
+            "disk_hits": self.disk_hits,
+            "disk_errors": self.disk_errors,
+            "disk_evictions": self.disk_evictions,
+            "disk_enabled": self.directory is not None,
+        }
+
+qr_cache = QRRenderCache(
+    settings.QR_CACHE_SIZE, settings.QR_CACHE_TTL_SECONDS, settings.QR_CACHE_DIR, settings.QR_CACHE_DISK_MAX_BYTES
+)
@@ -0,0 +1,234 @@
+"""Batch QR rendering for the print shop: a ZIP of images or a PDF of card sheets.
+
+Chunks of codes are rendered on a process pool and written to the response
+in order as they finish. Batch renders bypass the render cache.
+"""
+import asyncio
+import logging
+import multiprocessing
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional, Tuple
+
+from app.config import get_settings
+from app.utils.gym_codes import encode_gym_id
+from app.utils.id_generator import get_existing_codes
+from app.utils.qr import qr_matrix, render
+
+settings = get_settings()
+
+BATCH_FORMATS = {"zip": "application/zip", "pdf": "application/pdf"}
+
+# A4 portrait in points, 3 x 4 cards of a 2 inch QR and its code underneath
+PAGE_WIDTH, PAGE_HEIGHT = 595.28, 841.89
+SHEET_COLUMNS, SHEET_ROWS = 3, 4
+CARDS_PER_PAGE = SHEET_COLUMNS * SHEET_ROWS
+SHEET_MARGIN = 36
+QR_SIDE = 144
+LABEL_SIZE = 11
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def get_render_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that runs an event loop and thread pools is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.QR_BATCH_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+def shutdown_render_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def render_images(codes: List[str], image_format: str, size: int, error_correction: str,
+                  border: int) -> List[Tuple[str, bytes]]:
+    """Pool task: (code, image) for each code."""
+    return [(code, render(code, image_format, size, error_correction, border)) for code in codes]
+
+def render_sheet_pages(codes: List[str], error_correction: str) -> List[bytes]:
+    """Pool task: one compressed PDF content stream per CARDS_PER_PAGE codes."""
+    cell_width = (PAGE_WIDTH - 2 * SHEET_MARGIN) / SHEET_COLUMNS
+    cell_height = (PAGE_HEIGHT - 2 * SHEET_MARGIN) / SHEET_ROWS
+    pages = []
+    for page_start in range(0, len(codes), CARDS_PER_PAGE):
+        ops = ["0 g"]
+        for slot, code in enumerate(codes[page_start:page_start + CARDS_PER_PAGE]):
+            row, column = divmod(slot, SHEET_COLUMNS)
+            x = SHEET_MARGIN + column * cell_width + (cell_width - QR_SIDE) / 2
+            y = PAGE_HEIGHT - SHEET_MARGIN - (row + 1) * cell_height + (cell_height - QR_SIDE) / 2 + LABEL_SIZE
+            matrix = qr_matrix(code, error_correction)
+            modules = len(matrix)
+            # Module units, y up; each horizontal run of dark modules is one rectangle
+            ops.append(f"q {QR_SIDE / modules:.4f} 0 0 {QR_SIDE / modules:.4f} {x:.2f} {y:.2f} cm")
+            for index, line in enumerate(matrix):
+                top = modules - 1 - index
+                start = None
+                for column_index, dark in enumerate(line + [False]):
+                    if dark and start is None:
+                        start = column_index
+                    elif not dark and start is not None:
+                        ops.append(f"{start} {top} {column_index - start} 1 re")
+                        start = None
+            ops.append("f Q")
+            label_width = len(code) * LABEL_SIZE * 0.6  # Courier advance is 600/1000 em
+            ops.append(f"BT /F1 {LABEL_SIZE} Tf {x + (QR_SIDE - label_width) / 2:.2f} "
+                       f"{y - LABEL_SIZE * 1.5:.2f} Td ({_pdf_escape(code)}) Tj ET")
+        pages.append(zlib.compress("\n".join(ops).encode()))
+    return pages
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+class _Sink:
+    """Write-only file object whose contents are drained after each member."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+class PDFWriter:
+    """Incremental PDF: pages are emitted as they are added, the page tree at close."""
+
+    # 1 catalog, 2 page tree (written last), 3 font, pages from 4
+    def __init__(self):
+        self._offset = 0
+        self._offsets = {}
+        self._pages: List[int] = []
+
+    def _object(self, number: int, body: bytes) -> bytes:
+        self._offsets[number] = self._offset
+        data = f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+        self._offset += len(data)
+        return data
+
+    def start(self) -> bytes:
+        header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        self._offset = len(header)
+        return (
+            header
+            + self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+            + self._object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>")
+        )
+
+    def page(self, content: bytes) -> bytes:
+        number = 4 + 2 * len(self._pages)
+        self._pages.append(number)
+        return (
+            self._object(number, (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {number + 1} 0 R >>"
+            ).encode())
+            + self._object(
+                number + 1,
+                f"<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n".encode() + content + b"\nendstream",
+            )
+        )
+
+    def close(self) -> bytes:
+        kids = " ".join(f"{number} 0 R" for number in self._pages)
+        data = self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._pages)} >>".encode())
+        xref_offset = self._offset
+        count = max(self._offsets) + 1
+        xref = [f"xref\n0 {count}\n", "0000000000 65535 f \n"]
+        xref.extend(f"{self._offsets[number]:010d} 00000 n \n" for number in range(1, count))
+        xref.append(f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+        return data + "".join(xref).encode()
+
+async def _issued_chunks(session_factory, type: str, first_counter: int, count: int,
+                         chunk_size: int) -> AsyncIterator[List[str]]:
+    """Issued codes of the counter range, chunk_size at a time (the last may be shorter)."""
+    pending: List[str] = []
+    async with session_factory() as db:
+        for start in range(first_counter, first_counter + count, settings.ID_GENERATION_BATCH_SIZE):
+            stop = min(start + settings.ID_GENERATION_BATCH_SIZE, first_counter + count)
+            codes = [encode_gym_id(type, counter) for counter in range(start, stop)]
+            existing = await get_existing_codes(db, codes)
+            pending.extend(code for code in codes if code in existing)
+            while len(pending) >= chunk_size:
+                yield pending[:chunk_size]
+                pending = pending[chunk_size:]
+    if pending:
+        yield pending
+
+async def stream_batch(session_factory, type: str, first_counter: int, count: int, batch_format: str,
+                       image_format: str = "png", size: int = 256, error_correction: str = "M",
+                       border: int = 4) -> AsyncIterator[bytes]:
+    """Yield a ZIP or PDF of the issued codes among count counter values from first_counter.
+
+    Opens its own session, like the exports: StreamingResponse runs this
+    after the request's dependencies have been closed.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_render_pool()
+    chunk_size = settings.QR_BATCH_CHUNK_SIZE
+    if batch_format == "pdf":
+        chunk_size = -(-chunk_size // CARDS_PER_PAGE) * CARDS_PER_PAGE  # whole pages per task
+    in_flight = deque()
+    rendered = 0
+
+    if batch_format == "pdf":
+        pdf = PDFWriter()
+        yield pdf.start()
+
+        def submit(codes):
+            return loop.run_in_executor(pool, render_sheet_pages, codes, error_correction)
+
+        def encode(pages):
+            return b"".join(pdf.page(content) for content in pages)
+    else:
+        sink = _Sink()
+        archive = zipfile.ZipFile(sink, "w")
+        # PNG is already deflated
+        compression = zipfile.ZIP_STORED if image_format == "png" else zipfile.ZIP_DEFLATED
+
+        def submit(codes):
+            return loop.run_in_executor(pool, render_images, codes, image_format, size, error_correction, border)
+
+        def encode(images):
+            for code, image in images:
+                archive.writestr(f"{code}.{image_format}", image, compress_type=compression)
+            return sink.drain()
+
+    try:
+        async for codes in _issued_chunks(session_factory, type, first_counter, count, chunk_size):
+            in_flight.append((len(codes), submit(codes)))
+            if len(in_flight) >= 2 * settings.QR_BATCH_WORKERS:
+                done, future = in_flight.popleft()
+                chunk = encode(await future)
+                rendered += done
+                yield chunk
+        while in_flight:
+            done, future = in_flight.popleft()
+            chunk = encode(await future)
+            rendered += done
+            yield chunk
+        if batch_format == "pdf":
+            yield pdf.close()
+        else:
+            archive.close()
+            yield sink.drain()
+    except Exception as e:
+        # Headers are already sent; all that can be done is end the body early
+        logging.error(f"Batch QR render failed after {rendered} codes: {str(e)}", exc_info=True)
+        raise
+    finally:
+        for _, future in in_flight:
+            future.cancel()
+    logging.info(f"Rendered {rendered} QR codes as {batch_format}")
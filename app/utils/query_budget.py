@@ -0,0 +1,39 @@
+"""Statement budgets for checking that an endpoint or query does not regress into N+1."""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+# Statements of the innermost budget open in the current context
+_statements: ContextVar[Optional[List[str]]] = ContextVar("query_budget", default=None)
+
+def _on_execute(conn, cursor, statement, parameters, context, executemany):
+    statements = _statements.get()
+    if statements is not None:
+        statements.append(statement)
+
+@contextmanager
+def query_budget(engine, max_statements: int) -> Iterator[List[str]]:
+    """Yield the list of statements sent so far; raise on exit if it is over budget.
+
+    Only statements issued from this context (and tasks started inside the
+    block) are counted, so background jobs sharing the engine are not.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(sync_engine, "before_cursor_execute", _on_execute):
+        event.listen(sync_engine, "before_cursor_execute", _on_execute)
+    statements: List[str] = []
+    token = _statements.set(statements)
+    try:
+        yield statements
+    finally:
+        _statements.reset(token)
+    if len(statements) > max_statements:
+        listing = "\n".join(f"  {' '.join(statement.split())[:200]}" for statement in statements)
+        raise QueryBudgetExceeded(
+            f"{len(statements)} statements, budget was {max_statements}:\n{listing}"
+        )
@@ -0,0 +1,235 @@
+"""Signed QR payloads that a door controller can check without the database.
+
+    G1:<key id>:<code>:<N|P>:<not before>:<not after>:<signature>
+
+Times are base 36 Unix seconds and the signature (HS256 truncated to 128
+bits, or Ed25519) is fixed-width base 32, so the payload stays in the QR
+alphanumeric set. Codes are withdrawn through a versioned revocation list.
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import hmac
+import logging
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from .. import crud
+from ..config import get_settings
+from ..database import AsyncSessionLocal
+
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+except ImportError:  # optional: only EdDSA signing needs it
+    Ed25519PrivateKey = None
+
+settings = get_settings()
+
+TOKEN_PREFIX = "G1"
+ALGORITHMS = ("HS256", "EdDSA")
+TYPE_CODES = {"normal": "N", "premium": "P"}
+TYPE_NAMES = {letter: type for type, letter in TYPE_CODES.items()}
+HMAC_BYTES = 16
+
+class QRSigningUnavailable(RuntimeError):
+    pass
+
+class InvalidAccessToken(ValueError):
+    pass
+
+class SignedAccess(NamedTuple):
+    code: str
+    type: str
+    not_before: int
+    not_after: int
+
+def _digits(number: int, base: int, width: int = 1) -> str:
+    digits = ""
+    while number or len(digits) < width:
+        number, digit = divmod(number, base)
+        digits = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"[digit] + digits
+    return digits
+
+class TokenSigner:
+    def __init__(self, algorithm: str, key: bytes, key_id: str):
+        if algorithm not in ALGORITHMS:
+            raise QRSigningUnavailable(f"Unknown QR signing algorithm {algorithm}")
+        self.algorithm = algorithm
+        self.key_id = key_id.upper()
+        self.public_key: Optional[bytes] = None
+        self.signature_bytes = HMAC_BYTES if algorithm == "HS256" else 64
+        self.signature_width = -(-self.signature_bytes * 8 // 5)  # base 32 digits
+        if algorithm == "HS256":
+            # copy() of a keyed HMAC skips hashing the key for every token
+            self._mac = hmac.new(key, digestmod=hashlib.sha256)
+        else:
+            if Ed25519PrivateKey is None:
+                raise QRSigningUnavailable("EdDSA QR signing needs the cryptography package")
+            self._private = Ed25519PrivateKey.from_private_bytes(key)
+            self._public = self._private.public_key()
+            self.public_key = self._public.public_bytes_raw()
+
+    def sign(self, message: bytes) -> bytes:
+        if self.algorithm == "HS256":
+            mac = self._mac.copy()
+            mac.update(message)
+            return mac.digest()[:HMAC_BYTES]
+        return self._private.sign(message)
+
+    def verify(self, message: bytes, signature: bytes) -> bool:
+        if self.algorithm == "HS256":
+            return hmac.compare_digest(self.sign(message), signature)
+        try:
+            self._public.verify(signature, message)
+        except InvalidSignature:
+            return False
+        return True
+
+_signer: Optional[TokenSigner] = None
+
+def check_signing_key() -> None:
+    if not settings.QR_SIGNING_KEY:
+        raise QRSigningUnavailable("QR_SIGNING_KEY must be set to a stable, dedicated value")
+
+def get_signer() -> TokenSigner:
+    """The signer configured by QR_SIGNING_*; built on first use."""
+    global _signer
+    if _signer is None:
+        check_signing_key()
+        key = settings.QR_SIGNING_KEY.encode()
+        if settings.QR_SIGNING_ALGORITHM == "EdDSA":
+            try:
+                key = base64.urlsafe_b64decode(key + b"=" * (-len(key) % 4))
+            except binascii.Error:
+                raise QRSigningUnavailable("QR_SIGNING_KEY is not a base64url Ed25519 seed")
+        _signer = TokenSigner(settings.QR_SIGNING_ALGORITHM, key, settings.QR_SIGNING_KEY_ID)
+    return _signer
+
+def token_window(now: Optional[float] = None) -> Tuple[int, int]:
+    """(not_before, not_after) of the payloads issued at now."""
+    window = settings.QR_TOKEN_WINDOW_DAYS * 86400
+    not_before = int(now if now is not None else time.time()) // window * window
+    return not_before, not_before + 2 * window
+
+def issue_token(code: str, type: str, now: Optional[float] = None,
+                signer: Optional[TokenSigner] = None) -> Tuple[str, SignedAccess]:
+    signer = signer or get_signer()
+    not_before, not_after = token_window(now)
+    message = ":".join((
+        TOKEN_PREFIX, signer.key_id, code, TYPE_CODES[type], _digits(not_before, 36), _digits(not_after, 36)
+    ))
+    signature = int.from_bytes(signer.sign(message.encode()), "big")
+    token = f"{message}:{_digits(signature, 32, signer.signature_width)}"
+    return token, SignedAccess(code, type, not_before, not_after)
+
+def verify_token(token: str, now: Optional[float] = None, signer: Optional[TokenSigner] = None,
+                 revoked: Optional["RevocationList"] = None) -> SignedAccess:
+    """The payload of a genuine, current, unrevoked token; else InvalidAccessToken."""
+    signer = signer or get_signer()
+    message, _, signature = token.rpartition(":")
+    parts = message.split(":")
+    if len(parts) != 6 or parts[0] != TOKEN_PREFIX:
+        raise InvalidAccessToken("Malformed signed access ID")
+    if parts[1] != signer.key_id:
+        raise InvalidAccessToken("Unknown signing key")
+    try:
+        genuine = (
+            len(signature) == signer.signature_width and signature.isalnum()
+            and signer.verify(message.encode(), int(signature, 32).to_bytes(signer.signature_bytes, "big"))
+        )
+    except (OverflowError, ValueError):
+        genuine = False
+    if not genuine:
+        raise InvalidAccessToken("Invalid signature")
+    # Signed by us, so the fields are well formed
+    code, type_code, not_before, not_after = parts[2], parts[3], int(parts[4], 36), int(parts[5], 36)
+    now = now if now is not None else time.time()
+    if not not_before - settings.QR_TOKEN_LEEWAY_SECONDS <= now < not_after + settings.QR_TOKEN_LEEWAY_SECONDS:
+        raise InvalidAccessToken("Signed access ID is outside its validity window")
+    revoked = revoked if revoked is not None else revocations
+    if revoked.is_revoked(code):
+        raise InvalidAccessToken("Access ID has been revoked")
+    return SignedAccess(code, TYPE_NAMES[type_code], not_before, not_after)
+
+def compact_delta(rows: Iterable, full: bool) -> Tuple[List[str], List[str]]:
+    """(revoked, restored) codes after applying rows in order; a full list has no restored part."""
+    latest: Dict[str, bool] = {}
+    for row in rows:
+        latest[row.code] = row.revoked
+    revoked = sorted(code for code, is_revoked in latest.items() if is_revoked)
+    restored = [] if full else sorted(code for code, is_revoked in latest.items() if not is_revoked)
+    return revoked, restored
+
+class RevocationList:
+    """This process's copy of the revocation list, advanced by deltas."""
+
+    def __init__(self, session_factory, refresh_seconds: float, batch_size: int):
+        self.session_factory = session_factory
+        self.refresh_seconds = refresh_seconds
+        self.batch_size = batch_size
+        self.version = 0
+        self._revoked: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def reset(self) -> None:
+        self.version = 0
+        self._revoked.clear()
+
+    def is_revoked(self, code: str) -> bool:
+        return code in self._revoked
+
+    def apply(self, rows: Iterable) -> None:
+        for row in rows:
+            if row.version <= self.version:
+                continue
+            if row.revoked:
+                self._revoked.add(row.code)
+            else:
+                self._revoked.discard(row.code)
+            self.version = row.version
+
+    async def refresh(self) -> None:
+        async with self.session_factory() as db:
+            while True:
+                rows = await crud.get_revocations_since(db, self.version, self.batch_size)
+                self.apply(rows)
+                if len(rows) < self.batch_size:
+                    break
+        self.refreshes += 1
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.refresh_failures += 1
+                logging.error(f"Revocation list refresh failed: {str(e)}")
+            await asyncio.sleep(self.refresh_seconds)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "version": self.version,
+            "revoked": len(self._revoked),
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+        }
+
+revocations = RevocationList(
+    AsyncSessionLocal,
+    refresh_seconds=settings.QR_REVOCATION_REFRESH_SECONDS,
+    batch_size=settings.QR_REVOCATION_DELTA_LIMIT,
+)
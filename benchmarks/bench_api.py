@@ -0,0 +1,214 @@
+"""Load and regression suite for the API hot paths.
+
+Seeds DATABASE_URL (a temporary SQLite file if unset) and drives each
+scenario through the app in-process, or against --base-url, with the rate
+limiter off. Reports throughput and p50/p95/p99 latency per scenario.
+
+    python -m benchmarks.bench_api --requests 200 --concurrency 20 --output results.json
+    python -m benchmarks.bench_api --baseline results.json --threshold 0.15   # exits 1 on regression
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+SCENARIOS = ["signup", "verify-otp", "token", "refresh", "gym-access-ids", "generate", "verify"]
+PASSWORD = "Bench-Password-9!"
+
+
+async def seed(requests, users):
+    from app.database import AsyncSessionLocal
+    from app.models import GymAccessID, OTP, User
+    from app.utils.auth import create_access_token, create_refresh_token, get_password_hash, get_token_scopes
+    from app.utils.id_generator import generate_unique_ids
+
+    password_hash = get_password_hash(PASSWORD)  # one bcrypt for every seeded user
+    async with AsyncSessionLocal() as db:
+        db.add_all([
+            User(username=f"bench-user-{i}", email=f"bench-user-{i}@example.com", password_hash=password_hash,
+                 date_of_birth=datetime(1990, 1, 1), is_active=True)
+            for i in range(users)
+        ])
+        await db.commit()
+        expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        db.add_all([
+            OTP(username=f"bench-user-{i % users}", otp_code=f"{i:06d}", expires_at=expires_at)
+            for i in range(requests)
+        ])
+        await db.commit()
+        codes = await generate_unique_ids(db, "normal", max(requests, 100))
+        user_ids = [user_id for (user_id,) in (await db.execute(User.__table__.select().with_only_columns(User.id))).all()]
+        await db.execute(GymAccessID.__table__.update().where(GymAccessID.code.in_(codes[:users * 5])).values(user_id=user_ids[0]))
+        await db.commit()
+
+    access = [create_access_token({"sub": f"bench-user-{i}", **get_token_scopes(["read"])}) for i in range(users)]
+    admin = create_access_token({"sub": "bench-user-0", **get_token_scopes(["read", "admin"])})
+    refresh = [create_refresh_token({"sub": f"bench-user-{i % users}"}) for i in range(requests)]
+    return {"codes": codes, "access": access, "admin": admin, "refresh": refresh}
+
+
+def build_requests(data, users, run_id):
+    def auth(i):
+        return {"Authorization": f"Bearer {data['access'][i % users]}"}
+
+    return {
+        "signup": lambda c, i: c.post("/api/v1/users/signup", json={
+            "username": f"signup-{run_id}-{i}", "email": f"signup-{run_id}-{i}@example.com",
+            "date_of_birth": "1990-01-01T00:00:00", "password": PASSWORD, "confirm_password": PASSWORD}),
+        "verify-otp": lambda c, i: c.post("/api/v1/users/verify-otp", json={
+            "username": f"bench-user-{i % users}", "otp_code": f"{i:06d}"}),
+        "token": lambda c, i: c.post("/api/v1/users/token", data={
+            "username": f"bench-user-{i % users}", "password": PASSWORD}),
+        "refresh": lambda c, i: c.post("/api/v1/users/refresh", json={"refresh_token": data["refresh"][i]}),
+        "gym-access-ids": lambda c, i: c.get("/api/v1/users/gym-access-ids", headers=auth(i)),
+        "generate": lambda c, i: c.post("/api/v1/gym-ids/generate", json={"type": "premium", "count": 10},
+                                        headers={"Authorization": f"Bearer {data['admin']}"}),
+        "verify": lambda c, i: c.post("/api/v1/gym-ids/verify", json={"access_id": data["codes"][i % len(data["codes"])]},
+                                      headers=auth(i)),
+    }
+
+
+async def run_scenario(client, make_request, requests, concurrency):
+    latencies = []
+    statuses = Counter()
+    indexes = iter(range(requests))
+
+    async def worker():
+        for i in indexes:
+            start = time.perf_counter()
+            response = await make_request(client, i)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    ordered = sorted(latencies)
+
+    def pct(fraction):
+        return round(ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered) + 0.5) - 1))], 2)
+
+    return {
+        "requests": requests,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def compare(results, baseline, threshold):
+    """Regressions of results against a baseline run: lower rps, higher p95, more errors."""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        if current["rps"] < base["rps"] * (1 - threshold):
+            regressions.append(f"{name}: throughput {current['rps']} req/s vs baseline {base['rps']}")
+        if current["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {current['p95_ms']} ms vs baseline {base['p95_ms']}")
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{name}: {current['errors']} errors vs baseline {base['errors']}")
+    return regressions
+
+
+async def run(args):
+    import httpx
+    from app.database import async_engine, engine, init_db
+    from app.main import app
+    from app.utils.limiter import limiter
+    from benchmarks.common import print_table
+
+    # SQL echo (DEBUG) would dominate the timings
+    engine.echo = async_engine.echo = False
+    logging.disable(logging.CRITICAL)
+    limiter.enabled = False
+    await asyncio.to_thread(init_db)
+    data = await seed(args.requests, args.users)
+    make = build_requests(data, args.users, int(time.time()))
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+    else:
+        await app.router.startup()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+    results = {}
+    try:
+        # The app prints outgoing OTP emails when no SMTP server is set
+        with contextlib.redirect_stdout(io.StringIO()):
+            for name in args.scenarios:
+                results[name] = await run_scenario(client, make[name], args.requests, args.concurrency)
+    finally:
+        await client.aclose()
+        if not args.base_url:
+            await app.router.shutdown()
+        await async_engine.dispose()
+
+    print_table(
+        f"{args.requests} requests per scenario at concurrency {args.concurrency}",
+        ["scenario", "req/s", "p50 ms", "p95 ms", "p99 ms", "errors"],
+        [[name, r["rps"], r["p50_ms"], r["p95_ms"], r["p99_ms"], r["errors"]] for name, r in results.items()],
+    )
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": os.environ["DATABASE_URL"].split("://")[0],
+            "transport": args.base_url or "asgi",
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "users": args.users,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=50, help="seeded users")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--base-url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed relative regression")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Must be set before app modules are imported
+        os.environ.setdefault("DATABASE_URL", f"sqlite:///{tmp}/bench_api.db")
+        os.environ.pop("ASYNC_DATABASE_URL", None)
+        report = asyncio.run(run(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report["results"], json.load(f), args.threshold)
+        if regressions:
+            print(f"\nRegressions beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Memory and throughput of GET /gym-ids/export as the export grows to 1M rows.
+
+Streams 10k, 100k and --rows codes from a temporary SQLite file through the
+ASGI app and reports rows/s and the tracemalloc peak, next to loading the
+same rows with one .all() (up to --buffered-max).
+
+    python -m benchmarks.bench_export --rows 1000000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+START = datetime(2026, 1, 1)
+
+
+async def call(app, path, headers):
+    """Run one GET through the ASGI app; return (status, body bytes)."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path.split("?")[0], "raw_path": path.split("?")[0].encode(), "root_path": "",
+        "query_string": path.partition("?")[2].encode(), "headers": headers,
+        "client": ("127.0.0.1", 1234), "server": ("bench", 80),
+    }
+    received = {"status": None, "bytes": 0, "requested": False}
+    done = asyncio.Event()
+
+    async def receive():
+        if not received["requested"]:
+            received["requested"] = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # StreamingResponse waits on this for a client disconnect
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            received["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            received["bytes"] += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                done.set()
+
+    await app(scope, receive, send)
+    return received["status"], received["bytes"]
+
+
+async def run(args):
+    from sqlalchemy import insert
+
+    from app import crud
+    from app.database import AsyncSessionLocal, async_engine, engine, init_db
+    from app.main import app
+    from app.models import GymAccessID, User
+    from app.utils.auth import create_access_token, get_token_scopes
+    from app.utils.export import encode_ndjson
+    from app.utils.limiter import limiter
+    from benchmarks.common import print_table
+
+    engine.echo = async_engine.echo = False
+    logging.disable(logging.CRITICAL)
+    limiter.enabled = False
+    init_db()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"username": "admin", "email": "admin@example.com", "password_hash": "x",
+                                     "date_of_birth": START, "is_active": True}])
+        for start in range(0, args.rows, 50_000):
+            conn.execute(insert(GymAccessID), [
+                {"code": f"QRG{i:08d}", "type": "normal", "is_used": False, "created_at": START + timedelta(seconds=i)}
+                for i in range(start, min(args.rows, start + 50_000))
+            ])
+    token = create_access_token({"sub": "admin", **get_token_scopes(["admin"])})
+    headers = [(b"authorization", f"Bearer {token}".encode()), (b"host", b"bench")]
+
+    async def buffered(rows):
+        query = crud.gym_ids_export_query(created_to=START + timedelta(seconds=rows))
+        async with AsyncSessionLocal() as db:
+            result = (await db.execute(query)).all()
+        body = encode_ndjson(result, [column.name for column in query.selected_columns])
+        return 200, len(body)
+
+    cases = [
+        ("streaming ndjson", lambda rows: call(app, f"/api/v1/gym-ids/export?format=ndjson&created_to={(START + timedelta(seconds=rows)).isoformat()}", headers)),
+        ("streaming csv", lambda rows: call(app, f"/api/v1/gym-ids/export?format=csv&created_to={(START + timedelta(seconds=rows)).isoformat()}", headers)),
+        ("buffered ndjson", buffered),
+    ]
+    sizes = [size for size in (10_000, 100_000, 1_000_000) if size < args.rows] + [args.rows]
+    table = []
+    try:
+        await app.router.startup()
+        await cases[0][1](1000)  # warm-up: token lookup, first connection
+        for name, export in cases:
+            for rows in sizes:
+                if name.startswith("buffered") and rows > args.buffered_max:
+                    continue
+                start = time.perf_counter()
+                status, size = await export(rows)
+                elapsed = time.perf_counter() - start
+                assert status == 200, status
+                tracemalloc.start()
+                await export(rows)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                table.append([name, f"{rows:,}", f"{size / 2**20:.1f}", f"{rows / elapsed:,.0f}", f"{peak / 2**20:.2f}"])
+    finally:
+        await app.router.shutdown()
+        await async_engine.dispose()
+
+    print_table(
+        "Gym ID export",
+        ["mode", "rows", "body MiB", "rows/s", "peak MiB (tracemalloc)"],
+        table,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--buffered-max", type=int, default=100_000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        # Must be set before app modules are imported
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench_export.db"
+        os.environ.pop("ASYNC_DATABASE_URL", None)
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""Overhead of the metrics middleware and statement hooks on a DB-backed route.
+
+Drives GET /member on an instrumented and a plain copy of one app in
+alternating rounds, then costs each component separately, since whole-app
+numbers drift by more than the overhead. The target is under 2%.
+
+    python -m benchmarks.bench_metrics --rounds 20 --requests 300
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from datetime import datetime
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import event, text
+
+from app import crud
+from app.models import User
+from app.utils.auth import create_access_token, verify_token
+from app.utils.metrics import Metrics, MetricsMiddleware, StatementTimer, instrument_engine
+from benchmarks.common import StatementCounter, make_session_factory, make_sqlite_engine, print_table
+
+TOKEN = create_access_token({"sub": "member", "scopes": ["read"]})
+
+
+async def build_app(instrumented: bool):
+    engine = await make_sqlite_engine()
+    AsyncSessionLocal = make_session_factory(engine)
+    async with AsyncSessionLocal() as db:
+        db.add(User(username="member", email="member@example.com", password_hash="x",
+                    date_of_birth=datetime(1990, 1, 1), is_active=True))
+        await db.commit()
+
+    app = FastAPI()
+
+    @app.get("/member")
+    async def member():
+        # The same decode the auth dependency does on a cache miss
+        verify_token(TOKEN)
+        async with AsyncSessionLocal() as db:
+            user = await crud.get_user_by_username(db, "member")
+            return {"id": user.id}
+
+    registry = Metrics()
+    if instrumented:
+        app.add_middleware(MetricsMiddleware, registry=registry)
+        instrument_engine(engine, registry)
+    return app, engine, registry
+
+
+async def drive(client, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = await client.get("/member")
+        assert response.status_code == 200
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+async def middleware_cost(requests):
+    """µs MetricsMiddleware adds per request around a no-op ASGI app."""
+    scope = {"type": "http", "method": "GET", "path": "/member"}
+
+    async def send(message):
+        pass
+
+    async def noop_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    wrapped = MetricsMiddleware(noop_app, Metrics())
+    samples = []
+    for _ in range(10):
+        start = time.perf_counter()
+        for _ in range(requests):
+            await wrapped(scope, None, send)
+        metered = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(requests):
+            await noop_app(scope, None, send)
+        samples.append((metered - (time.perf_counter() - start)) / requests * 1e6)
+    return statistics.median(samples)
+
+
+async def hook_cost(statements):
+    """µs the StatementTimer hooks add per statement on a real engine."""
+    engine = await make_sqlite_engine()
+    timer = StatementTimer(Metrics())
+    hooks = [("before_cursor_execute", timer.before_cursor_execute),
+             ("after_cursor_execute", timer.after_cursor_execute)]
+
+    async def batch():
+        start = time.perf_counter()
+        async with engine.connect() as conn:
+            for _ in range(statements):
+                await conn.execute(text("SELECT 1"))
+        return (time.perf_counter() - start) / statements * 1e6
+
+    samples = []
+    try:
+        await batch()
+        for _ in range(10):
+            plain = await batch()
+            for name, fn in hooks:
+                event.listen(engine.sync_engine, name, fn)
+            hooked = await batch()
+            for name, fn in hooks:
+                event.remove(engine.sync_engine, name, fn)
+            samples.append(hooked - plain)
+    finally:
+        await engine.dispose()
+    return statistics.median(samples)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=300, help="requests per round")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    plain_app, plain_engine, _ = await build_app(False)
+    metered_app, metered_engine, registry = await build_app(True)
+    counter = StatementCounter(plain_engine)
+    samples = {"plain": [], "instrumented": []}
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=plain_app), base_url="http://bench") as plain, \
+                httpx.AsyncClient(transport=httpx.ASGITransport(app=metered_app), base_url="http://bench") as metered:
+            await drive(plain, 100)  # warm-up
+            await drive(metered, 100)
+            counter.reset()
+            await drive(plain, 100)
+            statements_per_request = counter.count / 100
+            for i in range(args.rounds):
+                pair = [("plain", plain), ("instrumented", metered)]
+                for label, client in pair if i % 2 == 0 else reversed(pair):
+                    samples[label].append(await drive(client, args.requests))
+    finally:
+        await plain_engine.dispose()
+        await metered_engine.dispose()
+
+    plain_us = statistics.median(samples["plain"])
+    metered_us = statistics.median(samples["instrumented"])
+    # Each round's pair ran back to back, so their ratio drifts less than
+    # the ratio of the two medians
+    paired = statistics.median(m / p - 1 for p, m in zip(samples["plain"], samples["instrumented"]))
+    middleware_us = await middleware_cost(2000)
+    hook_us = await hook_cost(2000)
+    estimate_us = middleware_us + hook_us * statements_per_request
+
+    print_table(
+        f"GET /member, {args.rounds} rounds x {args.requests} requests (median µs/request)",
+        ["app", "µs/request", "overhead (paired rounds)"],
+        [
+            ["plain", f"{plain_us:.1f}", "-"],
+            ["instrumented", f"{metered_us:.1f}", f"{paired * 100:+.2f}%"],
+        ],
+    )
+    print_table(
+        "Instrumentation cost by component",
+        ["component", "µs", "per"],
+        [
+            ["MetricsMiddleware", f"{middleware_us:.1f}", "request"],
+            ["statement hooks", f"{hook_us:.1f}", f"statement ({statements_per_request:g} per request)"],
+            ["estimated total", f"{estimate_us:.1f}", f"request = {estimate_us / plain_us * 100:.2f}% of the plain route"],
+        ],
+    )
+    scraped = registry.render()
+    print(f"\n/metrics payload: {len(scraped)} bytes, {scraped.count(chr(10))} lines")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+"""Batch QR rendering throughput (ZIP and PDF sheets) as the process pool grows.
+
+Streams --codes issued codes through stream_batch with 1, 2, 4 ... up to
+--workers warmed-up pool processes and reports codes/s, speed-up and
+parallel efficiency, plus the tracemalloc peak with the largest pool.
+
+    python -m benchmarks.bench_qr_batch --codes 10000 --workers 8
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+import tracemalloc
+
+from sqlalchemy import insert
+
+from app.config import get_settings
+from app.models import GymAccessID
+from app.utils.gym_codes import encode_gym_id
+from app.utils.qr_batch import shutdown_render_pool, stream_batch
+from benchmarks.common import make_session_factory, make_sqlite_engine, print_table
+
+settings = get_settings()
+
+
+async def consume(factory, codes, batch_format):
+    size = 0
+    async for chunk in stream_batch(factory, "normal", 0, codes, batch_format):
+        size += len(chunk)
+    return size
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--codes", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    engine = await make_sqlite_engine()
+    factory = make_session_factory(engine)
+    async with factory() as db:
+        await db.execute(insert(GymAccessID), [
+            {"code": encode_gym_id("normal", counter), "type": "normal"} for counter in range(args.codes)
+        ])
+        await db.commit()
+
+    counts = [1]
+    while counts[-1] * 2 <= args.workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != args.workers:
+        counts.append(args.workers)
+
+    rows = []
+    try:
+        for batch_format in ("zip", "pdf"):
+            baseline = None
+            for workers in counts:
+                settings.QR_BATCH_WORKERS = workers
+                shutdown_render_pool()
+                await consume(factory, workers * settings.QR_BATCH_CHUNK_SIZE, batch_format)  # start the processes
+                start = time.perf_counter()
+                size = await consume(factory, args.codes, batch_format)
+                rate = args.codes / (time.perf_counter() - start)
+                baseline = baseline or rate
+                peak = ""
+                if workers == counts[-1]:
+                    tracemalloc.start()
+                    await consume(factory, args.codes, batch_format)
+                    peak = f"{tracemalloc.get_traced_memory()[1] / 2**20:.1f}"
+                    tracemalloc.stop()
+                rows.append([batch_format, workers, f"{rate:,.0f}", f"{rate / baseline:.2f}x",
+                             f"{rate / baseline / workers:.0%}", f"{size / 2**20:.1f}", peak])
+    finally:
+        shutdown_render_pool()
+        await engine.dispose()
+
+    print_table(
+        f"Batch render of {args.codes:,} codes, {os.cpu_count()} CPUs",
+        ["format", "workers", "codes/s", "speed-up", "efficiency", "body MiB", "peak MiB (tracemalloc)"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
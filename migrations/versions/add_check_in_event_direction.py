@@ -0,0 +1,38 @@
+"""add gym_id and direction to check_in_events
+
+Revision ID: add_check_in_event_direction
+Revises: add_check_in_events
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_check_in_event_direction'
+down_revision = 'add_check_in_events'
+branch_labels = None
+depends_on = None
+
+def _columns(inspector):
+    return {column['name'] for column in inspector.get_columns('check_in_events')}
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # init_db (create_all) may have created the table with them already
+    columns = _columns(inspector)
+    if 'gym_id' not in columns:
+        op.add_column('check_in_events', sa.Column('gym_id', sa.Integer(), nullable=False, server_default='1'))
+    if 'direction' not in columns:
+        op.add_column('check_in_events', sa.Column(
+            'direction', sa.Enum('in', 'out', name='check_in_direction'), nullable=False, server_default='in'
+        ))
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = _columns(inspector)
+    with op.batch_alter_table('check_in_events') as batch_op:
+        if 'direction' in columns:
+            batch_op.drop_column('direction')
+        if 'gym_id' in columns:
+            batch_op.drop_column('gym_id')
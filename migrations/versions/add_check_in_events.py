@@ -0,0 +1,39 @@
+"""add check_in_events table
+
+Revision ID: add_check_in_events
+Revises: add_owner_list_indexes
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_check_in_events'
+down_revision = 'add_owner_list_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # init_db (create_all) may have created it already
+    if 'check_in_events' in inspector.get_table_names():
+        return
+    op.create_table(
+        'check_in_events',
+        sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+        sa.Column('code', sa.String(length=12), nullable=False),
+        sa.Column('type', sa.Enum('normal', 'premium', name='gym_id_type'), nullable=False),
+        sa.Column('scanned_by', sa.Integer(), nullable=True),
+        sa.Column('scanned_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_check_in_events_scanned_at', 'check_in_events', ['scanned_at'], unique=False)
+    op.create_index('ix_check_in_events_code_scanned_at', 'check_in_events', ['code', 'scanned_at'], unique=False)
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'check_in_events' in inspector.get_table_names():
+        op.drop_index('ix_check_in_events_code_scanned_at', table_name='check_in_events')
+        op.drop_index('ix_check_in_events_scanned_at', table_name='check_in_events')
+        op.drop_table('check_in_events')
@@ -0,0 +1,121 @@
+"""add core tables
+
+The application used to create these tables itself with create_all at
+import time, so existing databases already have some or all of them. Every
+step here is skipped when its table or column is already present.
+
+Revision ID: add_core_tables
+Revises: add_otp_indexes
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_core_tables'
+down_revision = 'add_otp_indexes'
+branch_labels = None
+depends_on = None
+
+def _timestamps():
+    return [
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    ]
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing = set(inspector.get_table_names())
+
+    if 'users' not in existing:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('username', sa.String(length=255), nullable=False),
+            sa.Column('email', sa.String(length=255), nullable=False),
+            sa.Column('password_hash', sa.String(length=255), nullable=False),
+            sa.Column('date_of_birth', sa.DateTime(), nullable=False),
+            sa.Column('is_active', sa.Boolean(), nullable=True),
+            *_timestamps(),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('username'),
+            sa.UniqueConstraint('email')
+        )
+        op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+
+    if 'exercises' not in existing:
+        op.create_table(
+            'exercises',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=255), nullable=False),
+            sa.Column('muscle_group', sa.String(length=255), nullable=False),
+            sa.Column('media_url', sa.String(length=255), nullable=True),
+            sa.Column('sets', sa.Integer(), nullable=True),
+            sa.Column('reps', sa.Integer(), nullable=True),
+            *_timestamps(),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_exercises_id'), 'exercises', ['id'], unique=False)
+
+    if 'workout_plans' not in existing:
+        op.create_table(
+            'workout_plans',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('plan_name', sa.String(length=255), nullable=False),
+            *_timestamps(),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_workout_plans_id'), 'workout_plans', ['id'], unique=False)
+
+    if 'workout_plan_exercises' not in existing:
+        op.create_table(
+            'workout_plan_exercises',
+            sa.Column('workout_plan_id', sa.Integer(), nullable=False),
+            sa.Column('exercise_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['workout_plan_id'], ['workout_plans.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['exercise_id'], ['exercises.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('workout_plan_id', 'exercise_id')
+        )
+
+    if 'nutrition_plans' not in existing:
+        op.create_table(
+            'nutrition_plans',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('plan_name', sa.String(length=255), nullable=False),
+            *_timestamps(),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_nutrition_plans_id'), 'nutrition_plans', ['id'], unique=False)
+
+    if 'otps' not in existing:
+        op.create_table(
+            'otps',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('username', sa.String(length=255), nullable=True),
+            sa.Column('otp_code', sa.String(length=6), nullable=False),
+            sa.Column('is_used', sa.Boolean(), nullable=True),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['username'], ['users.username'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_otps_id'), 'otps', ['id'], unique=False)
+        op.create_index('ix_otps_username_otp_code', 'otps', ['username', 'otp_code'], unique=False)
+        op.create_index('ix_otps_expires_at', 'otps', ['expires_at'], unique=False)
+
+    # add_gym_access_ids created the table without its owner column
+    if 'user_id' not in {column['name'] for column in inspector.get_columns('gym_access_ids')}:
+        with op.batch_alter_table('gym_access_ids') as batch_op:
+            batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key(
+                'fk_gym_access_ids_user_id', 'users', ['user_id'], ['id'], ondelete='CASCADE'
+            )
+
+def downgrade():
+    # The tables may predate this revision, so downgrading leaves them alone.
+    pass
@@ -0,0 +1,30 @@
+"""add exercises muscle_group index
+
+Revision ID: add_exercise_muscle_group_index
+Revises: add_core_tables
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_exercise_muscle_group_index'
+down_revision = 'add_core_tables'
+branch_labels = None
+depends_on = None
+
+INDEX = 'ix_exercises_muscle_group'
+
+def _existing_indexes():
+    # Tables built by init_db (create_all) already have it
+    inspector = sa.inspect(op.get_bind())
+    return {index['name'] for index in inspector.get_indexes('exercises')}
+
+def upgrade():
+    if INDEX not in _existing_indexes():
+        op.create_index(INDEX, 'exercises', ['muscle_group'], unique=False)
+
+def downgrade():
+    if INDEX in _existing_indexes():
+        op.drop_index(INDEX, table_name='exercises')
@@ -0,0 +1,29 @@
+"""add gym_access_ids.created_at index for the verification filter refresh
+
+Revision ID: add_gym_access_id_created_at_index
+Revises: add_gym_id_revocations
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_gym_access_id_created_at_index'
+down_revision = 'add_gym_id_revocations'
+branch_labels = None
+depends_on = None
+
+NAME = 'ix_gym_access_ids_created_at'
+
+def _existing_indexes(inspector):
+    # Tables built by init_db (create_all) already have it
+    return {index['name'] for index in inspector.get_indexes('gym_access_ids')}
+
+def upgrade():
+    if NAME not in _existing_indexes(sa.inspect(op.get_bind())):
+        op.create_index(NAME, 'gym_access_ids', ['created_at'], unique=False)
+
+def downgrade():
+    if NAME in _existing_indexes(sa.inspect(op.get_bind())):
+        op.drop_index(NAME, table_name='gym_access_ids')
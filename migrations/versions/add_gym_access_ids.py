@@ -15,13 +15,16 @@ branch_labels = None
 depends_on = None
 
 def upgrade():
+    # Databases set up by the app's old create_all already have it
+    if 'gym_access_ids' in sa.inspect(op.get_bind()).get_table_names():
+        return
     op.create_table(
         'gym_access_ids',
         sa.Column('id', sa.Integer(), nullable=False),
         sa.Column('code', sa.String(length=12), nullable=False),
         sa.Column('type', sa.Enum('normal', 'premium', name='gym_id_type'), nullable=False),
         sa.Column('is_used', sa.Boolean(), nullable=False, server_default='0'),
-        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()')),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
         sa.Column('updated_at', sa.DateTime(timezone=True), onupdate=sa.text('now()')),
         sa.PrimaryKeyConstraint('id')
     )
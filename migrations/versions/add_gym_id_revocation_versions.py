@@ -0,0 +1,49 @@
+"""add gym_id_revocations.version and its counter row
+
+Revision ID: add_gym_id_revocation_versions
+Revises: add_gym_access_id_created_at_index
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_gym_id_revocation_versions'
+down_revision = 'add_gym_access_id_created_at_index'
+branch_labels = None
+depends_on = None
+
+INDEX = 'ix_gym_id_revocations_version'
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # init_db (create_all) may have created both already
+    if 'gym_id_revocation_sequence' not in inspector.get_table_names():
+        op.create_table(
+            'gym_id_revocation_sequence',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('version', sa.BigInteger(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if 'version' in {column['name'] for column in inspector.get_columns('gym_id_revocations')}:
+        return
+    op.add_column('gym_id_revocations', sa.Column('version', sa.BigInteger(), nullable=True))
+    # Existing entries keep the versions clients already hold
+    op.execute("UPDATE gym_id_revocations SET version = id")
+    op.execute(
+        "INSERT INTO gym_id_revocation_sequence (id, version) "
+        "SELECT 1, COALESCE(MAX(version), 0) FROM gym_id_revocations"
+    )
+    with op.batch_alter_table('gym_id_revocations') as batch_op:
+        batch_op.alter_column('version', existing_type=sa.BigInteger(), nullable=False)
+    op.create_index(INDEX, 'gym_id_revocations', ['version'], unique=True)
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'version' in {column['name'] for column in inspector.get_columns('gym_id_revocations')}:
+        op.drop_index(INDEX, table_name='gym_id_revocations')
+        with op.batch_alter_table('gym_id_revocations') as batch_op:
+            batch_op.drop_column('version')
+    if 'gym_id_revocation_sequence' in inspector.get_table_names():
+        op.drop_table('gym_id_revocation_sequence')
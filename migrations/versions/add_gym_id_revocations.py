@@ -0,0 +1,37 @@
+"""add gym_id_revocations table
+
+Revision ID: add_gym_id_revocations
+Revises: add_check_in_event_direction
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_gym_id_revocations'
+down_revision = 'add_check_in_event_direction'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # init_db (create_all) may have created it already
+    if 'gym_id_revocations' in inspector.get_table_names():
+        return
+    op.create_table(
+        'gym_id_revocations',
+        sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+        sa.Column('code', sa.String(length=12), nullable=False),
+        sa.Column('revoked', sa.Boolean(), nullable=False),
+        sa.Column('revoked_by', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_gym_id_revocations_code', 'gym_id_revocations', ['code'], unique=False)
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'gym_id_revocations' in inspector.get_table_names():
+        op.drop_index('ix_gym_id_revocations_code', table_name='gym_id_revocations')
+        op.drop_table('gym_id_revocations')
@@ -0,0 +1,29 @@
+"""add gym_id_sequences table
+
+Revision ID: add_gym_id_sequences
+Revises: add_gym_access_ids
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_gym_id_sequences'
+down_revision = 'add_gym_access_ids'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Databases set up by the app's old create_all already have it
+    if 'gym_id_sequences' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'gym_id_sequences',
+        sa.Column('type', sa.Enum('normal', 'premium', name='gym_id_type'), nullable=False),
+        sa.Column('next_value', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('type')
+    )
+
+def downgrade():
+    op.drop_table('gym_id_sequences')
@@ -0,0 +1,44 @@
+"""add otps lookup and expiry indexes
+
+Revision ID: add_otp_indexes
+Revises: add_gym_id_sequences
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_otp_indexes'
+down_revision = 'add_gym_id_sequences'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'ix_otps_username_otp_code': ['username', 'otp_code'],
+    'ix_otps_expires_at': ['expires_at'],
+}
+
+def _existing_indexes():
+    # otps is created from the models (create_all), so the table may be
+    # missing or may already carry these indexes.
+    inspector = sa.inspect(op.get_bind())
+    if 'otps' not in inspector.get_table_names():
+        return None
+    return {index['name'] for index in inspector.get_indexes('otps')}
+
+def upgrade():
+    existing = _existing_indexes()
+    if existing is None:
+        return
+    for name, columns in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, 'otps', columns, unique=False)
+
+def downgrade():
+    existing = _existing_indexes()
+    if existing is None:
+        return
+    for name in INDEXES:
+        if name in existing:
+            op.drop_index(name, table_name='otps')
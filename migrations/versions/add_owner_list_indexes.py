@@ -0,0 +1,35 @@
+"""add (user_id, id) indexes for keyset pagination
+
+Revision ID: add_owner_list_indexes
+Revises: add_exercise_muscle_group_index
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_owner_list_indexes'
+down_revision = 'add_exercise_muscle_group_index'
+branch_labels = None
+depends_on = None
+
+TABLES = ['gym_access_ids', 'workout_plans', 'nutrition_plans']
+
+def _existing_indexes(inspector, table):
+    # Tables built by init_db (create_all) already have them
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table in TABLES:
+        name = f'ix_{table}_user_id_id'
+        if name not in _existing_indexes(inspector, table):
+            op.create_index(name, table, ['user_id', 'id'], unique=False)
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table in TABLES:
+        name = f'ix_{table}_user_id_id'
+        if name in _existing_indexes(inspector, table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,95 @@
+import os
+import tempfile
+from datetime import datetime
+
+# Settings are read at import time, so the test environment comes first
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/app.db")
+os.environ.setdefault("DEBUG", "False")
+os.environ.setdefault("SCHEMA_CHECK", "False")
+os.environ.setdefault("ADMIN_USERNAMES", "admin")
+os.environ.setdefault("CHECKIN_LOG_SPOOL_PATH", "")
+os.environ.setdefault("GYM_ID_PERMUTATION_KEY", "test-permutation-key")
+os.environ.setdefault("QR_SIGNING_KEY", "test-qr-signing-key")
+
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app import models
+from app.database import Base
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def engine():
+    """A fresh in-memory database with every table."""
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def db_factory(engine):
+    return async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+@pytest.fixture
+async def client():
+    """The app on an emptied database, with startup/shutdown run around the test."""
+    from app.database import async_engine, engine as sync_engine
+    from app.main import app
+    from app.utils.auth import principal_cache
+    from app.utils.exercise_catalog import exercise_catalog
+    from app.utils.id_verifier import gym_id_verifier
+    from app.utils.limiter import limiter
+    from app.utils.occupancy import occupancy
+    from app.utils.qr import qr_cache
+    from app.utils.signed_qr import revocations
+    from app.utils.login_attempts import login_attempts
+
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            {"username": name, "email": f"{name}@example.com", "password_hash": "x",
+             "date_of_birth": datetime(1990, 1, 1), "is_active": True}
+            for name in ("admin", "member")
+        ])
+    gym_id_verifier.reset()
+    principal_cache.clear()
+    exercise_catalog.clear()
+    qr_cache.clear()
+    login_attempts.reset()
+    occupancy.reset()
+    revocations.reset()
+    limiter.enabled = False
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            yield client
+    finally:
+        await app.router.shutdown()
+        await async_engine.dispose()
+
+
+def bearer(username: str, scopes) -> dict:
+    from app.utils.auth import create_access_token, get_token_scopes
+    return {"Authorization": f"Bearer {create_access_token({'sub': username, **get_token_scopes(scopes)})}"}
+
+
+@pytest.fixture
+def admin_headers():
+    return bearer("admin", ["read", "admin"])
+
+
+@pytest.fixture
+def member_headers():
+    return bearer("member", ["read"])
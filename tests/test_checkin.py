@@ -0,0 +1,52 @@
+import pytest
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal
+from app.models import CheckInEvent
+from app.utils.checkin_log import checkin_log
+from app.utils.gym_codes import encode_gym_id
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def code(client, admin_headers):
+    response = await client.post("/api/v1/gym-ids/generate", headers=admin_headers, json={"type": "premium", "count": 1})
+    return response.json()["ids"][0]
+
+
+async def logged_events():
+    async with checkin_log.lock:
+        await checkin_log.drain()
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(CheckInEvent.direction, CheckInEvent.gym_id, CheckInEvent.type).order_by(CheckInEvent.id)
+        )
+        return [tuple(row) for row in result]
+
+
+async def scan(client, headers, path, code, **body):
+    return await client.post(f"/api/v1/gym-ids/{path}", headers=headers, json={"access_id": code, **body})
+
+
+async def test_redeem_is_one_time(client, member_headers, code):
+    response = await scan(client, member_headers, "redeem", code)
+    assert response.status_code == 200 and response.json()["id_type"] == "premium"
+    response = await scan(client, member_headers, "redeem", code)
+    assert response.status_code == 409
+    assert (await scan(client, member_headers, "redeem", encode_gym_id("premium", 10 ** 6))).status_code == 404
+
+
+async def test_every_check_in_is_recorded(client, member_headers, code):
+    await scan(client, member_headers, "redeem", code)
+    for _ in range(2):
+        assert (await scan(client, member_headers, "check-in", code)).status_code == 200
+        assert (await scan(client, member_headers, "check-out", code)).status_code == 200
+    assert (await scan(client, member_headers, "check-in", code, gym_id=3)).status_code == 200
+    assert await logged_events() == [("in", 1, "premium"), ("out", 1, "premium")] * 2 + [("in", 3, "premium")]
+
+
+async def test_check_in_of_unknown_code_is_not_recorded(client, member_headers):
+    response = await scan(client, member_headers, "check-in", encode_gym_id("normal", 10 ** 6))
+    assert response.status_code == 404
+    assert await logged_events() == []
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models import CheckInEvent
+from app.utils.checkin_log import CheckInLog
+from app.utils.gym_codes import encode_gym_id
+
+pytestmark = pytest.mark.anyio
+
+
+async def count_events(db_factory):
+    async with db_factory() as db:
+        return await db.scalar(select(func.count()).select_from(CheckInEvent))
+
+
+async def test_scans_are_written_in_batches(db_factory):
+    log = CheckInLog(db_factory, batch_size=10, flush_seconds=60, maxsize=100)
+    for n in range(25):
+        assert log.record(encode_gym_id("normal", n), "normal")
+    async with log.lock:
+        assert await log.drain()
+    assert await count_events(db_factory) == 25
+    assert log.batches == 3 and log.buffered() == []
+
+
+async def test_stop_writes_what_is_buffered(db_factory):
+    log = CheckInLog(db_factory, batch_size=100, flush_seconds=60, maxsize=100)
+    log.start()
+    log.record(encode_gym_id("normal", 1), "normal", direction="in")
+    log.record(encode_gym_id("normal", 1), "normal", direction="out")
+    await log.stop()
+    assert await count_events(db_factory) == 2
+
+
+async def test_failed_flush_is_spooled_and_replayed(db_factory, tmp_path, monkeypatch):
+    log = CheckInLog(db_factory, batch_size=10, flush_seconds=60, maxsize=100, spool_path=str(tmp_path / "spool"))
+
+    async def fail(rows):
+        raise ConnectionError("database unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(log, "_insert", fail)
+        for n in range(5):
+            log.record(encode_gym_id("premium", n), "premium", gym_id=2)
+        async with log.lock:
+            assert not await log.drain()
+    assert log.spooled == 5 and log.spool_pending
+    assert await count_events(db_factory) == 0
+
+    await log._replay()
+    assert log.replayed == 5 and not log.spool_pending
+    async with db_factory() as db:
+        gyms = (await db.scalars(select(CheckInEvent.gym_id))).all()
+    assert gyms == [2] * 5
+
+
+async def test_full_buffer_without_spool_drops(db_factory):
+    log = CheckInLog(db_factory, batch_size=10, flush_seconds=60, maxsize=2)
+    results = [log.record(encode_gym_id("normal", n), "normal") for n in range(3)]
+    assert results == [True, True, False]
+    assert log.dropped == 1
+
+
+async def spool_rows(log, monkeypatch, count):
+    async def fail(rows):
+        raise ConnectionError("database unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(log, "_insert", fail)
+        for n in range(count):
+            log.record(encode_gym_id("normal", n), "normal")
+        async with log.lock:
+            while log.buffered():
+                await log.drain()
+
+
+async def test_workers_sharing_a_spool_replay_it_once(db_factory, tmp_path, monkeypatch):
+    spool = str(tmp_path / "spool")
+    workers = [CheckInLog(db_factory, batch_size=2, flush_seconds=60, maxsize=100, spool_path=spool) for _ in range(2)]
+    await spool_rows(workers[0], monkeypatch, 6)
+    await asyncio.gather(*(worker._replay() for worker in workers))
+    # Whoever lost the lock replays nothing and finds the spool gone next time
+    await asyncio.gather(*(worker._replay() for worker in workers))
+    assert await count_events(db_factory) == 6
+    assert sum(worker.replayed for worker in workers) == 6
+
+
+async def test_flusher_survives_an_error(db_factory, tmp_path, monkeypatch):
+    log = CheckInLog(db_factory, batch_size=100, flush_seconds=0.01, maxsize=100, spool_path=str(tmp_path / "spool"))
+    await spool_rows(log, monkeypatch, 1)
+    calls = []
+
+    async def broken_replay():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("disk went away")
+        await CheckInLog._replay(log)
+
+    monkeypatch.setattr(log, "_replay", broken_replay)
+    log.start()
+    for _ in range(200):
+        if log.replayed:
+            break
+        await asyncio.sleep(0.01)
+    log.record(encode_gym_id("normal", 50), "normal")
+    await log.stop()
+    assert len(calls) >= 2 and log.replayed == 1
+    assert await count_events(db_factory) == 2
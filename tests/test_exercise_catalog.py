@@ -0,0 +1,53 @@
+import pytest
+
+from app.database import async_engine
+from app.utils.exercise_catalog import ExerciseCatalogCache, build_page
+from app.utils.query_budget import query_budget
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def catalog(client, admin_headers):
+    ids = {}
+    for name, group in (("squat", "legs"), ("lunge", "legs"), ("row", "back")):
+        response = await client.post("/api/v1/exercises", headers=admin_headers, json={"name": name, "muscle_group": group})
+        ids[name] = response.json()["id"]
+    return ids
+
+
+async def test_conditional_get_answers_304_without_a_query(client, catalog):
+    first = await client.get("/api/v1/exercises", params={"muscle_group": "legs"})
+    assert [e["name"] for e in first.json()] == ["squat", "lunge"]
+    with query_budget(async_engine, 0):
+        by_etag = await client.get(
+            "/api/v1/exercises", params={"muscle_group": "legs"}, headers={"If-None-Match": first.headers["ETag"]}
+        )
+        by_date = await client.get(
+            "/api/v1/exercises", params={"muscle_group": "legs"},
+            headers={"If-Modified-Since": first.headers["Last-Modified"]},
+        )
+    assert by_etag.status_code == by_date.status_code == 304
+
+
+async def test_writes_invalidate_only_the_groups_they_touch(client, admin_headers, catalog):
+    for group in ("legs", "back", None):
+        await client.get("/api/v1/exercises", params={"muscle_group": group} if group else {})
+    await client.patch(f"/api/v1/exercises/{catalog['squat']}", headers=admin_headers, json={"name": "front squat"})
+    with query_budget(async_engine, 0):
+        await client.get("/api/v1/exercises", params={"muscle_group": "back"})
+    with query_budget(async_engine, 1):
+        legs = await client.get("/api/v1/exercises", params={"muscle_group": "legs"})
+    with query_budget(async_engine, 1):
+        everything = await client.get("/api/v1/exercises")
+    assert "front squat" in [e["name"] for e in legs.json()]
+    assert "front squat" in [e["name"] for e in everything.json()]
+
+
+def test_page_built_before_a_write_is_not_served():
+    cache = ExerciseCatalogCache(maxsize=10, ttl=60)
+    version = cache.version("legs")  # read before the query
+    cache.invalidate(["legs"])  # a write lands while the query runs
+    cache.set("legs", 0, 10, version, build_page([]))
+    assert cache.get("legs", 0, 10) is None
+    assert cache.stats()["stale"] == 1
@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+import tracemalloc
+
+import pytest
+from sqlalchemy import insert
+
+from app import crud
+from app.database import AsyncSessionLocal
+from app.models import GymAccessID
+from app.utils.export import stream_rows
+
+pytestmark = pytest.mark.anyio
+
+
+def rows(count, type="normal", user_id=None, start=0):
+    prefix = "QRG" if type == "normal" else "PREM"
+    return [{"code": f"{prefix}{n:08d}", "type": type, "user_id": user_id} for n in range(start, start + count)]
+
+
+async def test_rows_stream_in_batches(db_factory):
+    async with db_factory() as db:
+        await db.execute(insert(GymAccessID), rows(1050))
+        await db.commit()
+    chunks = [chunk async for chunk in stream_rows(db_factory, crud.gym_ids_export_query(), "csv", 100)]
+    assert len(chunks) == 1 + 11  # header, then one chunk per batch
+    parsed = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+    assert parsed[0] == ["code", "type", "is_used", "created_at"]
+    assert [row[0] for row in parsed[1:]] == [f"QRG{n:08d}" for n in range(1050)]
+
+    chunks = [chunk async for chunk in stream_rows(db_factory, crud.gym_ids_export_query(), "ndjson", 500)]
+    records = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+    assert len(chunks) == 3 and len(records) == 1050
+    assert records[0]["code"] == "QRG00000000" and records[0]["type"] == "normal"
+
+
+async def test_export_memory_does_not_grow_with_rows(db_factory):
+    async with db_factory() as db:
+        await db.execute(insert(GymAccessID), rows(40_000))
+        await db.commit()
+
+    async def peak(count):
+        query = crud.gym_ids_export_query().limit(count)
+        tracemalloc.start()
+        try:
+            size = 0
+            async for chunk in stream_rows(db_factory, query, "ndjson", 1000):
+                size += len(chunk)
+            return tracemalloc.get_traced_memory()[1], size
+        finally:
+            tracemalloc.stop()
+
+    small, small_size = await peak(5_000)
+    large, large_size = await peak(40_000)
+    # Eight times the body, about the same peak: only a batch is held at once
+    assert large_size > 7 * small_size
+    assert large < 1.5 * small
+
+
+async def test_export_endpoint_filters_and_is_admin_only(client, admin_headers, member_headers):
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(GymAccessID), rows(3, "premium") + rows(2, "premium", user_id=2, start=3) + rows(4))
+        await db.commit()
+    params = {"type": "premium", "assigned": "false", "format": "ndjson"}
+    assert (await client.get("/api/v1/gym-ids/export", params=params, headers=member_headers)).status_code == 403
+    response = await client.get("/api/v1/gym-ids/export", params=params, headers=admin_headers)
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == 'attachment; filename="gym-ids-premium.ndjson"'
+    assert [json.loads(line)["code"] for line in response.text.splitlines()] == [f"PREM{n:08d}" for n in range(3)]
@@ -0,0 +1,81 @@
+import pytest
+
+from app.utils import gym_codes
+from app.utils.gym_codes import (
+    PermutationKeyMissing,
+    decode_gym_id,
+    encode_gym_id,
+    has_valid_check_digit,
+    permute,
+    unpermute,
+)
+
+
+def test_permutation_is_a_bijection():
+    key = b"k" * 32
+    values = [permute(value, key) for value in range(20_000)]
+    assert len(set(values)) == len(values)
+    assert all(unpermute(permuted, key) == value for value, permuted in enumerate(values))
+
+
+def test_codes_decode_to_their_counter():
+    for type in ("normal", "premium"):
+        for counter in (0, 1, 12_345, gym_codes.CODE_SPACE - 1):
+            code = encode_gym_id(type, counter)
+            assert has_valid_check_digit(code)
+            assert decode_gym_id(code) == counter
+
+
+def test_check_digit_catches_typos_and_transpositions():
+    code = encode_gym_id("normal", 42)
+    prefix, digits = code[:3], code[3:]
+    for index, digit in enumerate(digits):
+        typo = digits[:index] + str((int(digit) + 1) % 10) + digits[index + 1:]
+        assert not has_valid_check_digit(prefix + typo)
+    for index in range(len(digits) - 1):
+        swapped = digits[:index] + digits[index + 1] + digits[index] + digits[index + 2:]
+        if swapped != digits:
+            assert not has_valid_check_digit(prefix + swapped)
+
+
+def test_missing_permutation_key_fails(monkeypatch):
+    monkeypatch.setattr(gym_codes.settings, "GYM_ID_PERMUTATION_KEY", "")
+    with pytest.raises(PermutationKeyMissing):
+        encode_gym_id("normal", 1)
+    with pytest.raises(PermutationKeyMissing):
+        gym_codes.check_permutation_key()
+
+
+def test_key_does_not_follow_secret_key(monkeypatch):
+    code = encode_gym_id("normal", 7)
+    monkeypatch.setattr(gym_codes.settings, "SECRET_KEY", "rotated")
+    assert encode_gym_id("normal", 7) == code
+
+
+def test_only_the_known_prefix_is_stripped():
+    code = encode_gym_id("normal", 3)
+    assert has_valid_check_digit(code)
+    assert not has_valid_check_digit("QRGP" + code[3:])
+    assert not has_valid_check_digit("PREMQ" + code[3:])
+
+
+@pytest.mark.anyio
+async def test_legacy_code_without_check_digit_verifies(client, member_headers, monkeypatch):
+    from sqlalchemy import insert
+
+    from app.database import AsyncSessionLocal
+    from app.models import GymAccessID
+    from app.utils.id_verifier import gym_id_verifier
+
+    # A random pre-counter code: its last digit is not a Damm check digit
+    legacy = next(f"QRG{n:08d}" for n in range(12345670, 12345680) if not has_valid_check_digit(f"QRG{n:08d}"))
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(GymAccessID), [{"code": legacy, "type": "normal"}])
+        await db.commit()
+    gym_id_verifier.add_codes([legacy])
+    response = await client.post("/api/v1/gym-ids/verify", headers=member_headers, json={"access_id": legacy})
+    assert response.status_code == 200 and response.json()["is_valid"] is True
+
+    monkeypatch.setattr(gym_codes.settings, "GYM_ID_REQUIRE_CHECK_DIGIT", True)
+    response = await client.post("/api/v1/gym-ids/verify", headers=member_headers, json={"access_id": legacy})
+    assert response.status_code == 422
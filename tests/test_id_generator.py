@@ -0,0 +1,51 @@
+import pytest
+from sqlalchemy import func, select
+
+from app.config import get_settings
+from app.models import GymAccessID
+from app.utils.gym_codes import has_valid_check_digit
+from app.utils.id_generator import generate_unique_ids
+from app.utils.query_budget import query_budget
+
+pytestmark = pytest.mark.anyio
+settings = get_settings()
+
+
+async def test_generates_unique_codes_in_batches(engine, db_factory):
+    async with db_factory() as db:
+        # Reserve the block, then one screen and one insert per batch of 1,000
+        with query_budget(engine, 2 + 2 * 5):
+            codes = await generate_unique_ids(db, "premium", 5_000, batch_size=1_000)
+        stored = await db.scalar(select(func.count()).select_from(GymAccessID))
+    assert len(codes) == len(set(codes)) == stored == 5_000
+    assert all(code.startswith("PREM") and has_valid_check_digit(code) for code in codes)
+
+
+async def test_later_runs_continue_the_sequence(db_factory):
+    async with db_factory() as db:
+        first = await generate_unique_ids(db, "normal", 100)
+        second = await generate_unique_ids(db, "normal", 100)
+    assert not set(first) & set(second)
+
+
+async def test_generate_is_admin_only(client, member_headers, admin_headers):
+    body = {"type": "normal", "count": 5}
+    assert (await client.post("/api/v1/gym-ids/generate", json=body)).status_code == 401
+    assert (await client.post("/api/v1/gym-ids/generate", json=body, headers=member_headers)).status_code == 403
+    response = await client.post("/api/v1/gym-ids/generate", json=body, headers=admin_headers)
+    assert response.status_code == 200
+    assert len(response.json()["ids"]) == 5
+
+
+async def test_generate_caps_the_count_per_call(client, admin_headers):
+    body = {"type": "normal", "count": settings.ID_GENERATION_MAX_COUNT + 1}
+    assert (await client.post("/api/v1/gym-ids/generate", json=body, headers=admin_headers)).status_code == 422
+
+
+async def test_generate_accepts_the_largest_batch(client, admin_headers):
+    assert settings.ID_GENERATION_MAX_COUNT >= 100_000
+    body = {"type": "premium", "count": settings.ID_GENERATION_MAX_COUNT}
+    response = await client.post("/api/v1/gym-ids/generate", json=body, headers=admin_headers)
+    assert response.status_code == 200
+    codes = response.json()["ids"]
+    assert len(codes) == len(set(codes)) == settings.ID_GENERATION_MAX_COUNT
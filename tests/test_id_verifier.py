@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from sqlalchemy import insert
+
+from app.models import GymAccessID
+from app.utils.gym_codes import encode_gym_id
+from app.utils.id_verifier import GymIDVerifier
+
+pytestmark = pytest.mark.anyio
+
+
+def make_verifier(**kwargs):
+    return GymIDVerifier(cache_size=1000, cache_ttl=60, **{"bloom_refresh_seconds": 0, **kwargs})
+
+
+async def add_rows(db, rows):
+    await db.execute(insert(GymAccessID), [{"type": "normal", **row} for row in rows])
+    await db.commit()
+
+
+async def test_unknown_codes_skip_the_database(db_factory):
+    verifier = make_verifier(bloom_refresh_seconds=60)
+    async with db_factory() as db:
+        await add_rows(db, [{"code": encode_gym_id("normal", n)} for n in range(100)])
+        await verifier.rebuild(db)
+        assert (await verifier.lookup(db, encode_gym_id("normal", 5))).exists
+        lookups = verifier.db_lookups
+        assert not (await verifier.lookup(db, encode_gym_id("normal", 500))).exists
+    assert verifier.db_lookups == lookups
+    assert verifier.bloom_rejections == 1
+
+
+async def test_rows_committed_out_of_id_order_are_found(db_factory):
+    verifier = make_verifier()
+    async with db_factory() as db:
+        await add_rows(db, [{"id": 10, "code": encode_gym_id("normal", 10)}])
+        await verifier.rebuild(db)
+        # A lower id that commits after a higher one was already loaded
+        await add_rows(db, [{"id": 3, "code": encode_gym_id("normal", 3)}])
+        status = await verifier.lookup(db, encode_gym_id("normal", 3))
+    assert status.exists
+
+
+async def test_filter_is_not_loaded_inside_a_lookup(db_factory):
+    verifier = make_verifier()
+    async with db_factory() as db:
+        await add_rows(db, [{"code": encode_gym_id("normal", 1)}])
+        assert (await verifier.lookup(db, encode_gym_id("normal", 1))).exists
+    assert verifier.stats()["bloom"]["loaded"] is False
+    assert verifier.db_lookups == 1
+
+
+async def test_start_warms_the_filter(db_factory):
+    verifier = make_verifier(session_factory=db_factory)
+    async with db_factory() as db:
+        await add_rows(db, [{"code": encode_gym_id("normal", n)} for n in range(10)])
+    verifier.start()
+    try:
+        for _ in range(100):
+            if verifier.stats()["bloom"]["loaded"]:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await verifier.stop()
+    assert verifier.stats()["bloom"]["codes"] == 10
+
+
+async def test_codes_are_counted_once(db_factory):
+    verifier = make_verifier()
+    codes = [encode_gym_id("normal", n) for n in range(50)]
+    async with db_factory() as db:
+        await verifier.rebuild(db)
+        await add_rows(db, [{"code": code} for code in codes])
+        verifier.add_codes(codes)
+        await verifier.refresh(db)
+        await verifier.refresh(db)
+    assert verifier.stats()["bloom"]["codes"] == 50
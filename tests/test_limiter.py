@@ -0,0 +1,41 @@
+import fakeredis
+import pytest
+import redis
+from limits import parse
+from limits.storage import RedisStorage
+from limits.strategies import SlidingWindowCounterRateLimiter
+
+from app.utils import limiter as limiter_module
+from app.utils.limiter import SQLiteStorage, check_storage_uri
+
+LIMIT = parse("5/minute")
+
+
+def hits_allowed(workers, attempts):
+    """Spread attempts round-robin over the workers' limiters; count the admitted ones."""
+    limiters = [SlidingWindowCounterRateLimiter(storage) for storage in workers]
+    return sum(limiters[attempt % len(limiters)].hit(LIMIT, "login", "10.0.0.1") for attempt in range(attempts))
+
+
+def test_sqlite_store_is_shared_between_workers(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'limits.db'}"
+    assert hits_allowed([SQLiteStorage(uri), SQLiteStorage(uri)], 12) == 5
+
+
+def test_redis_store_is_shared_between_workers():
+    server = fakeredis.FakeServer()
+    workers = [
+        RedisStorage(
+            "redis://localhost:6379",
+            connection_pool=redis.ConnectionPool(connection_class=fakeredis.FakeConnection, server=server),
+        )
+        for _ in range(2)
+    ]
+    assert hits_allowed(workers, 12) == 5
+
+
+def test_redis_uri_without_the_package_fails_clearly(monkeypatch):
+    monkeypatch.setattr(limiter_module.importlib.util, "find_spec", lambda name: None)
+    with pytest.raises(RuntimeError, match="redis package"):
+        check_storage_uri("redis://localhost:6379")
+    assert check_storage_uri("memory://") == "memory://"
@@ -0,0 +1,66 @@
+import pytest
+
+from app import crud
+from app.utils.login_attempts import LoginAttemptTracker
+
+pytestmark = pytest.mark.anyio
+
+
+def make_tracker(**kwargs):
+    return LoginAttemptTracker(**{"max_per_username": 3, "max_per_ip": 5, "window_seconds": 60, **kwargs})
+
+
+def test_username_budget_is_case_insensitive():
+    tracker = make_tracker()
+    for name in ("bob", "Bob", " BOB "):
+        assert tracker.acquire(name, "10.0.0.1") is None
+    retry_after = tracker.acquire("bob", "10.0.0.2")
+    assert retry_after is not None and 1 <= retry_after <= 60
+
+
+def test_ip_budget_spans_usernames():
+    tracker = make_tracker()
+    for number in range(5):
+        assert tracker.acquire(f"user{number}", "10.0.0.1") is None
+    assert tracker.acquire("someone-else", "10.0.0.1") is not None
+    assert tracker.acquire("someone-else", "10.0.0.2") is None
+
+
+def test_success_clears_the_username_and_refunds_the_ip():
+    tracker = make_tracker()
+    for _ in range(3):
+        tracker.acquire("bob", "10.0.0.1")
+    tracker.succeeded("bob", "10.0.0.1")
+    assert tracker.acquire("bob", "10.0.0.1") is None
+
+
+def test_release_gives_the_attempt_back():
+    tracker = make_tracker()
+    for _ in range(3):
+        tracker.acquire("bob", "10.0.0.1")
+        tracker.release("bob", "10.0.0.1")
+    assert tracker.stats()["tracked_usernames"] == 0
+
+
+def test_tracked_keys_are_bounded():
+    tracker = make_tracker(maxsize=10)
+    for number in range(100):
+        tracker.acquire(f"user{number}", f"10.0.0.{number}")
+    stats = tracker.stats()
+    assert stats["tracked_usernames"] == stats["tracked_ips"] == 10
+
+
+async def test_locked_out_login_skips_bcrypt(client, monkeypatch):
+    verifies = 0
+
+    async def verify(plain, hashed):
+        nonlocal verifies
+        verifies += 1
+        return False
+
+    monkeypatch.setattr(crud, "verify_password_async", verify)
+    form = {"username": "member", "password": "wrong"}
+    statuses = [(await client.post("/api/v1/users/token", data=form)).status_code for _ in range(7)]
+    assert statuses[:5] == [401] * 5
+    assert statuses[5:] == [429, 429]
+    assert verifies == 5
@@ -0,0 +1,58 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import text
+
+from app.utils.metrics import Metrics, MetricsMiddleware, instrument_engine
+
+pytestmark = pytest.mark.anyio
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Metrics()
+    registry.observe_crypto("jwt_encode", 0.0003)
+    registry.observe_crypto("jwt_encode", 2.0)
+    rendered = registry.render()
+    assert 'gymqr_crypto_duration_seconds_bucket{operation="jwt_encode",le="0.0005"} 1' in rendered
+    assert 'gymqr_crypto_duration_seconds_bucket{operation="jwt_encode",le="+Inf"} 2' in rendered
+    assert 'gymqr_crypto_duration_seconds_count{operation="jwt_encode"} 2' in rendered
+
+
+def test_collectors_export_numeric_values():
+    registry = Metrics()
+    registry.register_collector("cache", lambda: {"hits": 3, "name": "lru"})
+    rendered = registry.render()
+    assert "gymqr_cache_hits 3" in rendered
+    assert "gymqr_cache_name" not in rendered
+
+
+async def test_requests_are_labelled_by_route_template_with_db_use(engine, db_factory):
+    registry = Metrics()
+    instrument_engine(engine, registry)
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        async with db_factory() as db:
+            await db.execute(text("SELECT 1"))
+            await db.execute(text("SELECT 2"))
+        return {"id": item_id}
+
+    app.add_middleware(MetricsMiddleware, registry=registry)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        for item_id in range(3):
+            await client.get(f"/items/{item_id}")
+        await client.get("/nope")
+
+    assert registry.request_latency[("GET", "/items/{item_id}")].count == 3
+    assert registry.route_db_statements[("GET", "/items/{item_id}")] == 6
+    assert registry.responses[("GET", "/items/{item_id}", 200)] == 3
+    assert registry.responses[("GET", "unmatched", 404)] == 1
+    assert registry.in_flight == 0
+
+
+async def test_metrics_endpoint_is_admin_only(client, member_headers, admin_headers):
+    assert (await client.get("/metrics", headers=member_headers)).status_code == 403
+    response = await client.get("/metrics", headers=admin_headers)
+    assert response.status_code == 200
+    assert "gymqr_http_request_duration_seconds" in response.text
@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+import pytest
+
+from app.utils.notifications import NotificationQueue
+
+pytestmark = pytest.mark.anyio
+
+
+class RecordingSender:
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+
+    def __call__(self, batch):
+        self.batches.append([n.recipient for n in batch])
+        if self.failures:
+            self.failures -= 1
+            return [RuntimeError("smtp down")] * len(batch)
+        return [None] * len(batch)
+
+
+def make_queue(sender, **kwargs):
+    options = {"workers": 1, "maxsize": 100, "batch_size": 10, "max_attempts": 3, "retry_base_seconds": 0.01}
+    return NotificationQueue(**{**options, **kwargs}, senders={"email": sender, "sms": sender})
+
+
+async def test_newest_message_per_recipient_wins():
+    sender = RecordingSender()
+    queue = make_queue(sender)
+    queue.enqueue_otp_email("a@example.com", "111111")
+    queue.enqueue_otp_email("a@example.com", "222222")
+    queue.enqueue_otp_email("b@example.com", "333333")
+    queue.start()
+    await queue.stop()
+    assert sender.batches == [["a@example.com", "b@example.com"]]
+    assert queue.stats()["deduplicated"] == 1
+
+
+async def test_full_queue_drops_new_recipients():
+    queue = make_queue(RecordingSender(), maxsize=2)
+    assert queue.enqueue_otp_email("a@example.com", "1")
+    assert queue.enqueue_otp_email("b@example.com", "1")
+    assert not queue.enqueue_otp_email("c@example.com", "1")
+    assert queue.enqueue_otp_email("a@example.com", "2")  # replaces, so still fits
+    assert queue.stats()["dropped"] == 1
+
+
+async def test_failed_delivery_is_retried():
+    sender = RecordingSender(failures=1)
+    queue = make_queue(sender)
+    queue.start()
+    queue.enqueue_otp_sms("+100", "123456")
+    for _ in range(100):
+        if queue.stats()["delivered"]:
+            break
+        await asyncio.sleep(0.01)
+    await queue.stop()
+    assert queue.stats()["retried"] == 1 and queue.stats()["delivered"] == 1
+
+
+async def test_gives_up_after_max_attempts():
+    queue = make_queue(RecordingSender(failures=10))
+    queue.start()
+    queue.enqueue_otp_email("a@example.com", "1")
+    for _ in range(100):
+        if queue.stats()["failed"]:
+            break
+        await asyncio.sleep(0.01)
+    await queue.stop()
+    assert queue.stats()["failed"] == 1 and queue.stats()["retried"] == 2
+
+
+async def test_enqueue_does_not_wait_for_delivery():
+    def slow_sender(batch):
+        time.sleep(0.2)
+        return [None] * len(batch)
+
+    queue = make_queue(slow_sender)
+    queue.start()
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    queue.enqueue_otp_email("a@example.com", "1")
+    await asyncio.sleep(0)
+    assert loop.time() - start < 0.1
+    await queue.stop()
+    assert queue.stats()["delivered"] == 1
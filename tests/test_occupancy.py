@@ -0,0 +1,108 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import crud
+from app.database import AsyncSessionLocal
+from app.models import CheckInEvent
+from app.utils.checkin_log import CheckInLog, checkin_log
+from app.utils.occupancy import OccupancyTracker, occupancy
+
+pytestmark = pytest.mark.anyio
+
+
+def now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@pytest.fixture
+async def code(client, admin_headers):
+    response = await client.post("/api/v1/gym-ids/generate", headers=admin_headers, json={"type": "premium", "count": 1})
+    return response.json()["ids"][0]
+
+
+async def check_out(client, headers, code):
+    return await client.post("/api/v1/gym-ids/check-out", headers=headers, json={"access_id": code})
+
+
+async def test_repeated_check_in_counts_once():
+    tracker = OccupancyTracker(None, None, max_stay_seconds=3600, push_seconds=0, reconcile_seconds=60)
+    assert tracker.check_in("QRG1", 1, "normal")
+    assert not tracker.check_in("QRG1", 1, "normal")
+    assert tracker.check_in("QRG2", 2, "premium")
+    # Moving gyms counts at the new one only
+    assert tracker.check_in("QRG1", 2, "normal")
+    assert tracker.snapshot()["gyms"] == {"2": {"normal": 1, "premium": 1, "total": 2}}
+    assert tracker.check_out("QRG2") == (2, "premium")
+    assert tracker.check_out("QRG2") is None
+
+
+async def test_reconcile_applies_buffered_events(db_factory):
+    log = CheckInLog(db_factory, batch_size=100, flush_seconds=60, maxsize=100)
+    tracker = OccupancyTracker(db_factory, log, max_stay_seconds=3600, push_seconds=0, reconcile_seconds=60)
+    log.record("QRG1", "normal", gym_id=1)
+    log.record("QRG2", "premium", gym_id=1)
+    async with log.lock:
+        await log.drain()
+    log.record("QRG1", "normal", gym_id=1, direction="out")
+    assert await tracker.reconcile()
+    assert tracker.snapshot()["gyms"] == {"1": {"normal": 0, "premium": 1, "total": 1}}
+
+
+async def test_check_out_after_a_check_in_elsewhere(client, member_headers, code):
+    # Written by another worker: not counted here, only in the table
+    async with AsyncSessionLocal() as db:
+        db.add(CheckInEvent(code=code, type="premium", gym_id=2, direction="in", scanned_at=now()))
+        await db.commit()
+    response = await check_out(client, member_headers, code)
+    assert response.status_code == 200 and response.json()["id_type"] == "premium"
+    assert (await check_out(client, member_headers, code)).status_code == 409
+
+
+async def test_parallel_check_outs_leave_once(client, member_headers, code):
+    async with AsyncSessionLocal() as db:
+        db.add(CheckInEvent(code=code, type="premium", gym_id=1, direction="in", scanned_at=now()))
+        await db.commit()
+    responses = await asyncio.gather(*(check_out(client, member_headers, code) for _ in range(5)))
+    assert sorted(response.status_code for response in responses) == [200, 409, 409, 409, 409]
+
+
+async def test_check_out_of_a_buffered_check_in(client, member_headers, code):
+    checkin_log.record(code, "premium", gym_id=3)
+    assert not occupancy.is_present(code)
+    assert (await check_out(client, member_headers, code)).status_code == 200
+    assert (await check_out(client, member_headers, code)).status_code == 409
+
+
+async def test_replayed_check_in_does_not_override_a_later_check_out(db_factory):
+    log = CheckInLog(db_factory, batch_size=100, flush_seconds=60, maxsize=100)
+    tracker = OccupancyTracker(db_factory, log, max_stay_seconds=3600, push_seconds=0, reconcile_seconds=60)
+    scanned_in = now() - timedelta(minutes=30)
+    # The check-out was written first; the check-in came back from the spool later
+    async with db_factory() as db:
+        db.add(CheckInEvent(code="QRG1", type="normal", gym_id=1, direction="out", scanned_at=now()))
+        await db.commit()
+        db.add(CheckInEvent(code="QRG1", type="normal", gym_id=1, direction="in", scanned_at=scanned_in))
+        await db.commit()
+        since = scanned_in - timedelta(hours=1)
+        assert (await crud.get_last_check_in_event(db, "QRG1", since))["direction"] == "out"
+        assert await crud.get_present_check_ins(db, since) == []
+    assert await tracker.reconcile()
+    assert tracker.snapshot()["gyms"] == {}
+
+
+async def test_check_out_lookup_does_not_hold_the_log_lock(client, member_headers, code, monkeypatch):
+    async with AsyncSessionLocal() as db:
+        db.add(CheckInEvent(code=code, type="premium", gym_id=1, direction="in", scanned_at=now()))
+        await db.commit()
+    lookup = crud.get_last_check_in_event
+    held = []
+
+    async def watched(*args):
+        held.append(checkin_log.lock.locked())
+        return await lookup(*args)
+
+    monkeypatch.setattr(crud, "get_last_check_in_event", watched)
+    assert (await check_out(client, member_headers, code)).status_code == 200
+    assert held == [False]
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, insert, select, text
+
+from app.models import OTP
+from app.utils import otp as otp_module
+from app.utils.otp import MemoryOTPStore, create_otp, purge_expired_otps, verify_otp
+from app.utils.query_budget import query_budget
+
+pytestmark = pytest.mark.anyio
+
+USER = SimpleNamespace(username="bob")
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def test_verify_consumes_the_code_in_one_statement(engine, db_factory):
+    async with db_factory() as db:
+        otp = await create_otp(db, USER)
+        assert not await verify_otp(db, "bob", "x" * 6)
+        with query_budget(engine, 1):
+            assert await verify_otp(db, "bob", otp.otp_code)
+        assert not await verify_otp(db, "bob", otp.otp_code)
+
+
+async def test_expired_codes_do_not_verify(db_factory):
+    async with db_factory() as db:
+        await db.execute(insert(OTP), [{"username": "bob", "otp_code": "123456", "expires_at": utcnow() - timedelta(seconds=1)}])
+        await db.commit()
+        assert not await verify_otp(db, "bob", "123456")
+
+
+async def test_verify_uses_the_username_code_index(engine):
+    async with engine.connect() as conn:
+        plan = (await conn.execute(text(
+            "EXPLAIN QUERY PLAN UPDATE otps SET is_used = 1 "
+            "WHERE username = 'bob' AND otp_code = '123456' AND is_used = 0 AND expires_at > '2026-01-01'"
+        ))).all()
+    assert any("ix_otps_username_otp_code" in row[-1] for row in plan)
+
+
+async def test_purge_removes_only_expired_rows_in_batches(db_factory):
+    now = utcnow()
+    async with db_factory() as db:
+        await db.execute(insert(OTP), [
+            {"username": "bob", "otp_code": f"{n:06d}", "expires_at": now + timedelta(minutes=-10 if n < 7 else 10)}
+            for n in range(10)
+        ])
+        await db.commit()
+        assert await purge_expired_otps(db, batch_size=3) == 7
+        assert await db.scalar(select(func.count()).select_from(OTP)) == 3
+
+
+async def test_memory_backend(db_factory, monkeypatch):
+    monkeypatch.setattr(otp_module.settings, "OTP_BACKEND", "memory")
+    store = MemoryOTPStore()
+    monkeypatch.setattr(otp_module, "memory_otp_store", store)
+    async with db_factory() as db:
+        otp = await create_otp(db, USER)
+        assert await verify_otp(db, "bob", otp.otp_code)
+        assert not await verify_otp(db, "bob", otp.otp_code)
+    store.issue("bob", "654321", ttl=-1)
+    assert store.purge_expired() == 1
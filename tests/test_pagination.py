@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy import insert
+
+from app.database import AsyncSessionLocal, async_engine
+from app.models import GymAccessID
+from app.utils.pagination import InvalidCursor, decode_cursor, encode_cursor
+from app.utils.query_budget import query_budget
+
+pytestmark = pytest.mark.anyio
+
+MEMBER_ID = 2  # inserted second by the client fixture
+
+
+async def add_codes(start, count, user_id=MEMBER_ID):
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(GymAccessID), [
+            {"code": f"QRG{number:08d}", "type": "normal", "user_id": user_id} for number in range(start, start + count)
+        ])
+        await db.commit()
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(None) is None
+    assert decode_cursor(encode_cursor(1234)) == 1234
+
+
+@pytest.mark.parametrize("cursor", ["!!!", "bm90IGpzb24", encode_cursor(1)[:-2], "eyJ2IjoxLCJhZnRlciI6dHJ1ZX0"])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+async def test_walking_pages_sees_every_row_once(client, member_headers):
+    await add_codes(0, 25)
+    await add_codes(100, 5, user_id=1)  # another user's rows never show up
+    await client.get("/api/v1/users/gym-access-ids", headers=member_headers)  # caches the user
+    seen, cursor = [], None
+    while True:
+        with query_budget(async_engine, 1):
+            response = await client.get(
+                "/api/v1/users/gym-access-ids", headers=member_headers,
+                params={"limit": 10, **({"cursor": cursor} if cursor else {})},
+            )
+        seen += [row["code"] for row in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if len(seen) == 10:
+            await add_codes(50, 2)  # inserted mid-walk: appended, nothing shifts
+        if cursor is None:
+            break
+    assert seen == [f"QRG{n:08d}" for n in [*range(25), 50, 51]]
+
+
+async def test_bad_cursor_is_a_400(client, member_headers):
+    response = await client.get("/api/v1/users/gym-access-ids", headers=member_headers, params={"cursor": "!!!"})
+    assert response.status_code == 400
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from app.config import get_settings
+from app.utils import auth
+from app.utils.auth import PasswordHashingBusy, get_password_hash_async, verify_password_async
+
+pytestmark = pytest.mark.anyio
+settings = get_settings()
+
+
+async def test_hash_and_verify_round_trip():
+    hashed = await get_password_hash_async("Secret123!x")
+    assert await verify_password_async("Secret123!x", hashed)
+    assert not await verify_password_async("wrong", hashed)
+
+
+async def test_hashing_runs_off_the_event_loop():
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.001)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    await asyncio.gather(*(get_password_hash_async("Secret123!x") for _ in range(4)))
+    task.cancel()
+    assert ticks >= 10
+
+
+async def test_full_pool_fails_fast(monkeypatch):
+    monkeypatch.setattr(auth, "_hash_pending", settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_SIZE)
+    with pytest.raises(PasswordHashingBusy):
+        await get_password_hash_async("Secret123!x")
+
+
+async def test_full_pool_answers_503(client, monkeypatch):
+    monkeypatch.setattr(auth, "_hash_pending", settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_SIZE)
+    response = await client.post("/api/v1/users/token", data={"username": "member", "password": "Secret123!x"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy import select
+
+from app import crud
+from app.database import AsyncSessionLocal, async_engine
+from app.models import User
+from app.utils.auth import invalidate_user
+from app.utils.query_budget import query_budget
+
+pytestmark = pytest.mark.anyio
+
+
+async def user_queries(client, headers):
+    # Startup's background jobs share the engine; count only the user lookups
+    with query_budget(async_engine, 100) as statements:
+        response = await client.get("/metrics", headers=headers)
+    return response.status_code, sum("FROM users" in statement for statement in statements)
+
+
+async def test_repeat_requests_skip_the_user_query(client, admin_headers):
+    assert await user_queries(client, admin_headers) == (200, 1)
+    assert await user_queries(client, admin_headers) == (200, 0)
+
+
+async def test_invalidate_user_reloads_the_principal(client, admin_headers):
+    await user_queries(client, admin_headers)
+    invalidate_user("admin")
+    assert await user_queries(client, admin_headers) == (200, 1)
+
+
+async def test_tampered_token_with_a_cached_signature_is_rejected(client, admin_headers):
+    await user_queries(client, admin_headers)
+    header, payload, signature = admin_headers["Authorization"].split(" ")[1].split(".")
+    forged = f"{header}.{payload[:-2]}AA.{signature}"
+    response = await client.get("/metrics", headers={"Authorization": f"Bearer {forged}"})
+    assert response.status_code == 401
+
+
+async def test_deactivated_user_token_is_rejected(client, member_headers):
+    assert (await client.get("/api/v1/gym-ids/occupancy", headers=member_headers)).status_code == 200
+    async with AsyncSessionLocal() as db:
+        member = await db.scalar(select(User).where(User.username == "member"))
+        await crud.set_user_active(db, member, False)
+    # Cached from the first request; deactivation invalidates it
+    assert (await client.get("/api/v1/gym-ids/occupancy", headers=member_headers)).status_code == 401
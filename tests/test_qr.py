@@ -0,0 +1,96 @@
+import os
+import struct
+import time
+import zlib
+
+import pytest
+from sqlalchemy import insert
+
+from app.database import AsyncSessionLocal
+from app.models import GymAccessID
+from app.utils.gym_codes import encode_gym_id
+from app.utils.id_verifier import gym_id_verifier
+from app.utils.qr import QRRenderCache, qr_cache, qr_matrix, render, render_key
+
+pytestmark = pytest.mark.anyio
+
+CODE = encode_gym_id("normal", 1)
+
+
+def png_pixels(png):
+    """(width, rows of 0/1 pixels) of a 1-bit grayscale PNG from render_png."""
+    assert png.startswith(b"\x89PNG\r\n\x1a\n")
+    width, height = struct.unpack(">II", png[16:24])
+    length = struct.unpack(">I", png[33:37])[0]
+    raw = zlib.decompress(png[41:41 + length])
+    stride = 1 + -(-width // 8)
+    rows = []
+    for y in range(height):
+        bits = "".join(f"{byte:08b}" for byte in raw[y * stride + 1:(y + 1) * stride])
+        rows.append([int(bit) for bit in bits[:width]])
+    return width, rows
+
+
+def test_png_pixels_match_the_matrix():
+    matrix = qr_matrix(CODE)
+    width, rows = png_pixels(render(CODE, "png", 300, "M", 4))
+    scale = width // (len(matrix) + 8)
+    assert width <= 300 and len(rows) == width
+    for y, line in enumerate(matrix):
+        for x, dark in enumerate(line):
+            assert rows[(y + 4) * scale][(x + 4) * scale] == (0 if dark else 1)
+
+
+def test_renders_are_pure_and_keyed_by_every_input():
+    assert render(CODE, "svg", 200, "M", 4) == render(CODE, "svg", 200, "M", 4)
+    keys = {
+        render_key(CODE, "png", 200, "M", 4), render_key(CODE, "svg", 200, "M", 4),
+        render_key(CODE, "png", 201, "M", 4), render_key(CODE, "png", 200, "H", 4),
+        render_key(CODE, "png", 200, "M", 2), render_key(encode_gym_id("normal", 2), "png", 200, "M", 4),
+    }
+    assert len(keys) == 6
+
+
+def test_disk_tier_is_shared_between_caches(tmp_path):
+    key = render_key(CODE, "png", 200, "M", 4)
+    first = QRRenderCache(10, 60, str(tmp_path)).load_or_render(key, CODE, "png", 200, "M", 4)
+    other = QRRenderCache(10, 60, str(tmp_path))
+    assert other.load_or_render(key, CODE, "png", 200, "M", 4) == first
+    assert other.stats()["disk_hits"] == 1 and other.stats()["renders"] == 0
+
+
+def test_disk_tier_evicts_the_least_recently_used(tmp_path):
+    cache = QRRenderCache(10, 60, str(tmp_path), max_disk_bytes=3500)
+    keys = [render_key(encode_gym_id("normal", n), "png", 200, "M", 4) for n in range(4)]
+    for age, key in zip((1000, 900, 800), keys):
+        cache.put(key, "png", b"x" * 1000)
+        os.utime(cache._path(key, "png"), (time.time() - age,) * 2)
+    cache.memory.clear()
+    assert cache.load(keys[0], "png") is not None
+    cache.put(keys[3], "png", b"x" * 1000)
+    kept = [os.path.exists(cache._path(key, "png")) for key in keys]
+    assert kept == [True, False, True, True]
+    assert cache.stats()["disk_evictions"] == 1
+
+
+async def test_qr_endpoint_caches_and_revalidates(client, member_headers):
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(GymAccessID), [{"code": CODE, "type": "normal"}])
+        await db.commit()
+    gym_id_verifier.add_codes([CODE])
+    url = f"/api/v1/gym-ids/{CODE}/qr"
+    response = await client.get(url, headers=member_headers)
+    assert response.status_code == 200 and response.headers["content-type"] == "image/png"
+    again = await client.get(url, headers={**member_headers, "If-None-Match": response.headers["ETag"]})
+    assert again.status_code == 304
+    await client.get(url, headers=member_headers)
+    assert qr_cache.stats()["renders"] == 1
+    missing = await client.get(f"/api/v1/gym-ids/{encode_gym_id('normal', 2)}/qr", headers=member_headers)
+    assert missing.status_code == 404
+
+
+async def test_unknown_code_is_404_even_with_a_matching_etag(client, member_headers):
+    code = encode_gym_id("normal", 3)
+    etag = f'"{render_key(code, "png", 256, "M", 4)}"'
+    response = await client.get(f"/api/v1/gym-ids/{code}/qr", headers={**member_headers, "If-None-Match": etag})
+    assert response.status_code == 404
@@ -0,0 +1,48 @@
+import io
+import re
+import zipfile
+import zlib
+
+import pytest
+
+from app.utils.gym_codes import encode_gym_id
+from app.utils.qr import render
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def issued(client, admin_headers):
+    response = await client.post("/api/v1/gym-ids/generate", headers=admin_headers, json={"type": "premium", "count": 30})
+    return response.json()["ids"]
+
+
+async def batch(client, headers, first_code, count, **options):
+    body = {"type": "premium", "first_code": first_code, "count": count, **options}
+    return await client.post("/api/v1/gym-ids/qr-batch", headers=headers, json=body)
+
+
+async def test_zip_holds_one_image_per_issued_code(client, admin_headers, issued):
+    # Asking past the end of the run skips the codes never issued
+    response = await batch(client, admin_headers, issued[0], 40, size=64)
+    assert response.status_code == 200 and response.headers["content-type"] == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.namelist() == [f"{code}.png" for code in issued]
+    assert archive.read(f"{issued[7]}.png") == render(issued[7], "png", 64, "M", 4)
+
+
+async def test_pdf_has_a_page_per_twelve_cards(client, admin_headers, issued):
+    response = await batch(client, admin_headers, issued[0], 30, format="pdf")
+    assert response.status_code == 200
+    pdf = response.content
+    assert pdf.startswith(b"%PDF-") and pdf.rstrip().endswith(b"%%EOF")
+    assert len(re.findall(rb"/Type /Page\b", pdf)) == 3
+    streams = re.findall(rb"stream\r?\n(.*?)\r?\nendstream", pdf, re.S)
+    labels = b"".join(zlib.decompress(stream) for stream in streams)
+    assert all(f"({code}) Tj".encode() in labels for code in issued)
+
+
+async def test_batch_is_admin_only_and_needs_an_issued_first_code(client, admin_headers, member_headers, issued):
+    assert (await batch(client, member_headers, issued[0], 5)).status_code == 403
+    response = await batch(client, admin_headers, encode_gym_id("premium", 10 ** 6), 5)
+    assert response.status_code == 404
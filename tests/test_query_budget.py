@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from app.database import async_engine
+from app.utils.query_budget import QueryBudgetExceeded, query_budget
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_budget_ignores_work_started_outside_it(engine, db_factory):
+    go = asyncio.Event()
+
+    async def background():
+        await go.wait()
+        async with db_factory() as db:
+            await db.execute(text("SELECT 1"))
+
+    task = asyncio.create_task(background())
+    async with db_factory() as db:
+        with query_budget(engine, 1) as statements:
+            go.set()
+            await task
+            await db.execute(text("SELECT 2"))
+    assert statements == ["SELECT 2"]
+
+
+async def test_over_budget_raises_with_the_statements(engine, db_factory):
+    async with db_factory() as db:
+        with pytest.raises(QueryBudgetExceeded, match="SELECT 4"):
+            with query_budget(engine, 1):
+                await db.execute(text("SELECT 3"))
+                await db.execute(text("SELECT 4"))
+
+
+@pytest.fixture
+async def plans(client, admin_headers, member_headers):
+    """Ten exercises and eight plans of member, each linked to five of them."""
+    exercise_ids = []
+    for number in range(10):
+        response = await client.post("/api/v1/exercises", headers=admin_headers, json={
+            "name": f"exercise {number}", "muscle_group": "legs" if number % 2 else "back",
+        })
+        exercise_ids.append(response.json()["id"])
+    plan_ids = []
+    for number in range(8):
+        response = await client.post("/api/v1/workout-plans", headers=member_headers, json={
+            "plan_name": f"plan {number}", "exercise_ids": exercise_ids[number % 5:number % 5 + 5],
+        })
+        assert response.status_code == 201
+        plan_ids.append(response.json()["id"])
+    # The user lookup is cached from here on
+    return exercise_ids, plan_ids
+
+
+async def test_plan_list_loads_exercises_in_one_query(client, member_headers, plans):
+    with query_budget(async_engine, 2):
+        response = await client.get("/api/v1/workout-plans", headers=member_headers)
+    assert response.status_code == 200
+    assert [len(plan["exercises"]) for plan in response.json()] == [5] * 8
+
+
+async def test_plan_detail_loads_exercises_in_one_query(client, member_headers, plans):
+    with query_budget(async_engine, 2):
+        response = await client.get(f"/api/v1/workout-plans/{plans[1][0]}", headers=member_headers)
+    assert len(response.json()["exercises"]) == 5
+
+
+async def test_exercise_endpoints(client, plans):
+    with query_budget(async_engine, 1):
+        response = await client.get("/api/v1/exercises", params={"muscle_group": "legs"})
+    assert len(response.json()) == 5
+    with query_budget(async_engine, 0):  # served from the page cache
+        await client.get("/api/v1/exercises", params={"muscle_group": "legs"})
+    with query_budget(async_engine, 1):
+        response = await client.get(f"/api/v1/exercises/{plans[0][0]}")
+    assert response.json()["name"] == "exercise 0"
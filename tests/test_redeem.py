@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import crud
+from app.database import Base
+from app.models import GymAccessID
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def file_db_factory(tmp_path):
+    """Separate connections to one SQLite file, so redeems really race."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'redeem.db'}", connect_args={"timeout": 30})
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def test_only_one_parallel_redeem_wins(file_db_factory):
+    async with file_db_factory() as db:
+        await db.execute(insert(GymAccessID), [{"code": "QRG00000000", "type": "normal"}])
+        await db.commit()
+
+    async def redeem():
+        async with file_db_factory() as db:
+            return await crud.redeem_gym_access_id(db, "QRG00000000")
+
+    results = await asyncio.gather(*(redeem() for _ in range(100)))
+    assert results.count(True) == 1
+    async with file_db_factory() as db:
+        assert await db.scalar(select(GymAccessID.is_used).where(GymAccessID.code == "QRG00000000"))
+
+
+async def test_redeem_of_unknown_or_used_code_loses(db_factory):
+    async with db_factory() as db:
+        await db.execute(insert(GymAccessID), [{"code": "QRG00000000", "type": "normal"}])
+        await db.commit()
+        assert await crud.redeem_gym_access_id(db, "QRG00000000")
+        assert not await crud.redeem_gym_access_id(db, "QRG00000000")
+        assert not await crud.redeem_gym_access_id(db, "QRG99999999")
@@ -0,0 +1,144 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import crud
+from app.database import AsyncSessionLocal, Base
+from app.models import GymAccessID
+from app.utils.gym_codes import encode_gym_id
+from app.utils.id_verifier import gym_id_verifier
+from app.utils.qr import render_key
+from app.utils import signed_qr
+from app.utils.signed_qr import (
+    InvalidAccessToken, QRSigningUnavailable, RevocationList, TokenSigner, get_signer, issue_token, verify_token
+)
+
+pytestmark = pytest.mark.anyio
+
+CODE = encode_gym_id("normal", 1)
+SIGNER = TokenSigner("HS256", os.urandom(32), "1")
+NOW = 1_800_000_000
+
+
+def revocation_list(*rows):
+    revoked = RevocationList(None, 0, 0)
+    revoked.apply(SimpleNamespace(version=version, code=code, revoked=state) for version, code, state in rows)
+    return revoked
+
+
+def test_token_round_trip():
+    token, payload = issue_token(CODE, "premium", now=NOW, signer=SIGNER)
+    assert verify_token(token, now=NOW, signer=SIGNER, revoked=revocation_list()) == payload
+    assert payload.type == "premium" and payload.not_before <= NOW < payload.not_after
+
+
+def test_forged_expired_and_revoked_tokens_fail():
+    token, payload = issue_token(CODE, "normal", now=NOW, signer=SIGNER)
+    forged = token[:-1] + ("0" if token[-1] != "0" else "1")
+    other = TokenSigner("HS256", os.urandom(32), "1")
+    for bad, now, revoked in (
+        (forged, NOW, revocation_list()),
+        (token.replace(":N:", ":P:"), NOW, revocation_list()),
+        (issue_token(CODE, "normal", now=NOW, signer=other)[0], NOW, revocation_list()),
+        (token, payload.not_after + 3600, revocation_list()),
+        (token, NOW, revocation_list((1, CODE, True))),
+    ):
+        with pytest.raises(InvalidAccessToken):
+            verify_token(bad, now=now, signer=SIGNER, revoked=revoked)
+
+
+def test_revocation_list_applies_deltas_once_in_order():
+    revoked = revocation_list((1, CODE, True), (2, "QRG2", True), (3, CODE, False))
+    assert not revoked.is_revoked(CODE) and revoked.is_revoked("QRG2")
+    # A replayed old entry does not undo the reinstatement
+    revoked.apply([SimpleNamespace(version=1, code=CODE, revoked=True)])
+    assert not revoked.is_revoked(CODE) and revoked.version == 3
+
+
+def test_signing_key_is_required(monkeypatch):
+    monkeypatch.setattr(signed_qr, "_signer", None)
+    monkeypatch.setattr(signed_qr.settings, "QR_SIGNING_KEY", "")
+    with pytest.raises(QRSigningUnavailable):
+        signed_qr.check_signing_key()
+    with pytest.raises(QRSigningUnavailable):
+        get_signer()
+
+
+def test_signing_key_does_not_follow_secret_key(monkeypatch):
+    monkeypatch.setattr(signed_qr, "_signer", None)
+    token, _ = issue_token(CODE, "normal", now=NOW)
+    monkeypatch.setattr(signed_qr, "_signer", None)
+    monkeypatch.setattr(signed_qr.settings, "SECRET_KEY", "rotated")
+    assert verify_token(token, now=NOW, revoked=revocation_list())
+
+
+@pytest.fixture
+async def file_db_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'revocations.db'}", connect_args={"timeout": 30})
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def test_parallel_revocations_get_consecutive_versions(file_db_factory):
+    async def revoke(number):
+        async with file_db_factory() as db:
+            return await crud.add_revocation(db, encode_gym_id("normal", number), True)
+
+    versions = await asyncio.gather(*(revoke(number) for number in range(20)))
+    assert sorted(versions) == list(range(1, 21))
+    revoked = RevocationList(file_db_factory, refresh_seconds=60, batch_size=7)
+    await revoked.refresh()
+    assert revoked.version == 20 and revoked.stats()["revoked"] == 20
+
+
+@pytest.fixture
+async def code(client):
+    # Stored as premium although the prefix says otherwise
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(GymAccessID), [{"code": CODE, "type": "premium"}])
+        await db.commit()
+    gym_id_verifier.add_codes([CODE])
+    return CODE
+
+
+async def test_signed_render_uses_the_stored_type(client, member_headers, code):
+    response = await client.get(f"/api/v1/gym-ids/{code}/qr?signed=true&size=64", headers=member_headers)
+    assert response.status_code == 200
+    token, _ = issue_token(code, "premium")
+    assert response.headers["etag"] == f'"{render_key(token, "png", 64, "M", 4)}"'
+
+
+async def test_revoked_code_gets_no_signed_payload(client, admin_headers, member_headers, code):
+    response = await client.post(f"/api/v1/gym-ids/{code}/revoke", headers=admin_headers)
+    assert response.status_code == 200 and response.json()["version"] == 1
+    for path in (f"{code}/qr?signed=true", f"{code}/signed"):
+        assert (await client.get(f"/api/v1/gym-ids/{path}", headers=member_headers)).status_code == 409
+    assert (await client.get(f"/api/v1/gym-ids/{code}/qr", headers=member_headers)).status_code == 200
+
+    await client.post(f"/api/v1/gym-ids/{code}/restore", headers=admin_headers)
+    assert (await client.get(f"/api/v1/gym-ids/{code}/qr?signed=true", headers=member_headers)).status_code == 200
+    delta = (await client.get("/api/v1/gym-ids/revocations?since=1", headers=member_headers)).json()
+    assert delta == {"version": 2, "revoked": [], "restored": [code], "more": False}
+
+
+async def test_signed_render_of_unknown_code_is_404(client, member_headers):
+    unknown = encode_gym_id("premium", 10 ** 6)
+    assert (await client.get(f"/api/v1/gym-ids/{unknown}/qr?signed=true", headers=member_headers)).status_code == 404
+
+
+async def test_revoked_code_does_not_verify_or_redeem(client, admin_headers, member_headers, code):
+    await client.post(f"/api/v1/gym-ids/{code}/revoke", headers=admin_headers)
+    body = {"access_id": code}
+    response = await client.post("/api/v1/gym-ids/verify", headers=member_headers, json=body)
+    assert response.json()["is_valid"] is False and response.json()["message"] == "Access ID has been revoked"
+    assert (await client.post("/api/v1/gym-ids/redeem", headers=member_headers, json=body)).status_code == 409
+
+    await client.post(f"/api/v1/gym-ids/{code}/restore", headers=admin_headers)
+    assert (await client.post("/api/v1/gym-ids/verify", headers=member_headers, json=body)).json()["is_valid"]
+    assert (await client.post("/api/v1/gym-ids/redeem", headers=member_headers, json=body)).status_code == 200
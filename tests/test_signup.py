@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, select
+
+from app import crud
+from app.database import AsyncSessionLocal, async_engine
+from app.models import OTP, User
+from app.utils.notifications import notification_queue
+from app.utils.query_budget import query_budget
+
+pytestmark = pytest.mark.anyio
+
+
+def signup_body(username="carol", email="carol@example.com"):
+    return {
+        "username": username, "email": email, "date_of_birth": "1990-01-01T00:00:00",
+        "password": "Secret123!x", "confirm_password": "Secret123!x",
+    }
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    messages = []
+
+    def record(batch):
+        messages.extend(n.recipient for n in batch)
+        return [None] * len(batch)
+
+    monkeypatch.setattr(notification_queue, "senders", {"email": record, "sms": record})
+    return messages
+
+
+async def count(model):
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(model))
+
+
+async def test_signup_inserts_user_and_otp_without_lookups(client, sent):
+    with query_budget(async_engine, 100) as statements:
+        response = await client.post("/api/v1/users/signup", json=signup_body())
+    assert response.status_code == 200
+    assert not [s for s in statements if s.lstrip().upper().startswith("SELECT") and "FROM users" in s]
+    assert [s.split()[2] for s in statements if s.lstrip().upper().startswith("INSERT")] == ["users", "otps"]
+    assert await count(OTP) == 1
+
+
+@pytest.mark.parametrize("body, detail", [
+    (signup_body(email="other@example.com"), "Username already registered"),
+    (signup_body(username="other"), "Email already registered"),
+])
+async def test_duplicates_are_rejected_by_the_constraints(client, sent, body, detail):
+    assert (await client.post("/api/v1/users/signup", json=signup_body())).status_code == 200
+    response = await client.post("/api/v1/users/signup", json=body)
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
+    assert await count(OTP) == 1  # the failed signup left no OTP behind
+    assert await count(User) == 3
+
+
+@pytest.mark.parametrize("message, field", [
+    ("(1062, \"Duplicate entry 'bob@example.com' for key 'users.email'\")", "email"),
+    ("(1062, \"Duplicate entry 'email' for key 'users.username'\")", "username"),
+    ("UNIQUE constraint failed: users.email", "email"),
+    ("NOT NULL constraint failed: users.password_hash", None),
+])
+def test_duplicate_user_field(message, field):
+    assert crud.duplicate_user_field(SimpleNamespace(orig=message)) == field
@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import create_engine, inspect
+
+from app import database
+from app.database import Base, expected_schema_revision
+
+pytestmark = pytest.mark.anyio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COUNT_IMPORT_STATEMENTS = """
+import json
+from sqlalchemy import event
+from app.database import async_engine, engine
+statements = []
+for target in (engine, async_engine.sync_engine):
+    event.listen(target, "before_cursor_execute", lambda *args: statements.append(args[2]))
+import app.main
+print(json.dumps(statements))
+"""
+
+
+def run_python(code, **env):
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env={**os.environ, **env},
+        capture_output=True, text=True, timeout=60, check=True,
+    )
+    return result.stdout.strip().splitlines()[-1]
+
+
+def test_importing_the_app_sends_no_statements():
+    assert json.loads(run_python(COUNT_IMPORT_STATEMENTS)) == []
+
+
+def test_migrations_build_the_model_schema(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT,
+        env={**os.environ, "DATABASE_URL": url}, capture_output=True, check=True, timeout=60,
+    )
+    inspector = inspect(create_engine(url))
+    assert set(Base.metadata.tables) <= set(inspector.get_table_names())
+    for table in Base.metadata.tables.values():
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        assert {column.name for column in table.columns} <= columns, table.name
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        assert {index.name for index in table.indexes} <= indexes, table.name
+
+
+async def test_schema_check_flags_an_unmigrated_database():
+    assert expected_schema_revision() is not None
+    try:
+        await database.check_schema_version()  # the test database is built by create_all
+    finally:
+        await database.async_engine.dispose()
+    assert database.schema_is_current is False
@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy import func, insert, select
+
+from app import crud, schemas
+from app.models import Exercise, WorkoutPlanExercise
+from app.utils.query_budget import query_budget
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def exercise_ids(db_factory):
+    async with db_factory() as db:
+        await db.execute(insert(Exercise), [{"name": f"e{n}", "muscle_group": "legs"} for n in range(300)])
+        await db.commit()
+        return list((await db.scalars(select(Exercise.id).order_by(Exercise.id))).all())
+
+
+async def links(db, plan_id):
+    return set((await db.scalars(
+        select(WorkoutPlanExercise.exercise_id).where(WorkoutPlanExercise.workout_plan_id == plan_id)
+    )).all())
+
+
+@pytest.mark.parametrize("size", [1, 200])
+async def test_create_costs_three_statements_at_any_size(engine, db_factory, exercise_ids, size):
+    plan = schemas.WorkoutPlanCreate(plan_name="plan", exercise_ids=exercise_ids[:size])
+    async with db_factory() as db:
+        # Validate, plan INSERT, links executemany
+        with query_budget(engine, 3):
+            created = await crud.create_workout_plan(db, plan, user_id=1)
+        assert [exercise.id for exercise in created.exercises] == exercise_ids[:size]
+        assert await links(db, created.id) == set(exercise_ids[:size])
+
+
+async def test_update_writes_only_the_difference(engine, db_factory, exercise_ids):
+    async with db_factory() as db:
+        created = await crud.create_workout_plan(
+            db, schemas.WorkoutPlanCreate(plan_name="plan", exercise_ids=exercise_ids[:100]), user_id=1
+        )
+        db_plan = await crud.get_workout_plan(db, created.id)
+        wanted = exercise_ids[10:110]
+        # Validate added ids, DELETE ... IN, links executemany, updated_at
+        with query_budget(engine, 4) as statements:
+            await crud.update_workout_plan(db, db_plan, schemas.WorkoutPlanUpdate(exercise_ids=wanted))
+        assert await links(db, created.id) == set(wanted)
+        inserted = [s for s in statements if s.startswith("INSERT")]
+        assert len(inserted) == 1
+        with query_budget(engine, 0):
+            await crud.update_workout_plan(db, db_plan, schemas.WorkoutPlanUpdate(exercise_ids=wanted))
+
+
+async def test_unknown_exercises_are_rejected_without_a_plan(db_factory, exercise_ids):
+    plan = schemas.WorkoutPlanCreate(plan_name="plan", exercise_ids=[exercise_ids[0], 10_000, 10_001])
+    async with db_factory() as db:
+        with pytest.raises(crud.UnknownExerciseIds) as error:
+            await crud.create_workout_plan(db, plan, user_id=1)
+        assert error.value.ids == [10_000, 10_001]
+        assert await db.scalar(select(func.count()).select_from(WorkoutPlanExercise)) == 0
+
+
+async def test_plan_api(client, admin_headers, member_headers):
+    exercise = await client.post("/api/v1/exercises", headers=admin_headers, json={"name": "squat", "muscle_group": "legs"})
+    body = {"plan_name": "legs day", "exercise_ids": [exercise.json()["id"]]}
+    response = await client.post("/api/v1/workout-plans", headers=member_headers, json=body)
+    assert response.status_code == 201
+    plan_id = response.json()["id"]
+    bad = await client.patch(f"/api/v1/workout-plans/{plan_id}", headers=member_headers, json={"exercise_ids": [999]})
+    assert bad.status_code == 400
+    # Another user's plan is not found
+    other = await client.get(f"/api/v1/workout-plans/{plan_id}", headers=admin_headers)
+    assert other.status_code == 404